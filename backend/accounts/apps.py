@@ -1,7 +1,24 @@
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+
+def _record_login(sender, user, **kwargs) -> None:
+    """替代 Django 自带的 update_last_login，把 last_login 与视图写入的 ip_address 合并成一条 UPDATE。"""
+    user.last_login = timezone.now()
+    sender._default_manager.filter(pk=user.pk).update(last_login=user.last_login, ip_address=user.ip_address)
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
     verbose_name = '用户与权限'
+
+    def ready(self) -> None:
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(_record_login, dispatch_uid='accounts_record_login')
+
+        from .usernames import index_saved_username
+
+        post_save.connect(index_saved_username, sender=self.get_model('User'), dispatch_uid='accounts_username_index')
@@ -0,0 +1,177 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .models import LoginRecord
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'sync')
+
+
+class LoginAuditWriter:
+    """把登录记录攒在内存里，累计 max_batch 条或首条入队满 max_delay 秒后用 bulk_create 一次写入。
+
+    队列最多容纳 max_queue 条，写满时按 overflow 处理：``drop_newest`` 丢弃新记录，
+    ``drop_oldest`` 丢弃最早的记录，``sync`` 交回调用方直接写库（不丢记录，但失去削峰效果）。
+    进程退出时通过 atexit 把剩余记录写完。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_batch: int = 200,
+        max_delay: float = 0.2,
+        max_queue: int = 10_000,
+        overflow: str = 'drop_newest',
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'未知的溢出策略：{overflow}')
+        self.max_batch = max(int(max_batch), 1)
+        self.max_delay = max(float(max_delay), 0.0)
+        self.max_queue = max(int(max_queue), self.max_batch)
+        self.overflow = overflow
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._pending: deque[LoginRecord] = deque()
+        self._first_at = 0.0
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self._flushing = 0
+
+    def submit(self, record: LoginRecord) -> bool:
+        """登记一条未保存的记录。
+
+        返回 False 表示队列已满且策略为 ``sync``，需要调用方自行写库（异步视图可用 asave）；
+        被 drop 策略丢弃的记录同样返回 True，计入 dropped。
+        """
+        with self._cond:
+            self._ensure_started()
+            if len(self._pending) >= self.max_queue:
+                if self.overflow == 'sync':
+                    return False
+                self._drop()
+                if self.overflow == 'drop_newest':
+                    return True
+                self._pending.popleft()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append(record)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待当前已入队的记录全部写入，超时返回 False。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._first_at = 0.0
+            self._cond.notify_all()
+            while self._pending or self._flushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        if self.dropped % 1000 == 1:
+            logger.warning('登录记录队列已满，累计丢弃 %s 条', self.dropped)
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='login-audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                while not self._stopped and len(self._pending) < self.max_batch:
+                    remaining = self._first_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                if self._pending:
+                    self._first_at = time.monotonic()
+                self._flushing += 1
+                stopped = self._stopped and not self._pending
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                with self._cond:
+                    self._flushing -= 1
+                    self._cond.notify_all()
+            if stopped:
+                connections.close_all()
+                return
+
+    def _write(self, batch: list[LoginRecord]) -> None:
+        close_old_connections()
+        try:
+            LoginRecord.objects.bulk_create(batch, batch_size=self.max_batch)
+        except Exception:  # pragma: no cover - defensive logging
+            self.failed += len(batch)
+            logger.exception('写入 %s 条登录记录失败', len(batch))
+        else:
+            self.written += len(batch)
+
+
+_writer_lock = threading.Lock()
+_writer: LoginAuditWriter | None = None
+
+
+def get_audit_writer() -> LoginAuditWriter | None:
+    """按 LOGIN_AUDIT 配置返回共享的写入器；未启用时返回 None，由调用方同步写库。"""
+    global _writer
+    options = getattr(settings, 'LOGIN_AUDIT', {}) or {}
+    if not options.get('BUFFERED', False):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = LoginAuditWriter(
+                    max_batch=options.get('MAX_BATCH', 200),
+                    max_delay=options.get('MAX_DELAY_MS', 200) / 1000,
+                    max_queue=options.get('MAX_QUEUE', 10_000),
+                    overflow=options.get('OVERFLOW', 'drop_newest'),
+                )
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def audit_login(**fields) -> None:
+    record = LoginRecord(**fields)
+    writer = get_audit_writer()
+    if writer is None or not writer.submit(record):
+        record.save()
+
+
+async def aaudit_login(**fields) -> None:
+    record = LoginRecord(**fields)
+    writer = get_audit_writer()
+    if writer is None or not writer.submit(record):
+        await record.asave()
+
+
+__all__ = ['LoginAuditWriter', 'aaudit_login', 'audit_login', 'get_audit_writer']
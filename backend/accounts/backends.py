@@ -0,0 +1,80 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_backends, get_user_model, user_login_failed
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from .hashing import ahash_password, averify_password, hash_password, verify_password
+
+
+class PooledModelBackend(ModelBackend):
+    """与 ModelBackend 行为一致，只是密码校验交给 accounts.hashing 的进程池。
+
+    进程池排满时，只有在 reject_when_busy() 范围内调用（登录 API 视图）才会抛出 HashingBusy
+    并由视图转换成 503；管理后台等其他 authenticate() 调用方退回在当前线程计算。
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # 用户不存在时同样算一次哈希，避免通过响应时间枚举用户名
+            hash_password(password)
+            return None
+        ok, new_hash = verify_password(password, user.password)
+        if not ok or not self.user_can_authenticate(user):
+            return None
+        if new_hash:
+            user.password = new_hash
+            user.save(update_fields=['password'])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            await ahash_password(password)
+            return None
+        ok, new_hash = await averify_password(password, user.password)
+        if not ok or not self.user_can_authenticate(user):
+            return None
+        if new_hash:
+            user.password = new_hash
+            await user.asave(update_fields=['password'])
+        return user
+
+
+async def aauthenticate(request=None, **credentials):
+    """异步视图使用的 authenticate。
+
+    Django 自带的 aauthenticate 只是 sync_to_async(authenticate)，所有调用挤在同一个
+    thread-sensitive 线程里串行等待进程池；这里对提供了原生 aauthenticate 的后端直接 await。
+    """
+    for backend in get_backends():
+        backend_path = f'{backend.__module__}.{backend.__class__.__name__}'
+        method = getattr(backend, 'aauthenticate', None)
+        try:
+            if method is not None and iscoroutinefunction(method):
+                user = await method(request, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is not None:
+            user.backend = backend_path
+            return user
+    user_login_failed.send(
+        sender=__name__,
+        credentials={key: value for key, value in credentials.items() if key != 'password'},
+        request=request,
+    )
+    return None
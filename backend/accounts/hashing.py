@@ -0,0 +1,269 @@
+"""在独立进程池中计算密码哈希，并按排队数做准入控制。
+
+PBKDF2 等哈希每次要几百毫秒 CPU，放在请求线程里算时，登录洪峰会占满所有 worker，
+连验证码这类廉价请求也一起排队。这里把哈希交给固定大小的进程池，排队数达到上限时立即
+抛出 HashingBusy（附带建议的重试秒数），请求线程不会被无限期占用。
+
+只有在 reject_when_busy() 范围内（登录 / 注册 API 视图，能把它转换成 503）排满才会抛出
+HashingBusy；Django 管理后台登录、shell 等其他调用方排满时退回在当前线程计算，不会得到 500。
+
+本模块会在子进程中被导入，不能在模块级别引用模型。
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class HashingBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+    def __init__(self, message: str, retry_after: int = 1) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# region worker functions
+def _init_worker(hashers: list[str]) -> None:
+    # spawn 出来的子进程只需要密码哈希相关的配置，不必完整初始化 Django
+    if not settings.configured:
+        settings.configure(PASSWORD_HASHERS=hashers)
+
+
+def _make(password: str) -> str:
+    return make_password(password)
+
+
+def _verify(password: str, encoded: str) -> tuple[bool, str | None]:
+    """返回 (是否匹配, 需要升级时的新哈希)；升级逻辑与 Django 的 check_password(setter=...) 一致。"""
+    if not check_password(password, encoded):
+        return False, None
+    preferred = get_hasher('default')
+    if identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded):
+        return True, make_password(password)
+    return True, None
+# endregion
+
+
+class PasswordHashExecutor:
+    def __init__(self, *, workers: int = 0, max_pending: int = 0, start_method: str = 'spawn') -> None:
+        self.workers = max(int(workers) or os.cpu_count() or 1, 1)
+        self.max_pending = max(int(max_pending) or self.workers * 2, 1)
+        self.start_method = start_method
+        self.rejected = 0
+        self._pending = 0
+        self._avg_seconds = 0.0
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+
+    def check_capacity(self) -> None:
+        """排队已满时立即拒绝；登录视图在核销验证码之前调用，避免验证码被白白消耗。"""
+        with self._lock:
+            self._admit()
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            self._admit()
+            self._pending += 1
+        started = time.perf_counter()
+        try:
+            future = self._submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(lambda done: self._finished(done, time.perf_counter() - started))
+        return future
+
+    def hash_password(self, password: str) -> str:
+        return self.submit(_make, password).result()
+
+    def verify_password(self, password: str, encoded: str) -> tuple[bool, str | None]:
+        return self.submit(_verify, password, encoded).result()
+
+    async def ahash_password(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(_make, password))
+
+    async def averify_password(self, password: str, encoded: str) -> tuple[bool, str | None]:
+        return await asyncio.wrap_future(self.submit(_verify, password, encoded))
+
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _submit(self, fn, *args) -> Future:
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # 子进程异常退出后进程池不可再用，重建一次
+            self._discard(pool)
+            return self._get_pool().submit(fn, *args)
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        pool = self._pool
+        if pool is not None:
+            return pool
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(list(settings.PASSWORD_HASHERS),),
+                )
+            return self._pool
+
+    def _finished(self, future: Future, elapsed: float) -> None:
+        with self._lock:
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                # 本次请求照常失败，但下一次提交会换一个新的进程池
+                self._pool = None
+            self._pending -= 1
+            # 指数滑动平均的单次耗时（含排队），用于估算 Retry-After
+            self._avg_seconds = elapsed if not self._avg_seconds else 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    def _admit(self) -> None:
+        # 调用方需持有 self._lock
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusy('服务繁忙，请稍后再试', self._retry_after())
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_seconds * self._pending / self.workers))
+
+
+_executor_lock = threading.Lock()
+_executor: PasswordHashExecutor | None = None
+
+
+def get_hash_executor() -> PasswordHashExecutor | None:
+    """按 PASSWORD_HASHING 配置返回共享的进程池；未启用时返回 None，在当前线程计算哈希。"""
+    global _executor
+    options = getattr(settings, 'PASSWORD_HASHING', {}) or {}
+    if not options.get('POOL', False):
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = PasswordHashExecutor(
+                    workers=options.get('WORKERS', 0),
+                    max_pending=options.get('MAX_PENDING', 0),
+                    start_method=options.get('START_METHOD', 'spawn'),
+                )
+    return _executor
+
+
+def reset_hash_executor() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting, **kwargs) -> None:
+    if setting in ('PASSWORD_HASHING', 'PASSWORD_HASHERS'):
+        reset_hash_executor()
+
+
+# region helpers
+# ContextVar 会随 sync_to_async 传入线程，异步视图中同样生效
+_reject_when_busy: ContextVar[bool] = ContextVar('reject_when_busy', default=False)
+
+
+@contextmanager
+def reject_when_busy():
+    """范围内排队已满时抛出 HashingBusy，由调用方转换成 503；范围外退回在当前线程计算。"""
+    token = _reject_when_busy.set(True)
+    try:
+        yield
+    finally:
+        _reject_when_busy.reset(token)
+
+
+def check_hash_capacity() -> None:
+    executor = get_hash_executor()
+    if executor is not None:
+        executor.check_capacity()
+
+
+def hash_password(password: str) -> str:
+    executor = get_hash_executor()
+    if executor is not None:
+        try:
+            return executor.hash_password(password)
+        except HashingBusy:
+            if _reject_when_busy.get():
+                raise
+    return _make(password)
+
+
+def verify_password(password: str, encoded: str) -> tuple[bool, str | None]:
+    executor = get_hash_executor()
+    if executor is not None:
+        try:
+            return executor.verify_password(password, encoded)
+        except HashingBusy:
+            if _reject_when_busy.get():
+                raise
+    return _verify(password, encoded)
+
+
+async def ahash_password(password: str) -> str:
+    executor = get_hash_executor()
+    if executor is not None:
+        try:
+            return await executor.ahash_password(password)
+        except HashingBusy:
+            if _reject_when_busy.get():
+                raise
+    return _make(password)
+
+
+async def averify_password(password: str, encoded: str) -> tuple[bool, str | None]:
+    executor = get_hash_executor()
+    if executor is not None:
+        try:
+            return await executor.averify_password(password, encoded)
+        except HashingBusy:
+            if _reject_when_busy.get():
+                raise
+    return _verify(password, encoded)
+# endregion
+
+
+__all__ = [
+    'HashingBusy',
+    'PasswordHashExecutor',
+    'ahash_password',
+    'averify_password',
+    'check_hash_capacity',
+    'get_hash_executor',
+    'hash_password',
+    'reject_when_busy',
+    'reset_hash_executor',
+    'verify_password',
+]
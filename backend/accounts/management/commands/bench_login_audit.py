@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts.audit import LoginAuditWriter
+from accounts.models import LoginRecord, User
+from captcha.loadtest import run_threads
+
+
+class Command(BaseCommand):
+    help = '对比逐条写入与缓冲批量写入登录记录的吞吐量与单次登录的写库延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=5000, help='每种方式写入的记录数')
+        parser.add_argument('--concurrency', type=int, default=4, help='模拟并发登录的线程数')
+        parser.add_argument('--max-batch', type=int, default=200)
+        parser.add_argument('--max-delay-ms', type=float, default=200)
+        parser.add_argument('--keep', action='store_true', help='保留压测写入的记录')
+
+    def handle(self, *args, **options):
+        total = max(options['records'], 1)
+        user, _ = User.objects.get_or_create(username='bench_login_audit', defaults={'email': 'bench@example.com'})
+        writer = LoginAuditWriter(max_batch=options['max_batch'], max_delay=options['max_delay_ms'] / 1000)
+
+        def record(i: int) -> LoginRecord:
+            return LoginRecord(
+                user=user,
+                ip_address=f'10.0.{i // 256 % 256}.{i % 256}',
+                success=i % 3 != 0,
+                captcha_type='slider',
+                message='bench',
+            )
+
+        def direct(i: int) -> bool:
+            record(i).save()
+            return True
+
+        def buffered(i: int) -> bool:
+            return writer.submit(record(i))
+
+        results = {}
+        for name, task in (('direct', direct), ('buffered', buffered)):
+            started = time.perf_counter()
+            summary = run_threads(task, total, options['concurrency'])
+            if name == 'buffered':
+                writer.flush()
+            elapsed = time.perf_counter() - started
+            connections.close_all()
+            summary['records_per_second'] = round(total / elapsed)
+            results[name] = summary
+            self.stdout.write(
+                f"{name:<9} {total / elapsed:>9.0f} 条/秒  请求内 p50 {summary['p50_ms']:.3f} ms  "
+                f"p99 {summary['p99_ms']:.3f} ms"
+            )
+        writer.stop()
+        results['buffered']['dropped'] = writer.dropped
+
+        if not options['keep']:
+            user.delete()
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
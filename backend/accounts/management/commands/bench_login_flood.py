@@ -0,0 +1,164 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from accounts.audit import get_audit_writer
+from accounts.hashing import get_hash_executor
+from captcha.loadtest import summarize
+
+BENCH_USER = 'bench_login_flood'
+BENCH_PASSWORD = 'BenchFlood123!'
+INVISIBLE_ANSWER = {'honeypot': '', 'duration': 5}
+MODES = ('baseline', 'inline', 'pooled')
+
+# 同一 IP 的大量请求不能被限流或升级拦下，否则测到的是限流而不是哈希的影响
+OFFLINE_SETTINGS = {
+    'CAPTCHA_RATE_LIMIT': {'ENABLED': False},
+    'CAPTCHA_RISK': {'ENABLED': False},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        '模拟登录洪峰：按固定速率向有限的服务线程投递登录与验证码请求，'
+        '对比无洪峰、请求线程内哈希与进程池哈希三种情况下验证码接口的延迟'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='模拟的服务端工作线程数')
+        parser.add_argument('--seconds', type=float, default=2.0, help='投递请求的时长')
+        parser.add_argument('--login-rate', type=float, default=10.0, help='每秒投递的登录请求数')
+        parser.add_argument('--captcha-rate', type=float, default=50.0, help='每秒投递的验证码请求数')
+        parser.add_argument('--workers', type=int, default=0, help='哈希进程数，0 表示 CPU 核数')
+        parser.add_argument('--max-pending', type=int, default=0, help='哈希排队上限，0 表示 workers*2')
+        parser.add_argument('--modes', default=','.join(MODES), help='逗号分隔：baseline / inline / pooled')
+
+    def handle(self, *args, **options):
+        self.threads = max(options['threads'], 1)
+        self.seconds = max(options['seconds'], 0.1)
+        self.local = threading.local()
+        pooled = {
+            'POOL': True,
+            'WORKERS': options['workers'],
+            'MAX_PENDING': options['max_pending'],
+            'START_METHOD': 'spawn',
+        }
+        user = self._bench_user()
+        results = {}
+        # 被拒绝的登录会以 503 记入 django.request 日志，压测期间不输出
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            for mode in (name.strip() for name in options['modes'].split(',') if name.strip()):
+                hashing = pooled if mode == 'pooled' else {'POOL': False}
+                login_rate = 0.0 if mode == 'baseline' else options['login_rate']
+                with override_settings(PASSWORD_HASHING=hashing, **OFFLINE_SETTINGS):
+                    executor = get_hash_executor()
+                    if executor is not None:
+                        # 进程池首次使用要启动子进程，不计入结果
+                        executor.hash_password('warmup')
+                    results[mode] = self._run(login_rate, options['captcha_rate'])
+                    if executor is not None:
+                        results[mode]['hash_workers'] = executor.workers
+                        results[mode]['hash_max_pending'] = executor.max_pending
+                self._print_row(mode, results[mode])
+        finally:
+            request_logger.disabled = False
+            writer = get_audit_writer()
+            if writer is not None:
+                writer.flush(5)
+            user.delete()
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
+
+    def _bench_user(self):
+        User = get_user_model()
+        User.objects.filter(username=BENCH_USER).delete()
+        return User.objects.create_user(username=BENCH_USER, password=BENCH_PASSWORD, email='bench@example.com')
+
+    def _client(self) -> Client:
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+        return client
+
+    def _verified_token(self, client: Client) -> str:
+        challenge = client.post('/api/captcha/request', {'type': 'invisible'}, content_type='application/json').json()
+        token = challenge['data']['token']
+        client.post('/api/captcha/verify', {'token': token, 'answer': INVISIBLE_ANSWER}, content_type='application/json')
+        return token
+
+    def _run(self, login_rate: float, captcha_rate: float) -> dict:
+        # 每个登录请求需要一个已通过的验证码凭证，提前准备好，不计入洪峰
+        setup = Client()
+        tokens = [self._verified_token(setup) for _ in range(int(login_rate * self.seconds))]
+        schedule = sorted(
+            [(index / login_rate, 'login', token) for index, token in enumerate(tokens)]
+            + [(index / captcha_rate, 'captcha', None) for index in range(int(captcha_rate * self.seconds))],
+            key=lambda item: item[0],
+        )
+
+        latencies = {'login': [], 'captcha': []}
+        outcomes = {'accepted': 0, 'rejected': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def handle(kind: str, token: str | None, due: float) -> None:
+            client = self._client()
+            if kind == 'login':
+                response = client.post(
+                    '/api/login',
+                    {'username': BENCH_USER, 'password': BENCH_PASSWORD, 'captcha_token': token},
+                    content_type='application/json',
+                )
+                outcome = (
+                    'rejected' if response.status_code == 503
+                    else 'accepted' if response.json().get('success') else 'failed'
+                )
+            else:
+                client.post('/api/captcha/request', {'type': 'arithmetic'}, content_type='application/json')
+                outcome = None
+            # 延迟从计划投递时刻算起，包含等待空闲服务线程的时间
+            elapsed = time.perf_counter() - due
+            with lock:
+                latencies[kind].append(elapsed)
+                if outcome:
+                    outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for offset, kind, token in schedule:
+                due = started + offset
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(handle, kind, token, due)
+        elapsed = time.perf_counter() - started
+
+        captcha = summarize(latencies['captcha'], elapsed, 0)
+        result = {
+            'seconds': round(elapsed, 3),
+            'captcha': {key: captcha[key] for key in ('requests', 'p50_ms', 'p95_ms', 'p99_ms')},
+            'captcha_max_ms': round(max(latencies['captcha'], default=0) * 1000, 3),
+        }
+        if latencies['login']:
+            login = summarize(latencies['login'], elapsed, 0)
+            result['login'] = {key: login[key] for key in ('requests', 'p50_ms', 'p95_ms', 'p99_ms')}
+            result['login'].update(outcomes)
+        return result
+
+    def _print_row(self, mode: str, result: dict) -> None:
+        captcha = result['captcha']
+        line = (
+            f"{mode:<9} 验证码 p50 {captcha['p50_ms']:>9.1f} ms  p95 {captcha['p95_ms']:>9.1f} ms  "
+            f"p99 {captcha['p99_ms']:>9.1f} ms  总耗时 {result['seconds']:.1f} s"
+        )
+        login = result.get('login')
+        if login:
+            line += f"  登录 成功 {login['accepted']} / 拒绝 {login['rejected']} / 失败 {login['failed']}"
+        self.stdout.write(line)
@@ -0,0 +1,97 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from accounts.usernames import _GROWTH, BloomFilter, UsernameIndex, index_key
+
+
+def _keys(prefix: str, start: int, stop: int) -> list[bytes]:
+    return [index_key(f'{prefix}{i:08d}') for i in range(start, stop)]
+
+
+class Command(BaseCommand):
+    help = '用合成用户名测量用户名索引的内存占用、构建速度、查询耗时与实际误判率，并与精确集合对比'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000_000, help='载入的用户名数量')
+        parser.add_argument('--error-rates', default='0.01,0.001', help='逗号分隔的目标误判率')
+        parser.add_argument('--probes', type=int, default=1_000_000, help='用于统计误判率的不存在用户名数量')
+        parser.add_argument('--exact-sample', type=int, default=1_000_000, help='精确集合按该样本量测内存后线性外推')
+        parser.add_argument('--chunk-size', type=int, default=100_000)
+        parser.add_argument('--db', action='store_true', help='另外从当前数据库构建一次索引并输出耗时')
+
+    def handle(self, *args, **options):
+        users = max(options['users'], 1)
+        chunk_size = max(options['chunk_size'], 1)
+        # 查询耗时包含 index_key 的规范化，与 might_exist 一致
+        probes = [f'bot{i:08d}' for i in range(max(options['probes'], 1))]
+        results = {'users': users, 'bloom': {}}
+
+        for error_rate in (float(value) for value in options['error_rates'].split(',') if value.strip()):
+            # 与 UsernameIndex 一致，按用户数的 _GROWTH 倍预留容量
+            bloom = BloomFilter(int(users * _GROWTH), error_rate)
+            started = time.perf_counter()
+            for start in range(0, users, chunk_size):
+                bloom.update(_keys('user', start, min(start + chunk_size, users)))
+            build_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            false_positives = sum(1 for name in probes if index_key(name) in bloom)
+            miss_us = (time.perf_counter() - started) / len(probes) * 1e6
+            hits = [f'user{i:08d}' for i in range(min(users, 100_000))]
+            started = time.perf_counter()
+            assert all(index_key(name) in bloom for name in hits)
+            hit_us = (time.perf_counter() - started) / len(hits) * 1e6
+
+            row = {
+                'capacity': bloom.capacity,
+                'hashes': bloom.hashes,
+                'mib': round(bloom.nbytes / 2 ** 20, 2),
+                'bits_per_user': round(bloom.nbytes * 8 / users, 2),
+                'build_seconds': round(build_seconds, 2),
+                'build_per_second': round(users / build_seconds),
+                'expected_error_rate': round(bloom.expected_error_rate(), 6),
+                'measured_error_rate': round(false_positives / len(probes), 6),
+                'lookup_miss_us': round(miss_us, 3),
+                'lookup_hit_us': round(hit_us, 3),
+            }
+            results['bloom'][str(error_rate)] = row
+            self.stdout.write(
+                f"布隆 p={error_rate:<6} {row['mib']:>8.2f} MiB  {row['bits_per_user']:>5.2f} bit/用户  k={row['hashes']:<2} "
+                f"实测误判 {row['measured_error_rate']:.4%}（理论 {row['expected_error_rate']:.4%}）  "
+                f"构建 {row['build_seconds']:.1f} s  查询 miss {miss_us:.2f} µs / hit {hit_us:.2f} µs"
+            )
+            del bloom
+
+        sample = min(max(options['exact_sample'], 1), users)
+        tracemalloc.start()
+        exact = set()
+        for start in range(0, sample, chunk_size):
+            exact.update(_keys('user', start, min(start + chunk_size, sample)))
+        used, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        started = time.perf_counter()
+        for name in probes:
+            index_key(name) in exact
+        lookup_us = (time.perf_counter() - started) / len(probes) * 1e6
+        results['exact'] = {
+            'sample': sample,
+            'bytes_per_user': round(used / sample, 1),
+            'mib': round(used / sample * users / 2 ** 20, 1),
+            'lookup_us': round(lookup_us, 3),
+        }
+        del exact
+        self.stdout.write(
+            f"精确集合      {results['exact']['mib']:>8.1f} MiB  {results['exact']['bytes_per_user']:.1f} 字节/用户"
+            f"（按 {sample} 个样本外推）  查询 {lookup_us:.2f} µs"
+        )
+
+        if options['db']:
+            index = UsernameIndex(refresh_interval=0)
+            index.build()
+            results['db'] = {'users': len(index._members), 'build_seconds': round(index.build_seconds, 3)}
+            self.stdout.write(f"数据库构建    {len(index._members)} 个用户名，耗时 {index.build_seconds:.3f} s")
+
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
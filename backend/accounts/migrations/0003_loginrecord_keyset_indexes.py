@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial_users'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='loginrecord',
+            options={'ordering': ['-login_time', '-id'], 'verbose_name': '登录记录', 'verbose_name_plural': '登录记录'},
+        ),
+        migrations.AddIndex(
+            model_name='loginrecord',
+            index=models.Index(fields=['-login_time', '-id'], name='accounts_lr_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginrecord',
+            index=models.Index(fields=['user', '-login_time', '-id'], name='accounts_lr_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginrecord',
+            index=models.Index(fields=['ip_address', '-login_time', '-id'], name='accounts_lr_ip_time_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_loginrecord_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loginrecord',
+            name='login_time',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='登录时间'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -15,7 +16,8 @@ class User(AbstractUser):
 
 class LoginRecord(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_records')
-    login_time = models.DateTimeField('登录时间', auto_now_add=True)
+    # 由入队时的默认值决定，批量写入不会把时间推迟到落库时刻
+    login_time = models.DateTimeField('登录时间', default=timezone.now, editable=False)
     ip_address = models.CharField('IP地址', max_length=64)
     success = models.BooleanField('是否成功', default=False)
     captcha_type = models.CharField('验证码类型', max_length=50)
@@ -24,7 +26,13 @@ class LoginRecord(models.Model):
     class Meta:
         verbose_name = '登录记录'
         verbose_name_plural = '登录记录'
-        ordering = ['-login_time']
+        ordering = ['-login_time', '-id']
+        # 后台按 (login_time, id) 游标分页，按用户 / IP 筛选时同样沿该顺序扫描
+        indexes = [
+            models.Index(fields=['-login_time', '-id'], name='accounts_lr_time_id_idx'),
+            models.Index(fields=['user', '-login_time', '-id'], name='accounts_lr_user_time_idx'),
+            models.Index(fields=['ip_address', '-login_time', '-id'], name='accounts_lr_ip_time_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.username} @ {self.login_time}"
@@ -0,0 +1,112 @@
+import base64
+import csv
+import json
+from datetime import datetime
+from typing import Iterator
+
+from django.db.models import Q, QuerySet
+
+from .models import LoginRecord
+
+EXPORT_FIELDS = ('id', 'username', 'login_time', 'ip_address', 'success', 'captcha_type', 'message')
+_VALUE_FIELDS = ('id', 'user__username', 'login_time', 'ip_address', 'success', 'captcha_type', 'message')
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class InvalidQuery(ValueError):
+    """Raised when a filter or cursor parameter cannot be parsed."""
+
+
+def _parse_time(raw: str, name: str) -> datetime:
+    for fmt in (_TIME_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError as exc:
+        raise InvalidQuery(f'{name} 时间格式应为 YYYY-MM-DD HH:MM:SS') from exc
+
+
+def filter_login_records(params) -> QuerySet:
+    """按 username / ip / success / captcha_type / since / until 过滤，结果按 (login_time, id) 倒序。"""
+    queryset = LoginRecord.objects.all()
+    if params.get('username'):
+        queryset = queryset.filter(user__username=params['username'])
+    if params.get('ip'):
+        queryset = queryset.filter(ip_address=params['ip'])
+    if params.get('captcha_type'):
+        queryset = queryset.filter(captcha_type=params['captcha_type'])
+    success = params.get('success')
+    if success not in (None, ''):
+        if success.lower() not in ('true', 'false', '1', '0'):
+            raise InvalidQuery('success 只能是 true 或 false')
+        queryset = queryset.filter(success=success.lower() in ('true', '1'))
+    if params.get('since'):
+        queryset = queryset.filter(login_time__gte=_parse_time(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(login_time__lt=_parse_time(params['until'], 'until'))
+    return queryset.order_by('-login_time', '-id')
+
+
+def encode_cursor(login_time: datetime, record_id: int) -> str:
+    raw = f'{login_time.isoformat()}|{record_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        login_time, _, record_id = raw.partition('|')
+        return datetime.fromisoformat(login_time), int(record_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidQuery('cursor 无效') from exc
+
+
+def page_login_records(queryset: QuerySet, cursor: str | None, limit: int) -> tuple[list[dict], str | None]:
+    """游标分页：取 (login_time, id) 严格小于游标的下一页，任何深度的翻页都只走索引范围扫描。"""
+    if cursor:
+        login_time, record_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(login_time__lt=login_time) | Q(login_time=login_time, id__lt=record_id))
+    rows = list(queryset.values(*_VALUE_FIELDS)[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['login_time'], rows[-1]['id'])
+    return [_serialize(row) for row in rows], next_cursor
+
+
+def _serialize(row: dict) -> dict:
+    return {
+        'id': row['id'],
+        'username': row['user__username'],
+        'login_time': row['login_time'].strftime(_TIME_FORMAT),
+        'ip_address': row['ip_address'],
+        'success': row['success'],
+        'captcha_type': row['captcha_type'],
+        'message': row['message'],
+    }
+
+
+class _Echo:
+    """csv.writer 的伪文件对象，write 直接返回写入的行，交给 StreamingHttpResponse 输出。"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_export(queryset: QuerySet, fmt: str, chunk_size: int = 2000) -> Iterator[str]:
+    """逐行产出 CSV 或 NDJSON；.iterator() 分块读取，导出任意行数时内存占用恒定。"""
+    rows = queryset.values(*_VALUE_FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(_serialize(row), ensure_ascii=False) + '\n'
+        return
+
+    writer = csv.writer(_Echo())
+    # 带 BOM，Excel 打开时能正确识别中文
+    yield '\ufeff' + writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        record = _serialize(row)
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS])
@@ -7,4 +7,5 @@ urlpatterns = [
     path('login', views.login_view, name='login'),
     path('admin/login', views.admin_login, name='admin_login'),
     path('admin/login_records', views.admin_login_records, name='admin_login_records'),
+    path('admin/login_records/export', views.admin_login_records_export, name='admin_login_records_export'),
 ]
@@ -0,0 +1,312 @@
+"""进程内的用户名成员索引，用来在查库之前排除一定不存在的用户名。
+
+默认使用布隆过滤器，按用户数的 1.5 倍预留容量：目标误判率 1% 时千万用户约占 17 MiB，
+实测误判率约 0.13%（容量用满时为 1%）；MODE=exact 时改用精确集合，没有误判，但每个用户名约 79 字节，
+千万用户约 750 MiB。
+索引只是参考：它不会漏报已载入的用户名，但其他进程刚注册、批量写入、事务乱序提交或被改名的用户
+在下一次载入之前都可能被判为“不存在”。因此只能用在漏判可以容忍的地方——注册查重（由唯一约束兜底）
+和登录失败时查找用户写记录——不能用于认证或任何据此拒绝请求的判断。
+
+索引在后台线程中用 .iterator() 分批构建，构建完成之前一律视为可能存在；本进程注册的用户由 post_save
+信号即时加入，其他进程注册的用户每 REFRESH_SECONDS 秒按主键增量载入，每 REBUILD_SECONDS 秒完整重建一次，
+改名和乱序提交漏掉的用户名最迟在重建后补上。
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+import unicodedata
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 没有 numpy 时逐个写入
+    np = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_LN2 = math.log(2)
+_MASK64 = (1 << 64) - 1
+# 按当前用户数的 1.5 倍预留容量，至少 10 万；超出容量后在后台按新的用户数重建
+_GROWTH = 1.5
+_MIN_CAPACITY = 100_000
+
+
+def index_key(username: str) -> bytes:
+    # 与 normalize_username 一样做 NFKC，再忽略大小写：只会让“可能存在”变多，
+    # 在大小写不敏感的排序规则（如 SQL Server 默认）下也不会漏判
+    return unicodedata.normalize('NFKC', username).casefold().encode('utf-8')
+
+
+class BloomFilter:
+    """固定容量的布隆过滤器，接口与 set 的 add / update / in 一致。
+
+    k 个位置由 blake2b 的两段 64 位摘要做双重哈希得到：(h1 + i*h2) mod 2^64 mod m。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        if not 0 < error_rate < 1:
+            raise ValueError('误判率必须在 0 与 1 之间')
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(math.ceil(-self.capacity * math.log(error_rate) / _LN2 ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * _LN2), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _digest(self, key: bytes) -> tuple[int, int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def _positions(self, key: bytes) -> Iterator[int]:
+        h1, h2 = self._digest(key)
+        for i in range(self.hashes):
+            yield ((h1 + i * h2) & _MASK64) % self.size
+
+    def add(self, key: bytes) -> None:
+        with self._lock:
+            for position in self._positions(key):
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def update(self, keys: Iterable[bytes]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        digests = np.frombuffer(
+            b''.join(hashlib.blake2b(key, digest_size=16).digest() for key in keys), dtype='<u8'
+        ).reshape(-1, 2)
+        h1, h2 = digests[:, 0], digests[:, 1] | np.uint64(1)
+        rounds = np.arange(self.hashes, dtype=np.uint64)
+        # uint64 运算自然按 2^64 取模，与逐个写入时的结果一致
+        positions = ((h1[:, None] + rounds[None, :] * h2[:, None]) % np.uint64(self.size)).ravel()
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        with self._lock:
+            bits = np.frombuffer(self._bits, dtype=np.uint8)
+            np.bitwise_or.at(bits, (positions >> np.uint64(3)).astype(np.intp), masks)
+            self.count += len(keys)
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def expected_error_rate(self) -> float:
+        """按当前元素数估算的误判率 (1 - e^(-kn/m))^k。"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class UsernameIndex:
+    def __init__(
+        self,
+        *,
+        mode: str = 'bloom',
+        error_rate: float = 0.01,
+        refresh_interval: float = 5.0,
+        rebuild_interval: float = 600.0,
+        chunk_size: int = 10_000,
+    ) -> None:
+        if mode not in ('bloom', 'exact'):
+            raise ValueError(f'未知的用户名索引类型：{mode}')
+        self.mode = mode
+        self.error_rate = error_rate
+        self.refresh_interval = max(float(refresh_interval), 0.0)
+        self.rebuild_interval = max(float(rebuild_interval), 0.0)
+        self.chunk_size = max(int(chunk_size), 1)
+        self.ready = False
+        self.build_seconds = 0.0
+        self._members: BloomFilter | set = set()
+        self._building: BloomFilter | set | None = None
+        self._last_pk = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def might_exist(self, username: str) -> bool:
+        """False 表示该用户名一定不存在；构建完成之前总是返回 True。"""
+        if not self.ready:
+            return True
+        return index_key(username) in self._members
+
+    def add(self, username: str) -> None:
+        key = index_key(username)
+        self._members.add(key)
+        building = self._building
+        if building is not None:
+            building.add(key)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name='username-index', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        # 不等待线程退出：正在进行的构建可能要几十秒，结束后线程会在下一次等待时退出
+        self._stopped.set()
+        self._thread = None
+
+    def build(self) -> None:
+        """从数据库完整载入一次；载入期间新注册的用户名会同时写入新旧两份索引。"""
+        from django.contrib.auth import get_user_model
+
+        started = time.perf_counter()
+        manager = get_user_model()._default_manager
+        members = self._new_members(manager.count())
+        with self._lock:
+            self._building = members
+        try:
+            last_pk = self._load(members, manager.order_by('pk'))
+            with self._lock:
+                self._members = members
+                self._last_pk = max(self._last_pk, last_pk)
+                self.ready = True
+        finally:
+            with self._lock:
+                self._building = None
+        self.build_seconds = time.perf_counter() - started
+
+    def refresh(self) -> int:
+        """载入主键大于上次所见的用户（其他进程新注册的），返回载入数量。"""
+        from django.contrib.auth import get_user_model
+
+        manager = get_user_model()._default_manager
+        members = self._members
+        before = len(members)
+        last_pk = self._load(members, manager.filter(pk__gt=self._last_pk).order_by('pk'))
+        self._last_pk = max(self._last_pk, last_pk)
+        if isinstance(members, BloomFilter) and len(members) > members.capacity:
+            logger.info('用户名索引超出容量 %s，重建', members.capacity)
+            self.build()
+        return len(members) - before
+
+    def _load(self, members, queryset) -> int:
+        last_pk = 0
+        chunk: list[bytes] = []
+        rows = queryset.values_list('pk', queryset.model.USERNAME_FIELD).iterator(chunk_size=self.chunk_size)
+        for pk, username in rows:
+            chunk.append(index_key(username))
+            last_pk = pk
+            if len(chunk) >= self.chunk_size:
+                members.update(chunk)
+                chunk = []
+        members.update(chunk)
+        return last_pk
+
+    def _new_members(self, users: int) -> BloomFilter | set:
+        if self.mode == 'exact':
+            return set()
+        return BloomFilter(max(int(users * _GROWTH), _MIN_CAPACITY), self.error_rate)
+
+    def _run(self) -> None:
+        try:
+            self.build()
+            logger.info('用户名索引已载入 %s 个用户名，耗时 %.1f 秒', len(self._members), self.build_seconds)
+        except Exception:  # pragma: no cover - 构建失败时保持“可能存在”，不影响正确性
+            logger.exception('构建用户名索引失败')
+            return
+        finally:
+            close_old_connections()
+        if self.refresh_interval <= 0:
+            return
+        built_at = time.monotonic()
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                # 按主键增量载入会漏掉改名和乱序提交的用户，定期完整重建一次
+                if self.rebuild_interval and time.monotonic() - built_at >= self.rebuild_interval:
+                    self.build()
+                    built_at = time.monotonic()
+                else:
+                    self.refresh()
+            except Exception:  # pragma: no cover - 后台线程不能退出
+                logger.exception('增量载入用户名失败')
+            finally:
+                close_old_connections()
+
+
+_index_lock = threading.Lock()
+_index: UsernameIndex | None = None
+
+
+def get_username_index() -> UsernameIndex | None:
+    """返回本进程共享的用户名索引，首次调用时在后台开始构建；未启用时返回 None。"""
+    global _index
+    options = getattr(settings, 'USERNAME_INDEX', {}) or {}
+    if not options.get('ENABLED', False):
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = UsernameIndex(
+                    mode=options.get('MODE', 'bloom'),
+                    error_rate=float(options.get('ERROR_RATE', 0.01)),
+                    refresh_interval=float(options.get('REFRESH_SECONDS', 5)),
+                    rebuild_interval=float(options.get('REBUILD_SECONDS', 600)),
+                )
+                index.start()
+                _index = index
+    return _index
+
+
+def reset_username_index() -> None:
+    global _index
+    with _index_lock:
+        index, _index = _index, None
+    if index is not None:
+        index.stop()
+
+
+def username_might_exist(username: str) -> bool:
+    """False 只是“大概率不存在”，调用方必须能容忍漏判（见模块说明）。"""
+    index = get_username_index()
+    return index is None or index.might_exist(username)
+
+
+def remember_username(username: str) -> None:
+    """把从数据库得知存在、但索引漏判的用户名补进索引。"""
+    index = _index
+    if index is not None:
+        index.add(username)
+
+
+def index_saved_username(sender, instance, **kwargs) -> None:
+    """post_save 接收器：新建或改名的用户即时加入已存在的索引（不会为此触发构建）。"""
+    index = _index
+    if index is not None:
+        index.add(instance.get_username())
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting, **kwargs) -> None:
+    if setting == 'USERNAME_INDEX':
+        reset_username_index()
+
+
+__all__ = [
+    'BloomFilter',
+    'UsernameIndex',
+    'get_username_index',
+    'index_key',
+    'index_saved_username',
+    'remember_username',
+    'reset_username_index',
+    'username_might_exist',
+]
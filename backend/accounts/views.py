@@ -3,13 +3,18 @@ from datetime import datetime
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.contrib.auth.models import update_last_login
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from captcha.services import CaptchaService
+from captcha.clientip import get_client_ip
+from captcha.services import get_captcha_service
 
-from .models import LoginRecord, User
+from .audit import audit_login
+from .hashing import HashingBusy, check_hash_capacity, hash_password, reject_when_busy
+from .models import User
+from .records import InvalidQuery, filter_login_records, iter_export, page_login_records
+from .usernames import remember_username, username_might_exist
 
 
 def build_response(success: bool, message: str, data=None) -> JsonResponse:
@@ -30,11 +35,18 @@ def parse_body(request) -> dict:
         return {}
 
 
-def get_client_ip(request) -> str:
-    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
-    if forwarded:
-        return forwarded.split(',')[0]
-    return request.META.get('REMOTE_ADDR', '0.0.0.0')
+def hashing_busy_response(exc: HashingBusy) -> JsonResponse:
+    response = build_response(False, str(exc), {'retryAfter': exc.retry_after})
+    response.status_code = 503
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def find_user(username: str):
+    """登录失败时查找用户以写登录记录；索引判为不存在的用户名不查库（漏判只会少写一条记录）。"""
+    if not username_might_exist(username):
+        return None
+    return User.objects.filter(username=username).first()
 
 
 @csrf_exempt
@@ -50,15 +62,28 @@ def register(request):
     if not username or not password or not email:
         return build_response(False, '用户名、密码、邮箱均不能为空')
 
-    if User.objects.filter(username=username).exists():
+    if username_might_exist(username) and User.objects.filter(username=username).exists():
         return build_response(False, '用户名已存在')
 
-    user = User.objects.create_user(
-        username=username,
-        password=password,
-        email=email,
+    # 与 create_user 等价，只是哈希交给进程池计算
+    try:
+        with reject_when_busy():
+            encoded = hash_password(password)
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
+    user = User(
+        username=User.normalize_username(username),
+        email=User.objects.normalize_email(email),
+        password=encoded,
         is_active=True,
     )
+    try:
+        with transaction.atomic():
+            user.save()
+    except IntegrityError:
+        # 其他进程刚注册的用户名可能还没载入本进程的索引，由唯一约束兜底
+        remember_username(username)
+        return build_response(False, '用户名已存在')
 
     return build_response(True, '注册成功', {'id': user.id, 'username': user.username})
 
@@ -82,7 +107,13 @@ def login_view(request):
 
     client_ip = get_client_ip(request)
 
-    captcha_service = CaptchaService()
+    # 哈希队列已满时在核销验证码之前拒绝，用户重试时无需重新做验证码
+    try:
+        check_hash_capacity()
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
+
+    captcha_service = get_captcha_service()
     if captcha_value is not None:
         captcha_ok, captcha_message, captcha_type = captcha_service.validate_and_consume(
             token=captcha_token,
@@ -95,11 +126,11 @@ def login_view(request):
             client_ip=client_ip,
         )
 
-    existing_user = User.objects.filter(username=username).first()
-
     if not captcha_ok:
+        captcha_service.record_login(client_ip=client_ip, username=username, success=False, captcha_passed=False)
+        existing_user = find_user(username)
         if existing_user:
-            LoginRecord.objects.create(
+            audit_login(
                 user=existing_user,
                 ip_address=client_ip,
                 success=False,
@@ -108,10 +139,16 @@ def login_view(request):
             )
         return build_response(False, captcha_message or '验证码验证失败')
 
-    user = authenticate(request, username=username, password=password)
+    try:
+        with reject_when_busy():
+            user = authenticate(request, username=username, password=password)
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
+    captcha_service.record_login(client_ip=client_ip, username=username, success=user is not None)
     if user is None:
+        existing_user = find_user(username)
         if existing_user:
-            LoginRecord.objects.create(
+            audit_login(
                 user=existing_user,
                 ip_address=client_ip,
                 success=False,
@@ -120,13 +157,11 @@ def login_view(request):
             )
         return build_response(False, '用户名或密码错误')
 
-    login(request, user)
+    # ip_address 与 last_login 由 user_logged_in 信号合并成一条 UPDATE 写入
     user.ip_address = client_ip
-    user.last_login = datetime.now()
-    user.save(update_fields=['ip_address', 'last_login'])
-    update_last_login(None, user)
+    login(request, user)
 
-    LoginRecord.objects.create(
+    audit_login(
         user=user,
         ip_address=client_ip,
         success=True,
@@ -149,14 +184,16 @@ def admin_login(request):
     if not username or not password:
         return build_response(False, '用户名和密码不能为空')
 
-    user = authenticate(request, username=username, password=password)
+    try:
+        with reject_when_busy():
+            user = authenticate(request, username=username, password=password)
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
     if user is None or not user.is_staff:
         return build_response(False, '管理员账号或密码错误')
 
-    login(request, user)
     user.ip_address = get_client_ip(request)
-    user.last_login = datetime.now()
-    user.save(update_fields=['ip_address', 'last_login'])
+    login(request, user)
 
     return build_response(True, '管理员登录成功', {'username': user.username})
 
@@ -164,17 +201,31 @@ def admin_login(request):
 @login_required
 @user_passes_test(lambda u: u.is_staff)
 def admin_login_records(request):
-    records = LoginRecord.objects.select_related('user').all()[:200]
-    data = [
-        {
-            'id': record.id,
-            'username': record.user.username,
-            'login_time': record.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'ip_address': record.ip_address,
-            'success': record.success,
-            'captcha_type': record.captcha_type,
-            'message': record.message,
-        }
-        for record in records
-    ]
-    return build_response(True, '获取成功', {'records': data})
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 500)
+    except ValueError:
+        return build_response(False, 'limit 必须是整数')
+    try:
+        queryset = filter_login_records(request.GET)
+        records, next_cursor = page_login_records(queryset, request.GET.get('cursor'), limit)
+    except InvalidQuery as exc:
+        return build_response(False, str(exc))
+    return build_response(True, '获取成功', {'records': records, 'next_cursor': next_cursor})
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def admin_login_records_export(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return build_response(False, 'format 只能是 csv 或 ndjson')
+    try:
+        queryset = filter_login_records(request.GET)
+    except InvalidQuery as exc:
+        return build_response(False, str(exc))
+
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(iter_export(queryset, fmt), content_type=content_type)
+    filename = f"login_records_{datetime.now().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,100 @@
+from django.contrib.auth import alogin
+from django.views.decorators.csrf import csrf_exempt
+
+from captcha.services import aget_captcha_service
+
+from .audit import aaudit_login
+from .backends import aauthenticate
+from .hashing import HashingBusy, check_hash_capacity, reject_when_busy
+from .models import User
+from .usernames import username_might_exist
+from .views import build_response, get_client_ip, hashing_busy_response, parse_body
+
+
+async def afind_user(username: str):
+    if not username_might_exist(username):
+        return None
+    return await User.objects.filter(username=username).afirst()
+
+
+@csrf_exempt
+async def login_view(request):
+    if request.method != 'POST':
+        return build_response(False, '仅支持POST请求')
+
+    data = parse_body(request)
+    username = data.get('username', '').strip()
+    password = data.get('password', '').strip()
+    captcha_token = data.get('captcha_token')
+    captcha_value = data.get('captcha_value')
+
+    if not username or not password:
+        return build_response(False, '用户名和密码不能为空')
+
+    if not captcha_token:
+        return build_response(False, '请先通过验证码验证')
+
+    client_ip = get_client_ip(request)
+
+    try:
+        check_hash_capacity()
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
+
+    captcha_service = await aget_captcha_service()
+    if captcha_value is not None:
+        captcha_ok, captcha_message, captcha_type = await captcha_service.avalidate_and_consume(
+            token=captcha_token,
+            user_answer=captcha_value,
+            client_ip=client_ip,
+        )
+    else:
+        captcha_ok, captcha_message, captcha_type = await captcha_service.aconsume_verified_token(
+            token=captcha_token,
+            client_ip=client_ip,
+        )
+
+    if not captcha_ok:
+        captcha_service.record_login(client_ip=client_ip, username=username, success=False, captcha_passed=False)
+        existing_user = await afind_user(username)
+        if existing_user:
+            await aaudit_login(
+                user=existing_user,
+                ip_address=client_ip,
+                success=False,
+                captcha_type=captcha_type or 'unknown',
+                message=f'验证码失败: {captcha_message}',
+            )
+        return build_response(False, captcha_message or '验证码验证失败')
+
+    try:
+        with reject_when_busy():
+            user = await aauthenticate(request, username=username, password=password)
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
+    captcha_service.record_login(client_ip=client_ip, username=username, success=user is not None)
+    if user is None:
+        existing_user = await afind_user(username)
+        if existing_user:
+            await aaudit_login(
+                user=existing_user,
+                ip_address=client_ip,
+                success=False,
+                captcha_type=captcha_type or 'unknown',
+                message='用户名或密码错误',
+            )
+        return build_response(False, '用户名或密码错误')
+
+    # ip_address 与 last_login 由 user_logged_in 信号合并成一条 UPDATE 写入
+    user.ip_address = client_ip
+    await alogin(request, user)
+
+    await aaudit_login(
+        user=user,
+        ip_address=client_ip,
+        success=True,
+        captcha_type=captcha_type or 'unknown',
+        message='登录成功',
+    )
+
+    return build_response(True, '登录成功', {'username': user.username, 'is_staff': user.is_staff})
@@ -1,7 +1,29 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def _bootstrap_captcha_types(sender, **kwargs) -> None:
+    from .services import CaptchaService
+
+    CaptchaService(bootstrap=False).ensure_types_exist()
 
 
 class CaptchaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'captcha'
     verbose_name = '验证码'
+
+    def ready(self) -> None:
+        # 这些模块会导入模型，只能在应用加载完成后导入
+        from . import checks  # noqa: F401 - 注册系统检查
+        from .cache import invalidate_type_cache
+        from .metrics import install_query_counter
+        from .models import CaptchaType
+
+        post_migrate.connect(_bootstrap_captcha_types, sender=self)
+        post_save.connect(invalidate_type_cache, sender=CaptchaType, dispatch_uid='captcha_type_cache_save')
+        post_delete.connect(invalidate_type_cache, sender=CaptchaType, dispatch_uid='captcha_type_cache_delete')
+        connection_created.connect(install_query_counter, dispatch_uid='captcha_query_counter')
+        # 过期挑战清理线程只在服务进程中启动（见 captcha_backend/wsgi.py 与 asgi.py），
+        # migrate、shell 与压测命令等一次性进程不会启动它
@@ -0,0 +1,131 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import CaptchaType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedCaptchaType:
+    type_name: str
+    description: str
+    enabled: bool
+    is_default: bool
+    config: dict = field(default_factory=dict)
+
+
+def parse_config(type_name: str, raw: str | None) -> dict:
+    if not raw:
+        return {}
+    try:
+        config = json.loads(raw)
+        return config if isinstance(config, dict) else {}
+    except json.JSONDecodeError:
+        logger.warning('验证码类型 %s 的配置不是有效的 JSON', type_name)
+        return {}
+
+
+class CaptchaTypeCache:
+    """进程内的验证码类型缓存。
+
+    本进程内的修改通过 invalidate() 立即生效；其他 worker 的修改通过定期比对
+    (行数, max(updated_at)) 版本号发现，最长延迟为 CAPTCHA_TYPE_CACHE_SECONDS 秒。
+    """
+
+    def __init__(self, check_interval: float | None = None) -> None:
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._types: dict[str, CachedCaptchaType] = {}
+        self._default_type = 'text'
+        self._version: tuple | None = None
+        self._checked_at = 0.0
+        # invalidate() 递增 _generation；只有成功重新载入后才把 _loaded_generation 追上，
+        # 查询失败或载入期间又有修改时，下一次访问仍会重新载入
+        self._generation = 1
+        self._loaded_generation = 0
+
+    @property
+    def check_interval(self) -> float:
+        if self._check_interval is not None:
+            return self._check_interval
+        return float(getattr(settings, 'CAPTCHA_TYPE_CACHE_SECONDS', 5))
+
+    def invalidate(self) -> None:
+        self._generation += 1
+
+    def get_default_type(self) -> str:
+        self._ensure_fresh()
+        return self._default_type
+
+    def get_enabled(self, type_name: str | None) -> CachedCaptchaType | None:
+        self._ensure_fresh()
+        captcha_type = self._types.get(type_name or '')
+        if captcha_type is None or not captcha_type.enabled:
+            return None
+        return captcha_type
+
+    def enabled_types(self) -> list[str]:
+        self._ensure_fresh()
+        return [name for name, captcha_type in self._types.items() if captcha_type.enabled]
+
+    def is_fresh(self) -> bool:
+        return self._loaded_generation == self._generation and time.monotonic() - self._checked_at < self.check_interval
+
+    async def aensure_fresh(self) -> None:
+        """异步视图使用：缓存有效时不切换线程，过期时在线程中刷新。"""
+        if not self.is_fresh():
+            await sync_to_async(self._ensure_fresh)()
+
+    def _ensure_fresh(self) -> None:
+        if self.is_fresh():
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.is_fresh():
+                return
+            generation = self._generation
+            version = self._fetch_version()
+            if generation != self._loaded_generation or version != self._version:
+                self._reload()
+                self._version = version
+            self._loaded_generation = generation
+            self._checked_at = now
+
+    def _fetch_version(self) -> tuple:
+        stats = CaptchaType.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        return stats['count'], stats['updated']
+
+    def _reload(self) -> None:
+        types: dict[str, CachedCaptchaType] = {}
+        for row in CaptchaType.objects.order_by('id'):
+            types[row.type_name] = CachedCaptchaType(
+                type_name=row.type_name,
+                description=row.description,
+                enabled=row.enabled,
+                is_default=row.is_default,
+                config=parse_config(row.type_name, row.config_json),
+            )
+        enabled = [captcha_type for captcha_type in types.values() if captcha_type.enabled]
+        default = next((captcha_type for captcha_type in enabled if captcha_type.is_default), None)
+        if default is None and enabled:
+            default = enabled[0]
+        self._types = types
+        self._default_type = default.type_name if default else 'text'
+
+
+type_cache = CaptchaTypeCache()
+
+
+def invalidate_type_cache(*args, **kwargs) -> None:
+    type_cache.invalidate()
+
+
+__all__ = ['CachedCaptchaType', 'CaptchaTypeCache', 'type_cache', 'invalidate_type_cache', 'parse_config']
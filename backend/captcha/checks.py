@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# 只在当前进程内可见的缓存后端，投递状态写在这里时其他 worker 查询不到
+PROCESS_LOCAL_CACHES = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+})
+
+
+@register(Tags.caches)
+def check_delivery_status_cache(app_configs, **kwargs) -> list:
+    """后台投递开启时，投递状态由投递线程写入、由任意 worker 的查询接口读取，生产环境必须使用共享缓存。"""
+    options = getattr(settings, 'CAPTCHA_DELIVERY', {}) or {}
+    if settings.DEBUG or not options.get('ASYNC', True):
+        return []
+    alias = options.get('STATUS_CACHE', 'default')
+    backend = (settings.CACHES.get(alias) or {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f'验证码投递状态使用的缓存 {alias!r}（{backend}）只在当前进程内可见，'
+            f'多进程部署时查询接口会返回“投递记录不存在”',
+            hint='设置 DJANGO_CACHE_REDIS_URL 使用共享缓存；确实只运行单个进程时可将 captcha.E001 加入 SILENCED_SYSTEM_CHECKS',
+            id='captcha.E001',
+        )
+    ]
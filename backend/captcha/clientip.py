@@ -0,0 +1,42 @@
+"""确定请求的客户端 IP，供限流、风险计数与挑战的 IP 绑定使用。
+
+X-Forwarded-For 由客户端随意填写，只有直连地址（REMOTE_ADDR）属于 CAPTCHA_TRUSTED_PROXIES 时才读取它：
+从右向左跳过可信代理追加的地址，取第一个不可信的地址，客户端伪造的左侧条目不会被采用。
+"""
+import ipaddress
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=8)
+def _parse_networks(proxies: tuple[str, ...]) -> tuple:
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip())
+
+
+def _trusted_networks() -> tuple:
+    return _parse_networks(tuple(getattr(settings, 'CAPTCHA_TRUSTED_PROXIES', ()) or ()))
+
+
+def _is_trusted(address: str, networks: tuple) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def get_client_ip(request) -> str:
+    remote = request.META.get('REMOTE_ADDR') or '0.0.0.0'
+    networks = _trusted_networks()
+    if not networks or not _is_trusted(remote, networks):
+        return remote
+    hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, networks):
+            return hop
+    # 整条链都是可信代理时取最左侧的地址
+    return hops[0] if hops else remote
+
+
+__all__ = ['get_client_ip']
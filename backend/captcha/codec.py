@@ -0,0 +1,129 @@
+"""挑战载荷与答案的序列化。
+
+载荷在生成时只编码一次，接口直接把编码结果拼进响应；答案按类型存成带前缀的紧凑字符串
+（如 ``s:137,5``、``g:0,4,7``），校验时只需切分字符串，不必完整解析 JSON。
+文本 / 邮件 / 短信 / 语音验证码只保存带密钥的 HMAC 摘要（``h:...``），挑战记录被缓存、
+复制到只读库或共享键值库时不会泄露验证码。
+结构不符合紧凑格式的答案（行为轨迹的阈值配置等）以及旧数据仍按 JSON 存取。
+"""
+import base64
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+
+_SEPARATORS = (',', ':')
+
+
+def encode_payload(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=_SEPARATORS)
+
+
+def _number(raw: str) -> int | float:
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def answer_digest(type_name: str, code: str) -> str:
+    """以 CAPTCHA_ANSWER_KEY（未配置时用 SECRET_KEY）为密钥计算验证码的 HMAC-SHA256 摘要。"""
+    key = getattr(settings, 'CAPTCHA_ANSWER_KEY', '') or settings.SECRET_KEY
+    mac = hmac.new(key.encode('utf-8'), f'{type_name}:{code}'.encode('utf-8'), hashlib.sha256)
+    return base64.urlsafe_b64encode(mac.digest()).rstrip(b'=').decode('ascii')
+
+
+def digest_matches(type_name: str, digest: str, code: str) -> bool:
+    return hmac.compare_digest(digest.encode('utf-8'), answer_digest(type_name, code).encode('ascii'))
+
+
+def _digest_encoder(type_name: str):
+    def encode(answer: dict) -> str | None:
+        if answer.keys() == {'code'} and isinstance(answer['code'], str):
+            return 'h:' + answer_digest(type_name, answer['code'])
+        return None
+
+    return encode
+
+
+def _encode_result(answer: dict) -> str | None:
+    if answer.keys() == {'result'} and isinstance(answer['result'], int):
+        return f"n:{answer['result']}"
+    return None
+
+
+def _encode_slider(answer: dict) -> str | None:
+    if 'offset' not in answer or not answer.keys() <= {'offset', 'tolerance'}:
+        return None
+    values = [answer['offset']] + ([answer['tolerance']] if 'tolerance' in answer else [])
+    if not all(_is_number(value) for value in values):
+        return None
+    return 's:' + ','.join(str(value) for value in values)
+
+
+def _encode_grid(answer: dict) -> str | None:
+    indexes = answer.get('indexes')
+    if answer.keys() == {'indexes'} and isinstance(indexes, list) and all(isinstance(i, int) for i in indexes):
+        return 'g:' + ','.join(str(index) for index in indexes)
+    return None
+
+
+def _encode_invisible(answer: dict) -> str | None:
+    if answer.keys() == {'honeypot', 'minDuration'} and answer['honeypot'] == '' and _is_number(answer['minDuration']):
+        return f"i:{answer['minDuration']}"
+    return None
+
+
+def _decode_slider(raw: str) -> dict:
+    offset, _, tolerance = raw.partition(',')
+    answer = {'offset': _number(offset)}
+    if tolerance:
+        answer['tolerance'] = _number(tolerance)
+    return answer
+
+
+_ENCODERS = {
+    'text': _digest_encoder('text'),
+    'email': _digest_encoder('email'),
+    'sms': _digest_encoder('sms'),
+    'voice': _digest_encoder('voice'),
+    'arithmetic': _encode_result,
+    'slider': _encode_slider,
+    'grid': _encode_grid,
+    'invisible': _encode_invisible,
+}
+
+_DECODERS = {
+    'h': lambda raw: {'digest': raw},
+    'c': lambda raw: {'code': raw},
+    'n': lambda raw: {'result': int(raw)},
+    's': _decode_slider,
+    'g': lambda raw: {'indexes': [int(index) for index in raw.split(',')] if raw else []},
+    'i': lambda raw: {'honeypot': '', 'minDuration': _number(raw)},
+}
+
+
+def encode_answer(type_name: str, answer: dict) -> str:
+    encoder = _ENCODERS.get(type_name)
+    encoded = encoder(answer) if encoder else None
+    return encoded if encoded is not None else json.dumps(answer, ensure_ascii=False, separators=_SEPARATORS)
+
+
+def decode_answer(stored: str | dict) -> dict:
+    """按前缀还原答案；以 ``{`` 开头的 JSON（含升级前写入的记录）照常解析。"""
+    if isinstance(stored, dict):
+        return stored
+    if not stored:
+        return {}
+    if stored[0] == '{':
+        return json.loads(stored)
+    tag, _, raw = stored.partition(':')
+    decoder = _DECODERS.get(tag)
+    if decoder is None:
+        raise ValueError(f'无法识别的答案格式：{tag}')
+    return decoder(raw)
@@ -0,0 +1,126 @@
+import logging
+import smtplib
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+try:
+    from twilio.http.http_client import TwilioHttpClient
+    from twilio.rest import Client
+except ImportError:  # pragma: no cover - optional dependency guard
+    TwilioHttpClient = None  # type: ignore[assignment]
+    Client = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+
+def _should_reconnect(exc: BaseException) -> bool:
+    # SMTPException 是 OSError 的子类：收件人被拒、内容被拒等属于这一封邮件的错误，
+    # 连接本身仍可用，不重连也不重发，直接交给调用方按封回报；只有断线和网络错误才重连
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class ConnectionManager:
+    """复用 SMTP 与 Twilio 连接，避免每条验证码都重新握手 TLS。
+
+    SMTP 连接不是线程安全的，每个线程持有一条长连接，连接断开时重连并重试一次；
+    Twilio 客户端在进程内共享，底层 requests.Session 负责 HTTP 连接池。
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._twilio_client = None
+        self._twilio_key: tuple[str, str] | None = None
+
+    # region smtp
+    def send_email(self, message: EmailMessage) -> int:
+        return self.send_emails([message])
+
+    def send_emails(self, messages: list[EmailMessage]) -> int:
+        connection = self._email_connection()
+        try:
+            return connection.send_messages(messages) or 0
+        except OSError as exc:
+            if not _should_reconnect(exc):
+                raise
+            logger.warning('SMTP 连接异常，重新连接后重试: %s', exc)
+            self.close_email()
+            return self._email_connection().send_messages(messages) or 0
+
+    def send_each(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        """在同一条连接上逐封发送，返回每封邮件的异常（成功为 None）。"""
+        results: list[Exception | None] = []
+        for message in messages:
+            try:
+                self.send_email(message)
+                results.append(None)
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def close_email(self) -> None:
+        connection = getattr(self._local, 'email', None)
+        self._local.email = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:  # pragma: no cover - 关闭失败无需处理
+                pass
+
+    def _email_connection(self):
+        connection = getattr(self._local, 'email', None)
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._local.email = connection
+        return connection
+    # endregion
+
+    # region twilio
+    def twilio_client(self, account_sid: str, auth_token: str):
+        key = (account_sid, auth_token)
+        client = self._twilio_client
+        if client is not None and self._twilio_key == key:
+            return client
+        with self._lock:
+            if self._twilio_client is None or self._twilio_key != key:
+                client_class = getattr(settings, 'TWILIO_CLIENT_CLASS', '')
+                if client_class:
+                    self._twilio_client = import_string(client_class)(account_sid, auth_token)
+                else:
+                    http_client = None
+                    if TwilioHttpClient is not None:
+                        http_client = TwilioHttpClient(
+                            pool_connections=True,
+                            timeout=getattr(settings, 'TWILIO_HTTP_TIMEOUT', 10),
+                        )
+                    self._twilio_client = Client(account_sid, auth_token, http_client=http_client)
+                self._twilio_key = key
+            return self._twilio_client
+
+    def reset_twilio(self) -> None:
+        with self._lock:
+            self._twilio_client = None
+            self._twilio_key = None
+    # endregion
+
+
+_manager_lock = threading.Lock()
+_manager: ConnectionManager | None = None
+
+
+def get_connection_manager() -> ConnectionManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager()
+    return _manager
+
+
+__all__ = ['ConnectionManager', 'get_connection_manager']
@@ -0,0 +1,255 @@
+import logging
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .masking import mask_email, mask_phone
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_RETRYING = 'retrying'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+# 投递状态对持有 token 的客户端可见，只返回固定的错误码与提示；异常原文（可能含内部主机名、
+# 服务商返回内容）只写入服务端日志
+ERROR_TIMEOUT = 'timeout'
+ERROR_NETWORK = 'network'
+ERROR_SEND_FAILED = 'send_failed'
+ERROR_MESSAGES = {
+    ERROR_TIMEOUT: '发送超时',
+    ERROR_NETWORK: '网络异常',
+    ERROR_SEND_FAILED: '发送失败',
+}
+
+
+@dataclass
+class DeliveryJob:
+    token: str
+    channel: str
+    target: str
+    send: Callable[[], Any]
+    ttl: int = 300
+    attempts: int = 0
+    last_error: str = ''
+    error_code: str = ''
+    result: Any = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def error_code(exc: BaseException) -> str:
+    if isinstance(exc, TimeoutError):
+        return ERROR_TIMEOUT
+    # requests / urllib3 的连接错误同样继承 OSError；smtplib 的协议错误单独归为发送失败
+    if isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException):
+        return ERROR_NETWORK
+    return ERROR_SEND_FAILED
+
+
+def mask_target(channel: str, target: str) -> str:
+    return mask_email(target) if channel == 'email' else mask_phone(target)
+
+
+def _status_key(token: str) -> str:
+    return f'captcha:delivery:{token}'
+
+
+def _status_cache():
+    """投递状态写入 CAPTCHA_DELIVERY['STATUS_CACHE'] 指定的缓存；多进程部署必须是共享缓存（见 captcha.checks）。"""
+    alias = (getattr(settings, 'CAPTCHA_DELIVERY', {}) or {}).get('STATUS_CACHE', 'default')
+    return caches[alias]
+
+
+def get_delivery_status(token: str) -> dict | None:
+    return _status_cache().get(_status_key(token))
+
+
+class DeliveryQueue:
+    """邮件 / 短信 / 语音验证码的后台投递队列。
+
+    失败的任务按指数退避重试，超过 max_attempts 后进入死信列表。send 可以返回 Future
+    （如批量邮件发送），此时由 Future 完成回调汇报结果，不占用 worker 线程。
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 4,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        dead_letter_size: int = 1000,
+    ) -> None:
+        self.workers = max(int(workers), 1)
+        self.max_attempts = max(int(max_attempts), 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._queue: queue.Queue[DeliveryJob | None] = queue.Queue()
+        self._dead_letters: deque[DeliveryJob] = deque(maxlen=dead_letter_size)
+        self._threads: list[threading.Thread] = []
+        self._timers: set[threading.Timer] = set()
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job: DeliveryJob) -> None:
+        self._ensure_started()
+        self._set_status(job, STATUS_QUEUED)
+        self._queue.put(job)
+
+    def dead_letters(self) -> list[DeliveryJob]:
+        return list(self._dead_letters)
+
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._timers)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """等待当前所有任务（含退避中的重试）完成，主要用于测试与优雅退出。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                idle = not self._timers and not self._inflight and self._queue.unfinished_tasks == 0
+            if idle:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+            for timer in self._timers:
+                timer.cancel()
+            self._timers.clear()
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'captcha-delivery-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job: DeliveryJob) -> None:
+        job.attempts += 1
+        self._set_status(job, STATUS_SENDING)
+        try:
+            result = job.send()
+        except Exception as exc:
+            self._complete(job, exc)
+            return
+        if isinstance(result, Future):
+            with self._lock:
+                self._inflight += 1
+            result.add_done_callback(lambda future: self._complete_future(job, future))
+            return
+        job.result = result
+        self._complete(job, None)
+
+    def _complete_future(self, job: DeliveryJob, future: Future) -> None:
+        try:
+            error = future.exception()
+            if error is None:
+                job.result = future.result()
+            self._complete(job, error)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def _complete(self, job: DeliveryJob, exc: BaseException | None) -> None:
+        if exc is not None:
+            job.last_error = str(exc)
+            job.error_code = error_code(exc)
+            if job.attempts >= self.max_attempts:
+                logger.error(
+                    '验证码投递失败，已放入死信列表: %s -> %s (%s)', job.channel, mask_target(job.channel, job.target), exc
+                )
+                self._dead_letters.append(job)
+                self._set_status(job, STATUS_FAILED)
+                return
+            delay = min(self.backoff * (2 ** (job.attempts - 1)), self.max_backoff)
+            logger.warning('验证码投递失败，%.1f 秒后重试（第 %s 次）: %s', delay, job.attempts, exc)
+            self._set_status(job, STATUS_RETRYING)
+            self._schedule_retry(job, delay)
+            return
+        self._set_status(job, STATUS_SENT)
+
+    def _schedule_retry(self, job: DeliveryJob, delay: float) -> None:
+        def requeue() -> None:
+            with self._lock:
+                self._timers.discard(timer)
+                self._queue.put(job)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _set_status(self, job: DeliveryJob, status: str) -> None:
+        data = {'status': status, 'channel': job.channel, 'attempts': job.attempts}
+        if status == STATUS_SENT and job.result:
+            data['result'] = job.result
+        if status in (STATUS_RETRYING, STATUS_FAILED):
+            data['errorCode'] = job.error_code
+            data['error'] = ERROR_MESSAGES.get(job.error_code, ERROR_MESSAGES[ERROR_SEND_FAILED])
+        _status_cache().set(_status_key(job.token), data, timeout=max(job.ttl, 1))
+
+
+_queue_lock = threading.Lock()
+_delivery_queue: DeliveryQueue | None = None
+
+
+def get_delivery_queue() -> DeliveryQueue:
+    global _delivery_queue
+    if _delivery_queue is None:
+        with _queue_lock:
+            if _delivery_queue is None:
+                options = getattr(settings, 'CAPTCHA_DELIVERY', {}) or {}
+                _delivery_queue = DeliveryQueue(
+                    workers=options.get('WORKERS', 4),
+                    max_attempts=options.get('MAX_ATTEMPTS', 3),
+                    backoff=options.get('BACKOFF', 0.5),
+                    max_backoff=options.get('MAX_BACKOFF', 30.0),
+                )
+    return _delivery_queue
+
+
+def async_delivery_enabled() -> bool:
+    return bool((getattr(settings, 'CAPTCHA_DELIVERY', {}) or {}).get('ASYNC', True))
+
+
+__all__ = [
+    'DeliveryJob',
+    'DeliveryQueue',
+    'async_delivery_enabled',
+    'get_delivery_queue',
+    'get_delivery_status',
+]
@@ -0,0 +1 @@
+"""验证码图像与评分引擎（依赖 Pillow / NumPy）。"""
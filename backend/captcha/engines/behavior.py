@@ -0,0 +1,156 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency guard
+    np = None  # type: ignore[assignment]
+
+# 阈值可在 CaptchaType.config_json 的 "thresholds" 中逐项覆盖；取 0 / None 表示不检查该项
+DEFAULT_THRESHOLDS = {
+    'min_points': 10,
+    'max_points': 20000,
+    'min_duration': 200.0,  # 毫秒
+    'max_duration': 30000.0,
+    'max_straightness': 0.995,  # 起终点直线距离 / 实际路径长度
+    'min_velocity_cv': 0.15,  # 速度变异系数，匀速移动接近 0
+    'max_velocity': 15.0,  # 像素 / 毫秒
+    'min_timing_entropy': 0.2,  # 采样间隔分布的熵（bit）
+    'min_jerk_std': 0.0,
+    'min_curvature': 0.0005,  # 每像素平均转角（弧度）
+    'timing_bin': 1.0,  # 计算间隔熵时的分桶宽度（毫秒）
+}
+# 与阈值配置无关的硬上限：轨迹时长超过 10 分钟直接判为格式错误；间隔熵最多统计 256 个桶，
+# 超出的间隔都落在最后一个桶里，客户端传入的极端时间戳不会撑大 bincount 的数组
+MAX_TRACE_DURATION = 600_000.0
+TIMING_BINS = 256
+
+
+def trajectory_arrays(trajectory) -> tuple:
+    """接受列式 {'t': [...], 'x': [...], 'y': [...]}（推荐，解析最快）或 [[t, x, y], ...]。"""
+    if isinstance(trajectory, dict):
+        t = np.asarray(trajectory.get('t', []), dtype=np.float64)
+        x = np.asarray(trajectory.get('x', []), dtype=np.float64)
+        y = np.asarray(trajectory.get('y', []), dtype=np.float64)
+        if not (t.ndim == x.ndim == y.ndim == 1) or not (len(t) == len(x) == len(y)):
+            raise ValueError('轨迹的 t / x / y 长度不一致')
+        return t, x, y
+    points = np.asarray(trajectory, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError('轨迹必须是 [t, x, y] 采样点列表')
+    return points[:, 0], points[:, 1], points[:, 2]
+
+
+def extract_features(t, x, y, timing_bin: float = 1.0) -> dict:
+    """向量化计算轨迹特征：速度 / 加速度 / 急动度分布、曲率、采样间隔熵与直线度。"""
+    dt = np.diff(t)
+    dx = np.diff(x)
+    dy = np.diff(y)
+    valid = dt > 0
+    dt, dx, dy = dt[valid], dx[valid], dy[valid]
+    if dt.size < 3:
+        return {'points': int(t.size), 'valid_steps': int(dt.size)}
+
+    step = np.hypot(dx, dy)
+    path_length = float(step.sum())
+    velocity = step / dt
+    acceleration = np.diff(velocity) / dt[1:]
+    jerk = np.diff(acceleration) / dt[2:]
+
+    moving = step > 0
+    heading = np.arctan2(dy[moving], dx[moving])
+    turn = (np.diff(heading) + math.pi) % (2 * math.pi) - math.pi
+
+    bins = np.clip(dt / timing_bin, 0, TIMING_BINS - 1).astype(np.int64)
+    buckets = np.bincount(bins, minlength=TIMING_BINS)
+    probabilities = buckets[buckets > 0] / dt.size
+    entropy = 0.0 - float((probabilities * np.log2(probabilities)).sum())
+
+    velocity_mean = float(velocity.mean())
+    chord = math.hypot(x[-1] - x[0], y[-1] - y[0])
+    return {
+        'points': int(t.size),
+        'valid_steps': int(dt.size),
+        'duration': float(t[-1] - t[0]),
+        'path_length': path_length,
+        'straightness': chord / path_length if path_length > 0 else 1.0,
+        'velocity_mean': velocity_mean,
+        'velocity_max': float(velocity.max()),
+        'velocity_cv': float(velocity.std() / velocity_mean) if velocity_mean > 0 else 0.0,
+        'acceleration_std': float(acceleration.std()),
+        'jerk_std': float(jerk.std()) if jerk.size else 0.0,
+        'curvature': float(np.abs(turn).sum() / path_length) if path_length > 0 else 0.0,
+        'timing_entropy': entropy,
+    }
+
+
+def evaluate(features: dict, thresholds: dict) -> list[str]:
+    """返回未通过的检查项，空列表表示轨迹可信。"""
+    failures = []
+    points = features.get('points', 0)
+    if thresholds.get('min_points') and points < thresholds['min_points']:
+        return ['min_points']
+    if features.get('valid_steps', 0) < 3:
+        return ['valid_steps']
+
+    checks = (
+        ('max_points', points, 'max'),
+        ('min_duration', features['duration'], 'min'),
+        ('max_duration', features['duration'], 'max'),
+        ('max_straightness', features['straightness'], 'max'),
+        ('min_velocity_cv', features['velocity_cv'], 'min'),
+        ('max_velocity', features['velocity_max'], 'max'),
+        ('min_timing_entropy', features['timing_entropy'], 'min'),
+        ('min_jerk_std', features['jerk_std'], 'min'),
+        ('min_curvature', features['curvature'], 'min'),
+    )
+    for name, value, kind in checks:
+        limit = thresholds.get(name)
+        if not limit:
+            continue
+        if (kind == 'min' and value < limit) or (kind == 'max' and value > limit):
+            failures.append(name)
+    return failures
+
+
+def score_trajectory(trajectory, thresholds: dict | None = None) -> tuple[bool, dict, list[str]]:
+    if np is None:
+        raise RuntimeError('未安装 NumPy，无法评估行为轨迹')
+    merged = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    try:
+        t, x, y = trajectory_arrays(trajectory)
+    except (TypeError, ValueError):
+        return False, {}, ['format']
+    if merged.get('max_points') and t.size > merged['max_points']:
+        return False, {'points': int(t.size)}, ['max_points']
+    if not (np.isfinite(t).all() and np.isfinite(x).all() and np.isfinite(y).all()):
+        return False, {}, ['format']
+    # 时间戳必须单调不减、总时长有上限，特征计算之前先拒绝
+    if t.size and (np.any(np.diff(t) < 0) or t[-1] - t[0] > MAX_TRACE_DURATION):
+        return False, {}, ['format']
+    timing_bin = float(merged.get('timing_bin') or 1.0)
+    if not timing_bin > 0:
+        timing_bin = 1.0
+    features = extract_features(t, x, y, timing_bin)
+    failures = evaluate(features, merged)
+    return not failures, features, failures
+
+
+def endpoint(trajectory) -> tuple[float, float] | None:
+    try:
+        if isinstance(trajectory, dict):
+            return float(trajectory['x'][-1]), float(trajectory['y'][-1])
+        return float(trajectory[-1][1]), float(trajectory[-1][2])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+__all__ = [
+    'DEFAULT_THRESHOLDS',
+    'MAX_TRACE_DURATION',
+    'TIMING_BINS',
+    'endpoint',
+    'evaluate',
+    'extract_features',
+    'score_trajectory',
+    'trajectory_arrays',
+]
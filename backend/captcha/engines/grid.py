@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency guard
+    np = None  # type: ignore[assignment]
+
+from .slider import IMAGE_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+GRID_SIZE = 9
+DIGEST_BYTES = 8  # 16 位十六进制内容摘要
+# meta.json 之外的索引文件；meta.json 最后写入，它存在即表示索引完整
+INDEX_FILES = (
+    'paths.bin',
+    'by_category.npy',
+    'category_offsets.npy',
+    'image_digests.npy',
+    'digests.npy',
+    'digest_order.npy',
+    'path_offsets.npy',
+)
+
+
+def build_grid_index(corpus_dir: str | Path, index_dir: str | Path) -> dict:
+    """扫描 <corpus>/<类别>/<图片> 并写出紧凑索引，之后以内存映射方式加载。
+
+    - by_category.npy：按类别排序的图片 id（int32），category_offsets.npy 为各类别的起止位置；
+    - digests.npy / digest_order.npy：排序后的内容摘要及对应图片 id，用于按 URL 反查图片；
+    - image_digests.npy：按图片 id 排列的摘要；
+    - paths.bin / path_offsets.npy：相对路径拼接后的字节串与偏移量。
+
+    所有文件先写入同级的临时目录，完成后逐个 os.replace 到 index_dir，meta.json 最后替换；
+    正在运行的进程仍映射着旧文件，不会读到写了一半的索引。
+    """
+    corpus = Path(corpus_dir)
+    final = Path(index_dir)
+    final.mkdir(parents=True, exist_ok=True)
+    target = Path(tempfile.mkdtemp(prefix=f'{final.name}.tmp-', dir=final.parent))
+    try:
+        meta = _write_index(corpus, target)
+        for name in INDEX_FILES:
+            os.replace(target / name, final / name)
+        os.replace(target / 'meta.json', final / 'meta.json')
+    finally:
+        shutil.rmtree(target, ignore_errors=True)
+    return meta
+
+
+def _write_index(corpus: Path, target: Path) -> dict:
+
+    categories = sorted(entry.name for entry in os.scandir(corpus) if entry.is_dir() and not entry.name.startswith('.'))
+    labels_file = corpus / 'labels.json'
+    labels = json.loads(labels_file.read_text(encoding='utf-8')) if labels_file.exists() else {}
+
+    by_category: list[int] = []
+    offsets = [0]
+    digests: list[bytes] = []
+    path_offsets = [0]
+    with open(target / 'paths.bin', 'wb') as paths_out:
+        for category in categories:
+            for entry in sorted(os.scandir(corpus / category), key=lambda item: item.name):
+                if not entry.is_file() or Path(entry.name).suffix.lower() not in IMAGE_SUFFIXES:
+                    continue
+                image_id = len(digests)
+                digests.append(_file_digest(entry.path))
+                encoded = f'{category}/{entry.name}'.encode('utf-8')
+                paths_out.write(encoded)
+                path_offsets.append(path_offsets[-1] + len(encoded))
+                by_category.append(image_id)
+            offsets.append(len(by_category))
+
+    image_digests = np.array(digests, dtype=f'S{DIGEST_BYTES * 2}')
+    digest_order = np.argsort(image_digests, kind='stable').astype(np.int32)
+    np.save(target / 'by_category.npy', np.array(by_category, dtype=np.int32))
+    np.save(target / 'category_offsets.npy', np.array(offsets, dtype=np.int64))
+    np.save(target / 'image_digests.npy', image_digests)
+    np.save(target / 'digests.npy', image_digests[digest_order])
+    np.save(target / 'digest_order.npy', digest_order)
+    np.save(target / 'path_offsets.npy', np.array(path_offsets, dtype=np.int64))
+    meta = {'categories': categories, 'labels': labels, 'count': len(digests)}
+    (target / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+    return meta
+
+
+def _file_digest(path: str) -> bytes:
+    digest = hashlib.blake2b(digest_size=DIGEST_BYTES)
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest().encode('ascii')
+
+
+class GridIndex:
+    """以内存映射方式加载的图片索引，图片本身从不读入内存。"""
+
+    def __init__(self, corpus_dir: str | Path, index_dir: str | Path) -> None:
+        if np is None:
+            raise RuntimeError('未安装 NumPy，无法生成九宫格验证码')
+        self.corpus = Path(corpus_dir)
+        root = Path(index_dir)
+        meta = json.loads((root / 'meta.json').read_text(encoding='utf-8'))
+        self.categories: list[str] = meta['categories']
+        self.labels: dict = meta.get('labels', {})
+        self.count = int(meta['count'])
+        self.by_category = np.load(root / 'by_category.npy', mmap_mode='r')
+        self.category_offsets = np.load(root / 'category_offsets.npy')
+        self.image_digests = np.load(root / 'image_digests.npy', mmap_mode='r')
+        self.digests = np.load(root / 'digests.npy', mmap_mode='r')
+        self.digest_order = np.load(root / 'digest_order.npy', mmap_mode='r')
+        self.path_offsets = np.load(root / 'path_offsets.npy', mmap_mode='r')
+        self.paths = np.memmap(root / 'paths.bin', dtype=np.uint8, mode='r') if self.count else b''
+        # 至少有一张目标图、且其他类别的图片足够填满九宫格的类别才可作为题目
+        sizes = np.diff(self.category_offsets)
+        self.eligible = [index for index, size in enumerate(sizes) if size >= 1 and self.count - size >= GRID_SIZE - 1]
+
+    def label(self, category_index: int) -> str:
+        name = self.categories[category_index]
+        return self.labels.get(name, name)
+
+    def digest(self, image_id: int) -> str:
+        return self.image_digests[image_id].decode('ascii')
+
+    def path(self, image_id: int) -> Path:
+        start, end = int(self.path_offsets[image_id]), int(self.path_offsets[image_id + 1])
+        return self.corpus / bytes(self.paths[start:end]).decode('utf-8')
+
+    def find(self, digest: str) -> int | None:
+        key = digest.encode('ascii', 'ignore')
+        position = int(np.searchsorted(self.digests, key))
+        if position < len(self.digests) and self.digests[position] == key:
+            return int(self.digest_order[position])
+        return None
+
+    def sample(self, category_index: int, targets: int, rng: random.Random) -> tuple[list[int], list[int]]:
+        """O(k) 抽样：targets 张目标类别图片与 9 - targets 张其他类别图片。"""
+        start = int(self.category_offsets[category_index])
+        end = int(self.category_offsets[category_index + 1])
+        size = end - start
+        targets = min(targets, size)
+        target_ids = [int(self.by_category[start + offset]) for offset in rng.sample(range(size), targets)]
+
+        others = self.count - size
+        picks = rng.sample(range(others), GRID_SIZE - targets)
+        distractor_ids = [int(self.by_category[pick if pick < start else pick + size]) for pick in picks]
+        return target_ids, distractor_ids
+
+
+class GridEngine:
+    def __init__(self, index: GridIndex, *, url_prefix: str, min_targets: int = 2, max_targets: int = 4) -> None:
+        if not index.eligible:
+            raise RuntimeError('九宫格图片库中没有可用的类别')
+        self.index = index
+        self.url_prefix = url_prefix.rstrip('/') + '/'
+        self.min_targets = max(int(min_targets), 1)
+        self.max_targets = max(int(max_targets), self.min_targets)
+
+    def generate(self, rng: random.Random | None = None) -> tuple[dict, dict]:
+        rng = rng or random.Random()
+        category = rng.choice(self.index.eligible)
+        targets, distractors = self.index.sample(category, rng.randint(self.min_targets, self.max_targets), rng)
+        cells = [(image_id, True) for image_id in targets] + [(image_id, False) for image_id in distractors]
+        rng.shuffle(cells)
+        payload = {
+            'question': f'请选择所有的{self.index.label(category)}',
+            'gridSize': GRID_SIZE,
+            'images': [f'{self.url_prefix}{self.index.digest(image_id)}' for image_id, _ in cells],
+        }
+        answer = {'indexes': [position for position, (_, is_target) in enumerate(cells) if is_target]}
+        return payload, answer
+
+
+_engine_lock = threading.Lock()
+_engine: GridEngine | None = None
+
+
+def grid_options() -> dict:
+    options = dict(getattr(settings, 'CAPTCHA_GRID', {}) or {})
+    corpus = options.get('CORPUS_DIR') or ''
+    options['INDEX_DIR'] = options.get('INDEX_DIR') or (str(Path(corpus) / '.index') if corpus else '')
+    return options
+
+
+def get_grid_engine() -> GridEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                options = grid_options()
+                corpus = options.get('CORPUS_DIR')
+                if not corpus or not Path(corpus).is_dir():
+                    raise RuntimeError('九宫格图片库未配置，请设置 CAPTCHA_GRID_CORPUS_DIR')
+                if np is None:
+                    raise RuntimeError('未安装 NumPy，无法生成九宫格验证码')
+                if not (Path(options['INDEX_DIR']) / 'meta.json').exists():
+                    # 不在请求中构建：多个 worker 进程会同时写同一目录，且首个请求要扫描整个图片库
+                    raise RuntimeError('九宫格索引不存在，请先执行 python manage.py build_grid_index')
+                _engine = GridEngine(
+                    GridIndex(corpus, options['INDEX_DIR']),
+                    url_prefix=options.get('URL_PREFIX', '/api/captcha/grid/'),
+                    min_targets=options.get('MIN_TARGETS', 2),
+                    max_targets=options.get('MAX_TARGETS', 4),
+                )
+    return _engine
+
+
+def reset_grid_engine() -> None:
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+__all__ = ['GridEngine', 'GridIndex', 'build_grid_index', 'get_grid_engine', 'grid_options', 'reset_grid_engine']
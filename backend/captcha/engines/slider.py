@@ -0,0 +1,164 @@
+import base64
+import io
+import random
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency guard
+    np = None  # type: ignore[assignment]
+    Image = None  # type: ignore[assignment]
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.webp'}
+
+
+def encode_data_url(array, image_format: str = 'WEBP') -> str:
+    image = Image.fromarray(array)
+    buffer = io.BytesIO()
+    if image_format.upper() == 'WEBP':
+        image.save(buffer, format='WEBP', quality=70, method=0)
+        mime = 'image/webp'
+    else:
+        image.save(buffer, format='PNG')
+        mime = 'image/png'
+    return f'data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode("ascii")}'
+
+
+@lru_cache(maxsize=64)
+def load_background(path: str, width: int, height: int):
+    """解码并缩放背景图；按 (路径, 尺寸) 缓存，避免每次请求重新读盘解码。"""
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGB').resize((width, height), Image.BILINEAR))
+
+
+def jigsaw_mask(size: int):
+    """生成拼图块的布尔遮罩：正方形主体，顶部与右侧各带一个半圆凸起。"""
+    tab = size // 5
+    body = size - tab
+    yy, xx = np.mgrid[0:size, 0:size]
+    mask = (xx < body) & (yy >= tab)
+    centre = body / 2
+    mask |= (xx - centre) ** 2 + (yy - tab) ** 2 <= tab**2
+    mask |= (xx - body) ** 2 + (yy - (tab + body / 2)) ** 2 <= tab**2
+    return mask
+
+
+def outline(mask):
+    """遮罩边缘一像素宽的轮廓。"""
+    inner = mask.copy()
+    inner[1:, :] &= mask[:-1, :]
+    inner[:-1, :] &= mask[1:, :]
+    inner[:, 1:] &= mask[:, :-1]
+    inner[:, :-1] &= mask[:, 1:]
+    return mask & ~inner
+
+
+class SliderEngine:
+    """滑块拼图生成器：在背景随机位置 (x, y) 用 NumPy 遮罩切出拼图块并挖出缺口。"""
+
+    def __init__(
+        self,
+        *,
+        width: int = 300,
+        height: int = 150,
+        piece_size: int = 50,
+        background_dir: str = '',
+        procedural_count: int = 16,
+        image_format: str = 'WEBP',
+    ) -> None:
+        if np is None or Image is None:
+            raise RuntimeError('未安装 Pillow / NumPy，无法生成滑块验证码')
+        self.width = width
+        self.height = height
+        self.piece_size = piece_size
+        self.image_format = image_format
+        self.mask = jigsaw_mask(piece_size)
+        self.edge = outline(self.mask)
+        self.paths = self._discover(background_dir)
+        self._procedural: list = []
+        if not self.paths:
+            rng = np.random.default_rng()
+            self._procedural = [self._procedural_background(rng) for _ in range(procedural_count)]
+
+    def generate(self, rng: random.Random | None = None) -> tuple[dict, dict]:
+        rng = rng or random.Random()
+        background = self._background(rng)
+        size = self.piece_size
+        x = rng.randint(size + 10, self.width - size - 10)
+        y = rng.randint(5, self.height - size - 5)
+
+        region = background[y : y + size, x : x + size]
+        piece = np.zeros((size, size, 4), dtype=np.uint8)
+        piece[..., :3] = region
+        piece[..., 3] = self.mask * 255
+        piece[self.edge] = (255, 255, 255, 255)
+
+        canvas = background.copy()
+        hole = canvas[y : y + size, x : x + size]
+        hole[self.mask] = (hole[self.mask] * 0.35).astype(np.uint8)
+        hole[self.edge] = 230
+
+        payload = {
+            'image': encode_data_url(canvas, self.image_format),
+            'piece': encode_data_url(piece, self.image_format),
+            'pieceY': y,
+            'width': self.width,
+            'height': self.height,
+            'pieceSize': size,
+        }
+        return payload, {'offset': x}
+
+    def _background(self, rng: random.Random):
+        if self.paths:
+            return load_background(rng.choice(self.paths), self.width, self.height)
+        return rng.choice(self._procedural)
+
+    def _discover(self, background_dir: str) -> list[str]:
+        if not background_dir:
+            return []
+        root = Path(background_dir)
+        if not root.is_dir():
+            return []
+        return sorted(str(path) for path in root.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+
+    def _procedural_background(self, rng):
+        """没有背景图时生成的渐变 + 随机色块背景，纹理足够让缺口可辨认。"""
+        yy, xx = np.mgrid[0 : self.height, 0 : self.width].astype(np.float32)
+        start, end = rng.integers(40, 220, size=(2, 3))
+        t = (xx / self.width)[..., None]
+        image = start * (1 - t) + end * t
+        for _ in range(12):
+            cx, cy = rng.uniform(0, self.width), rng.uniform(0, self.height)
+            radius = rng.uniform(10, 45)
+            blob = (xx - cx) ** 2 + (yy - cy) ** 2 <= radius**2
+            image[blob] = image[blob] * 0.4 + rng.integers(0, 255, size=3) * 0.6
+        image += rng.normal(0, 6, size=image.shape)
+        return np.clip(image, 0, 255).astype(np.uint8)
+
+
+_engine_lock = threading.Lock()
+_engine: SliderEngine | None = None
+
+
+def get_slider_engine() -> SliderEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                options = getattr(settings, 'CAPTCHA_SLIDER', {}) or {}
+                _engine = SliderEngine(
+                    width=options.get('WIDTH', 300),
+                    height=options.get('HEIGHT', 150),
+                    piece_size=options.get('PIECE_SIZE', 50),
+                    background_dir=str(options.get('BACKGROUND_DIR') or ''),
+                    image_format=options.get('FORMAT', 'WEBP'),
+                )
+    return _engine
+
+
+__all__ = ['SliderEngine', 'get_slider_engine', 'jigsaw_mask', 'load_background']
@@ -0,0 +1,190 @@
+import base64
+import io
+import logging
+import math
+import random
+import string
+import threading
+from collections import deque
+
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+except ImportError:  # pragma: no cover - optional dependency guard
+    Image = ImageDraw = ImageFilter = ImageFont = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# 去掉容易混淆的字符
+ALPHABET = ''.join(ch for ch in string.ascii_uppercase + string.digits if ch not in 'O0I1L')
+
+
+class TextImageRenderer:
+    """将验证码字符渲染为带扭曲、噪点与干扰线的图片，返回 data URL。"""
+
+    def __init__(
+        self,
+        *,
+        width: int = 150,
+        height: int = 50,
+        length: int = 5,
+        image_format: str = 'WEBP',
+        font_path: str | None = None,
+    ) -> None:
+        if Image is None:
+            raise RuntimeError('未安装 Pillow，无法生成图形验证码')
+        self.width = width
+        self.height = height
+        self.length = length
+        self.image_format = image_format.upper()
+        font_size = int(height * 0.7)
+        if font_path:
+            self.font = ImageFont.truetype(font_path, font_size)
+        else:
+            self.font = ImageFont.load_default(size=font_size)
+
+    def random_code(self, rng: random.Random) -> str:
+        return ''.join(rng.choices(ALPHABET, k=self.length))
+
+    def render(self, code: str, rng: random.Random | None = None) -> str:
+        rng = rng or random.Random()
+        image = Image.new('RGB', (self.width, self.height), self._color(rng, 220, 255))
+        self._draw_glyphs(image, code, rng)
+        image = self._warp(image, rng)
+        self._draw_noise(image, rng)
+        image = image.filter(ImageFilter.SMOOTH)
+
+        buffer = io.BytesIO()
+        if self.image_format == 'WEBP':
+            image.save(buffer, format='WEBP', quality=60, method=0)
+            mime = 'image/webp'
+        else:
+            image.save(buffer, format='PNG', optimize=False)
+            mime = 'image/png'
+        return f'data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode("ascii")}'
+
+    def _draw_glyphs(self, image, code: str, rng: random.Random) -> None:
+        slot = self.width / (len(code) + 0.5)
+        for index, char in enumerate(code):
+            glyph = Image.new('RGBA', (self.height, self.height), (0, 0, 0, 0))
+            ImageDraw.Draw(glyph).text(
+                (self.height * 0.15, self.height * 0.05), char, font=self.font, fill=self._color(rng, 10, 130)
+            )
+            glyph = glyph.rotate(rng.uniform(-30, 30), resample=Image.BICUBIC, expand=False)
+            x = int(slot * index + slot * 0.25 + rng.uniform(-3, 3))
+            y = int(rng.uniform(-4, 4))
+            image.paste(glyph, (x, y), glyph)
+
+    def _warp(self, image, rng: random.Random):
+        """按正弦曲线上下错动每条竖直切片，扭曲字形轮廓。"""
+        amplitude = rng.uniform(2, 4)
+        period = rng.uniform(self.width / 3, self.width / 1.5)
+        phase = rng.uniform(0, math.tau)
+        warped = Image.new('RGB', image.size, image.getpixel((0, 0)))
+        strip = 2
+        for x in range(0, self.width, strip):
+            offset = int(amplitude * math.sin(math.tau * x / period + phase))
+            warped.paste(image.crop((x, 0, x + strip, self.height)), (x, offset))
+        return warped
+
+    def _draw_noise(self, image, rng: random.Random) -> None:
+        draw = ImageDraw.Draw(image)
+        for _ in range(3):
+            points = [(0, rng.uniform(0, self.height))]
+            for step in range(1, 5):
+                points.append((self.width * step / 4, rng.uniform(0, self.height)))
+            draw.line(points, fill=self._color(rng, 60, 180), width=rng.randint(1, 2))
+        for _ in range(self.width * self.height // 25):
+            draw.point((rng.randrange(self.width), rng.randrange(self.height)), fill=self._color(rng, 0, 255))
+
+    def _color(self, rng: random.Random, low: int, high: int) -> tuple[int, int, int]:
+        return rng.randint(low, high), rng.randint(low, high), rng.randint(low, high)
+
+
+class TextImagePool:
+    """预渲染的 (验证码, 图片) 池。
+
+    pop() 为 O(1)；剩余数量低于 low_watermark 时唤醒后台线程补充到 size。
+    池为空时在当前线程即时渲染，保证请求不会失败。
+    """
+
+    def __init__(self, renderer: TextImageRenderer, *, size: int = 200, low_watermark: int = 50) -> None:
+        self.renderer = renderer
+        self.size = max(int(size), 1)
+        self.low_watermark = min(max(int(low_watermark), 0), self.size)
+        self._items: deque[tuple[str, str]] = deque()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._rng = random.SystemRandom()
+
+    def pop(self) -> tuple[str, str]:
+        self._ensure_started()
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            item = self._render_one(self._rng)
+        if len(self._items) < self.low_watermark:
+            self._wakeup.set()
+        return item
+
+    def fill(self) -> None:
+        """同步填满池，用于启动预热。"""
+        while len(self._items) < self.size:
+            self._items.append(self._render_one(self._rng))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _render_one(self, rng: random.Random) -> tuple[str, str]:
+        code = self.renderer.random_code(rng)
+        return code, self.renderer.render(code, rng)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refill_loop, name='captcha-text-pool', daemon=True)
+                self._thread.start()
+                self._wakeup.set()
+
+    def _refill_loop(self) -> None:
+        rng = random.SystemRandom()
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                while len(self._items) < self.size:
+                    self._items.append(self._render_one(rng))
+            except Exception:  # pragma: no cover - 后台线程不能退出
+                logger.exception('预渲染图形验证码失败')
+
+
+_pool_lock = threading.Lock()
+_pool: TextImagePool | None = None
+
+
+def get_text_image_pool() -> TextImagePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                options = getattr(settings, 'CAPTCHA_TEXT_IMAGE', {}) or {}
+                renderer = TextImageRenderer(
+                    width=options.get('WIDTH', 150),
+                    height=options.get('HEIGHT', 50),
+                    length=options.get('LENGTH', 5),
+                    image_format=options.get('FORMAT', 'WEBP'),
+                    font_path=options.get('FONT') or None,
+                )
+                _pool = TextImagePool(
+                    renderer,
+                    size=options.get('POOL_SIZE', 200),
+                    low_watermark=options.get('LOW_WATERMARK', 50),
+                )
+    return _pool
+
+
+__all__ = ['TextImageRenderer', 'TextImagePool', 'get_text_image_pool']
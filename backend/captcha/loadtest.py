@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Awaitable, Callable
+
+_EXPRESSION = re.compile(r'^\s*(-?\d+)\s*([+-])\s*(-?\d+)\s*$')
+# 邮件 / 短信正文中的 6 位验证码；语音内容按位以空格分隔
+_CODE = re.compile(r'(?<!\d)\d(?: ?\d){5}(?!\d)')
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int) -> dict:
+    """汇总一轮压测：吞吐量与延迟分位数（毫秒）。"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(elapsed, 4),
+        'throughput': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        'mean_ms': round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+    }
+
+
+def run_threads(task: Callable[[int], bool], total: int, concurrency: int) -> dict:
+    """用线程池以固定并发执行 task，task 返回 False 视为失败。"""
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(index: int) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = task(index)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        list(pool.map(timed, range(total)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run_async(task: Callable[[int], Awaitable[bool]], total: int, concurrency: int) -> dict:
+    """在事件循环中以固定并发执行协程 task。"""
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def timed(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await task(index)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(index) for index in range(total)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def solve_arithmetic(payload: dict) -> int | None:
+    match = _EXPRESSION.match(payload.get('expression', ''))
+    if not match:
+        return None
+    a, operator, b = int(match.group(1)), match.group(2), int(match.group(3))
+    return a + b if operator == '+' else a - b
+
+
+def extract_code(text: str) -> str | None:
+    match = _CODE.search(text or '')
+    return match.group(0).replace(' ', '') if match else None
+
+
+def wait_for(lookup: Callable[[], str | None], timeout: float = 5.0, interval: float = 0.002) -> str | None:
+    """轮询 lookup 直到返回非空值，用于等待后台投递队列送达的邮件 / 短信。"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = lookup()
+        if value or time.monotonic() >= deadline:
+            return value
+        time.sleep(interval)
+
+
+class _FakeTwilioResource:
+    def __init__(self, prefix: str) -> None:
+        self._prefix = prefix
+        self._ids = itertools.count(1)
+
+    def create(self, *, to: str, from_: str = '', body: str = '', twiml: str = '', **kwargs):
+        FakeTwilioClient.record(to, body or twiml)
+        return SimpleNamespace(sid=f'{self._prefix}{next(self._ids):032d}', status='queued')
+
+
+class FakeTwilioClient:
+    """离线压测用的 Twilio 替身：不发网络请求，把短信正文与语音 TwiML 按接收号码记下来。
+
+    通过 ``TWILIO_CLIENT_CLASS = 'captcha.loadtest.FakeTwilioClient'`` 启用。
+    """
+
+    _lock = threading.Lock()
+    _outbox: dict[str, str] = {}
+
+    def __init__(self, account_sid: str = '', auth_token: str = '', **kwargs) -> None:
+        self.messages = _FakeTwilioResource('SM')
+        self.calls = _FakeTwilioResource('CA')
+
+    @classmethod
+    def record(cls, to: str, content: str) -> None:
+        with cls._lock:
+            cls._outbox[to] = content
+
+    @classmethod
+    def take_message(cls, to: str) -> str | None:
+        """取出并移除发给 to 的最新内容。"""
+        with cls._lock:
+            return cls._outbox.pop(to, None)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._outbox.clear()
+
+
+def http_post(base_url: str, path: str, data: dict, timeout: float = 10.0) -> dict:
+    request = urllib.request.Request(
+        f'{base_url.rstrip("/")}{path}',
+        data=json.dumps(data).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+__all__ = [
+    'FakeTwilioClient',
+    'extract_code',
+    'http_post',
+    'percentile',
+    'run_async',
+    'run_threads',
+    'solve_arithmetic',
+    'summarize',
+    'wait_for',
+]
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from .connections import get_connection_manager
+
+logger = logging.getLogger(__name__)
+
+
+class EmailBatcher:
+    """合并短时间内的验证码邮件，通过同一条 SMTP 连接批量发送。
+
+    首封邮件入队后最多等待 max_delay 秒，或累计 max_messages 封时立即发送；
+    每封邮件对应一个 Future，发送结果逐封回传给提交方。最多 senders 个批次并行发送，
+    每个发送线程持有自己的 SMTP 连接。
+    """
+
+    def __init__(self, *, max_messages: int = 50, max_delay: float = 0.02, senders: int = 2) -> None:
+        self.max_messages = max(int(max_messages), 1)
+        self.max_delay = max(float(max_delay), 0.0)
+        self.senders = max(int(senders), 1)
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: list[tuple[EmailMessage, Future]] = []
+        self._first_at = 0.0
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+
+    def submit(self, message: EmailMessage) -> Future:
+        future: Future = Future()
+        with self._cond:
+            self._ensure_started()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((message, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_messages:
+                self._cond.notify()
+        return future
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.submit(get_connection_manager().close_email)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(max_workers=self.senders, thread_name_prefix='captcha-email-sender')
+            self._thread = threading.Thread(target=self._run, name='captcha-email-batcher', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                while not self._stopped and len(self._pending) < self.max_messages:
+                    remaining = self._first_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[: self.max_messages]
+                del self._pending[: self.max_messages]
+                if self._pending:
+                    self._first_at = time.monotonic()
+                stopped = self._stopped and not self._pending
+            if batch:
+                self._executor.submit(self._flush, batch)
+            if stopped:
+                return
+
+    def _flush(self, batch: list[tuple[EmailMessage, Future]]) -> None:
+        results = get_connection_manager().send_each([message for message, _ in batch])
+        for (_, future), error in zip(batch, results):
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+
+_batcher_lock = threading.Lock()
+_batcher: EmailBatcher | None = None
+
+
+def get_email_batcher() -> EmailBatcher | None:
+    """按 CAPTCHA_EMAIL_BATCH 配置返回共享的批量发送器；未启用时返回 None。"""
+    global _batcher
+    options = getattr(settings, 'CAPTCHA_EMAIL_BATCH', {}) or {}
+    if not options.get('ENABLED', False):
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmailBatcher(
+                    max_messages=options.get('MAX_MESSAGES', 50),
+                    max_delay=options.get('MAX_DELAY_MS', 20) / 1000,
+                    senders=options.get('SENDERS', 2),
+                )
+    return _batcher
+
+
+__all__ = ['EmailBatcher', 'get_email_batcher']
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from captcha.loadtest import http_post, run_async, run_threads, solve_arithmetic
+
+# 压测从同一 IP 发起大量请求，进程内压测时关闭限流
+UNLIMITED = {'ENABLED': False}
+
+
+class Command(BaseCommand):
+    help = '以固定并发压测 captcha/request → captcha/verify（可选 login），比较同步 WSGI 与原生异步 ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='每种模式执行的流程次数')
+        parser.add_argument('--concurrency', type=int, default=16, help='并发数')
+        parser.add_argument('--login', action='store_true', help='流程末尾调用 /api/login（含密码哈希）')
+        parser.add_argument('--username', default='test_user')
+        parser.add_argument('--password', default='TestUser123!')
+        parser.add_argument(
+            '--url',
+            action='append',
+            default=[],
+            help='改为通过 HTTP 压测已启动的服务，可重复指定，如 --url http://127.0.0.1:8000（gunicorn）'
+            ' --url http://127.0.0.1:8001（uvicorn）',
+        )
+        parser.add_argument('--output', help='将结果写入 JSON 文件')
+
+    def handle(self, *args, **options):
+        total = max(options['requests'], 1)
+        concurrency = max(options['concurrency'], 1)
+        results = {}
+
+        if options['url']:
+            for base_url in options['url']:
+                results[base_url] = run_threads(lambda _: self._http_flow(base_url, options), total, concurrency)
+        else:
+            with override_settings(ROOT_URLCONF='captcha_backend.urls', CAPTCHA_RATE_LIMIT=UNLIMITED):
+                client = Client()
+                results['wsgi_sync'] = run_threads(lambda _: self._sync_flow(client, options), total, concurrency)
+                async_client = AsyncClient()
+                results['asgi_sync_views'] = asyncio.run(
+                    run_async(lambda _: self._async_flow(async_client, options), total, concurrency)
+                )
+            with override_settings(ROOT_URLCONF='captcha_backend.urls_async', CAPTCHA_RATE_LIMIT=UNLIMITED):
+                async_client = AsyncClient()
+                results['asgi_async_views'] = asyncio.run(
+                    run_async(lambda _: self._async_flow(async_client, options), total, concurrency)
+                )
+
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"{mode:<20} {stats['throughput']:>8.1f} 次/秒  p50={stats['p50_ms']:.1f}ms "
+                f"p99={stats['p99_ms']:.1f}ms  errors={stats['errors']}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(results, ensure_ascii=False))
+
+    def _login_data(self, options, token: str) -> dict:
+        return {'username': options['username'], 'password': options['password'], 'captcha_token': token}
+
+    def _sync_flow(self, client: Client, options) -> bool:
+        post = lambda path, data: client.post(path, data=data, content_type='application/json').json()  # noqa: E731
+        return self._flow(post, options)
+
+    def _http_flow(self, base_url: str, options) -> bool:
+        return self._flow(lambda path, data: http_post(base_url, path, data), options)
+
+    def _flow(self, post, options) -> bool:
+        challenge = post('/api/captcha/request', {'type': 'arithmetic'})
+        if not challenge.get('success'):
+            return False
+        token = challenge['data']['token']
+        answer = {'result': solve_arithmetic(challenge['data']['payload'])}
+        if not post('/api/captcha/verify', {'token': token, 'answer': answer}).get('success'):
+            return False
+        if options['login']:
+            return bool(post('/api/login', self._login_data(options, token)).get('success'))
+        return True
+
+    async def _async_flow(self, client: AsyncClient, options) -> bool:
+        async def post(path: str, data: dict) -> dict:
+            response = await client.post(path, data=data, content_type='application/json')
+            return response.json()
+
+        challenge = await post('/api/captcha/request', {'type': 'arithmetic'})
+        if not challenge.get('success'):
+            return False
+        token = challenge['data']['token']
+        answer = {'result': solve_arithmetic(challenge['data']['payload'])}
+        if not (await post('/api/captcha/verify', {'token': token, 'answer': answer})).get('success'):
+            return False
+        if options['login']:
+            return bool((await post('/api/login', self._login_data(options, token))).get('success'))
+        return True
@@ -0,0 +1,41 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from captcha.engines import behavior
+
+TRACES_DIR = Path(behavior.__file__).resolve().parent / 'traces'
+
+
+class Command(BaseCommand):
+    help = '对内置轨迹样本运行行为评分，输出判定结果与单次评分耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--traces', default=str(TRACES_DIR), help='轨迹样本目录（*.json）')
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        results = {}
+        for path in sorted(Path(options['traces']).glob('*.json')):
+            trajectory = json.loads(path.read_text(encoding='utf-8'))['trajectory']
+            passed, features, failures = behavior.score_trajectory(trajectory)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                behavior.score_trajectory(trajectory)
+            elapsed = time.perf_counter() - started
+
+            results[path.stem] = {
+                'points': features.get('points', 0),
+                'passed': passed,
+                'failures': failures,
+                'us_per_score': round(elapsed / iterations * 1e6, 1),
+            }
+            self.stdout.write(
+                f"{path.stem:<20} {features.get('points', 0):>6} 点  "
+                f"{'通过' if passed else '拒绝'}  {elapsed / iterations * 1e6:>8.1f} µs/次  {','.join(failures)}"
+            )
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
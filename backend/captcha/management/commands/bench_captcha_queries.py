@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from captcha import services
+
+
+class Command(BaseCommand):
+    help = '统计 captcha/request 与 captcha/verify 每次请求的 SQL 数量（逐请求构造服务 vs 共享服务）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', default='arithmetic', help='验证码类型')
+        parser.add_argument('--requests', type=int, default=20, help='每种模式的请求轮数')
+
+    def handle(self, *args, **options):
+        captcha_type = options['type']
+        rounds = max(options['requests'], 1)
+        results = {}
+
+        with transaction.atomic(), override_settings(CAPTCHA_RATE_LIMIT={'ENABLED': False}):
+            original = services.get_captcha_service
+            try:
+                services.get_captcha_service = services.CaptchaService
+                self._patch_views(services.CaptchaService)
+                results['per_request'] = self._measure(captcha_type, rounds)
+            finally:
+                services.get_captcha_service = original
+                self._patch_views(original)
+
+            services.reset_captcha_service()
+            services.get_captcha_service()
+            results['shared'] = self._measure(captcha_type, rounds)
+            transaction.set_rollback(True)
+
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"{mode:<12} request={stats['request']:.1f} verify={stats['verify']:.1f} queries/req"
+            )
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
+
+    def _patch_views(self, factory) -> None:
+        from accounts import views as account_views
+        from captcha import views as captcha_views
+
+        captcha_views.get_captcha_service = factory
+        account_views.get_captcha_service = factory
+
+    def _measure(self, captcha_type: str, rounds: int) -> dict:
+        client = Client()
+        request_queries = verify_queries = 0
+        for _ in range(rounds):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.post(
+                    '/api/captcha/request', data={'type': captcha_type}, content_type='application/json'
+                ).json()
+            request_queries += len(ctx.captured_queries)
+            token = response.get('data', {}).get('token')
+            with CaptureQueriesContext(connection) as ctx:
+                client.post(
+                    '/api/captcha/verify', data={'token': token, 'answer': {}}, content_type='application/json'
+                )
+            verify_queries += len(ctx.captured_queries)
+        return {'request': request_queries / rounds, 'verify': verify_queries / rounds}
@@ -0,0 +1,392 @@
+import asyncio
+import hashlib
+import json
+import math
+import platform
+import random
+import threading
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from accounts.audit import get_audit_writer
+from captcha.codec import encode_payload
+from captcha.connections import get_connection_manager
+from captcha.delivery import get_delivery_queue
+from captcha.engines import behavior
+from captcha.loadtest import FakeTwilioClient, extract_code, run_async, run_threads, solve_arithmetic, summarize, wait_for
+from captcha.metrics import count_queries
+from captcha.services import CaptchaGenerationError, CaptchaService, get_captcha_service, reset_captcha_service
+
+ALL_TYPES = ('arithmetic', 'invisible', 'text', 'slider', 'grid', 'behavior', 'email', 'sms', 'voice')
+STEPS = ('request', 'verify', 'login')
+HUMAN_TRACE = Path(behavior.__file__).resolve().parent / 'traces' / 'human.json'
+BENCH_USER = 'bench_e2e'
+BENCH_PASSWORD = 'BenchE2e123!'
+
+# 压测全部在本地完成：locmem 邮件、假 Twilio，关闭限流与风险升级，避免同一 IP 的大量请求被拦截
+OFFLINE_SETTINGS = {
+    'CAPTCHA_RATE_LIMIT': {'ENABLED': False},
+    'CAPTCHA_RISK': {'ENABLED': False},
+    'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+    'EMAIL_HOST': 'localhost',
+    'DEFAULT_FROM_EMAIL': 'bench@example.com',
+    'TWILIO_CLIENT_CLASS': 'captcha.loadtest.FakeTwilioClient',
+    'TWILIO_ACCOUNT_SID': 'AC-bench',
+    'TWILIO_AUTH_TOKEN': 'bench',
+    'TWILIO_PHONE_NUMBER': '+10000000000',
+}
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def _payload_key(payload: dict) -> str:
+    return hashlib.sha1(encode_payload(payload).encode('utf-8')).hexdigest()
+
+
+class AnswerOracle:
+    """记录生成器产出的答案，供无法从载荷推出答案的类型（图形 / 滑块 / 九宫格）作答。"""
+
+    def __init__(self) -> None:
+        self._answers: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def install(self, service: CaptchaService, type_names) -> None:
+        for type_name in type_names:
+            generator = service._registry[type_name]
+            generator.generator = self._wrap(generator.generator)
+
+    def answer(self, payload: dict) -> dict | None:
+        with self._lock:
+            return self._answers.pop(_payload_key(payload), None)
+
+    def _wrap(self, generate):
+        def recording(context):
+            payload, answer, ttl = generate(context)
+            with self._lock:
+                self._answers[_payload_key(payload)] = dict(answer)
+            return payload, answer, ttl
+
+        return recording
+
+
+class Mailbox:
+    """按收件人索引 locmem 发件箱，每封邮件只扫描一次。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._codes: dict[str, str] = {}
+
+    def code_for(self, address: str) -> str | None:
+        with self._lock:
+            outbox = getattr(mail, 'outbox', [])
+            for message in outbox[self._seen:]:
+                code = extract_code(message.body)
+                for recipient in message.to:
+                    self._codes[recipient] = code
+            self._seen = len(outbox)
+            return self._codes.pop(address, None)
+
+
+class Command(BaseCommand):
+    help = (
+        '离线端到端压测：按验证码类型以固定并发执行 captcha/request → captcha/verify → login，'
+        '输出吞吐、延迟分位数与每个请求的 SQL 数量，可保存为 JSON 并与基线比较'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--types', default=','.join(ALL_TYPES), help='逗号分隔的验证码类型')
+        parser.add_argument('--flows', type=int, default=100, help='每种类型执行的完整流程次数')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=10, help='每种类型正式计时前先执行、不计入结果的流程数')
+        parser.add_argument('--seed', type=int, default=20240601, help='注入生成器的随机数种子')
+        parser.add_argument('--asgi', action='store_true', help='使用 AsyncClient 与原生异步视图')
+        parser.add_argument('--no-login', action='store_true', help='只压测 request → verify')
+        parser.add_argument('--real-hasher', action='store_true', help='使用项目配置的密码哈希（默认用 MD5 排除哈希开销）')
+        parser.add_argument('--output', help='结果 JSON 的保存路径')
+        parser.add_argument('--compare', help='与之前保存的结果 JSON 比较')
+        parser.add_argument('--threshold', type=float, default=10.0, help='吞吐下降或 p95 上升超过该百分比视为退化')
+        parser.add_argument('--fail-on-regression', action='store_true', help='出现退化时以非零状态退出')
+
+    def handle(self, *args, **options):
+        type_names = [name.strip() for name in options['types'].split(',') if name.strip()]
+        unknown = sorted(set(type_names) - set(ALL_TYPES))
+        if unknown:
+            raise CommandError(f"未知的验证码类型：{', '.join(unknown)}")
+        self.flows = max(options['flows'], 1)
+        self.concurrency = max(options['concurrency'], 1)
+        self.login = not options['no_login']
+        self.warmup = max(options['warmup'], 0)
+        with HUMAN_TRACE.open(encoding='utf-8') as fh:
+            self.trace = json.load(fh)['trajectory']
+
+        overrides = dict(OFFLINE_SETTINGS)
+        overrides['ROOT_URLCONF'] = 'captcha_backend.urls_async' if options['asgi'] else 'captcha_backend.urls'
+        if not options['real_hasher']:
+            overrides['PASSWORD_HASHERS'] = FAST_HASHERS
+        # 哈希排队上限不低于并发数，压测结果反映的是吞吐而不是准入拒绝
+        hashing = dict(getattr(settings, 'PASSWORD_HASHING', {}) or {})
+        hashing['MAX_PENDING'] = max(hashing.get('MAX_PENDING') or 0, self.concurrency)
+        overrides['PASSWORD_HASHING'] = hashing
+
+        previous = get_captcha_service()
+        with override_settings(**overrides):
+            get_connection_manager().reset_twilio()
+            FakeTwilioClient.clear()
+            mail.outbox = []
+            service = CaptchaService(bootstrap=False, rng=random.Random(options['seed']))
+            self.oracle = AnswerOracle()
+            self.oracle.install(service, ('text', 'slider', 'grid'))
+            self.mailbox = Mailbox()
+            reset_captcha_service(service)
+            user = self._bench_user()
+            try:
+                results = {}
+                for type_name in type_names:
+                    skipped = self._unavailable(service, type_name)
+                    if skipped:
+                        self.stdout.write(f'{type_name:<11} 跳过：{skipped}')
+                        results[type_name] = {'skipped': skipped}
+                        continue
+                    results[type_name] = self._run_type(type_name, options['asgi'])
+                    self._print_row(type_name, results[type_name])
+            finally:
+                reset_captcha_service(previous)
+                get_delivery_queue().join(5)
+                writer = get_audit_writer()
+                if writer is not None:
+                    writer.flush(5)
+                user.delete()
+                get_connection_manager().reset_twilio()
+
+        report = {
+            'meta': {
+                'seed': options['seed'],
+                'flows': self.flows,
+                'concurrency': self.concurrency,
+                'warmup': self.warmup,
+                'mode': 'asgi' if options['asgi'] else 'wsgi',
+                'login': self.login,
+                'hasher': 'project' if options['real_hasher'] else 'md5',
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            },
+            'types': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f"结果已保存到 {options['output']}")
+        else:
+            self.stdout.write(json.dumps(report, ensure_ascii=False))
+
+        if options['compare']:
+            regressions = self._compare(options['compare'], report, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} 项指标退化：' + '；'.join(regressions))
+
+    # region setup
+    def _bench_user(self):
+        User = get_user_model()
+        User.objects.filter(username=BENCH_USER).delete()
+        return User.objects.create_user(username=BENCH_USER, password=BENCH_PASSWORD, email='bench@example.com')
+
+    def _unavailable(self, service: CaptchaService, type_name: str) -> str | None:
+        """先试生成一次，缺少图片库 / 依赖或类型被禁用时跳过该类型。"""
+        if service._get_enabled_type(type_name) is None:
+            return '类型未启用'
+        try:
+            payload, answer, _ = service._registry[type_name].generator(
+                {'request': self._request_data(type_name, -1), 'config': {}, 'deliveries': []}
+            )
+        except CaptchaGenerationError as exc:
+            return str(exc)
+        self.oracle.answer(payload)
+        return None
+    # endregion
+
+    # region flow
+    def _request_data(self, type_name: str, index: int) -> dict:
+        data = {'type': type_name}
+        if type_name == 'email':
+            data['email'] = f'bench{index}@example.com'
+        elif type_name in ('sms', 'voice'):
+            data['phone'] = f'+1555{index:07d}'
+        return data
+
+    def _answer(self, type_name: str, request_data: dict, payload: dict) -> dict | None:
+        if type_name == 'arithmetic':
+            return {'result': solve_arithmetic(payload)}
+        if type_name == 'invisible':
+            return {'honeypot': '', 'duration': float(payload.get('minVisibleSeconds', 0)) + 0.5}
+        if type_name == 'behavior':
+            return {'trajectory': self._trajectory(payload)}
+        if type_name == 'email':
+            code = wait_for(lambda: self.mailbox.code_for(request_data['email']))
+            return {'code': code} if code else None
+        if type_name in ('sms', 'voice'):
+            code = wait_for(lambda: extract_code(FakeTwilioClient.take_message(request_data['phone'])))
+            return {'code': code} if code else None
+        return self.oracle.answer(payload)
+
+    def _trajectory(self, payload: dict) -> dict:
+        """把真人样本轨迹做相似变换（平移 + 旋转 + 缩放），使其从 start 出发、落在 target 上。"""
+        xs, ys = self.trace['x'], self.trace['y']
+        origin, end = complex(xs[0], ys[0]), complex(xs[-1], ys[-1])
+        start, target = complex(*payload['start']), complex(*payload['target'])
+        factor = (target - start) / (end - origin)
+        points = [start + (complex(x, y) - origin) * factor for x, y in zip(xs, ys)]
+        return {
+            't': list(self.trace['t']),
+            'x': [round(point.real, 2) for point in points],
+            'y': [round(point.imag, 2) for point in points],
+        }
+
+    def _run_type(self, type_name: str, use_asgi: bool) -> dict:
+        steps = {step: {'latencies': [], 'queries': []} for step in STEPS}
+        lock = threading.Lock()
+
+        def record(step: str, elapsed: float, queries: int) -> None:
+            with lock:
+                steps[step]['latencies'].append(elapsed)
+                steps[step]['queries'].append(queries)
+
+        def reset() -> None:
+            for data in steps.values():
+                data['latencies'].clear()
+                data['queries'].clear()
+
+        if use_asgi:
+            client = AsyncClient()
+
+            async def post(step: str, path: str, data: dict) -> dict:
+                started = time.perf_counter()
+                with count_queries() as queries:
+                    response = await client.post(path, data=data, content_type='application/json')
+                record(step, time.perf_counter() - started, queries[0])
+                return response.json()
+
+            async def flow(index: int) -> bool:
+                request_data = self._request_data(type_name, index)
+                challenge = await post('request', '/api/captcha/request', request_data)
+                if not challenge.get('success') or challenge['data'].get('type') != type_name:
+                    return False
+                answer = await asyncio.to_thread(self._answer, type_name, request_data, challenge['data']['payload'])
+                return await self._finish_async(post, challenge['data']['token'], answer)
+
+            if self.warmup:
+                asyncio.run(run_async(flow, self.warmup, self.concurrency))
+                reset()
+            summary = asyncio.run(run_async(flow, self.flows, self.concurrency))
+        else:
+            client = Client()
+
+            def post(step: str, path: str, data: dict) -> dict:
+                started = time.perf_counter()
+                with count_queries() as queries:
+                    response = client.post(path, data=data, content_type='application/json')
+                record(step, time.perf_counter() - started, queries[0])
+                return response.json()
+
+            def flow(index: int) -> bool:
+                request_data = self._request_data(type_name, index)
+                challenge = post('request', '/api/captcha/request', request_data)
+                if not challenge.get('success') or challenge['data'].get('type') != type_name:
+                    return False
+                answer = self._answer(type_name, request_data, challenge['data']['payload'])
+                return self._finish(post, challenge['data']['token'], answer)
+
+            if self.warmup:
+                run_threads(flow, self.warmup, self.concurrency)
+                reset()
+            summary = run_threads(flow, self.flows, self.concurrency)
+
+        summary['flows'] = summary.pop('requests')
+        summary['steps'] = {}
+        for step, data in steps.items():
+            if not data['latencies']:
+                continue
+            stats = summarize(data['latencies'], summary['seconds'], 0)
+            summary['steps'][step] = {
+                'count': stats['requests'],
+                'p50_ms': stats['p50_ms'],
+                'p95_ms': stats['p95_ms'],
+                'p99_ms': stats['p99_ms'],
+                'queries_per_request': round(sum(data['queries']) / len(data['queries']), 3),
+            }
+        return summary
+
+    def _finish(self, post, token: str, answer: dict | None) -> bool:
+        if answer is None:
+            return False
+        if not post('verify', '/api/captcha/verify', {'token': token, 'answer': answer}).get('success'):
+            return False
+        if not self.login:
+            return True
+        return bool(post('login', '/api/login', self._login_data(token)).get('success'))
+
+    async def _finish_async(self, post, token: str, answer: dict | None) -> bool:
+        if answer is None:
+            return False
+        if not (await post('verify', '/api/captcha/verify', {'token': token, 'answer': answer})).get('success'):
+            return False
+        if not self.login:
+            return True
+        return bool((await post('login', '/api/login', self._login_data(token))).get('success'))
+
+    def _login_data(self, token: str) -> dict:
+        return {'username': BENCH_USER, 'password': BENCH_PASSWORD, 'captcha_token': token}
+    # endregion
+
+    # region report
+    def _print_row(self, type_name: str, result: dict) -> None:
+        queries = ' '.join(
+            f"{step}={data['queries_per_request']:g}" for step, data in result['steps'].items()
+        )
+        self.stdout.write(
+            f"{type_name:<11} {result['throughput']:>8.1f} 流程/秒  p50={result['p50_ms']:.1f}ms "
+            f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms  errors={result['errors']}  SQL/请求 {queries}"
+        )
+
+    def _compare(self, path: str, report: dict, threshold: float) -> list[str]:
+        with open(path, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = []
+        self.stdout.write(f'与基线 {path} 比较（阈值 {threshold:g}%）：')
+        for type_name, current in report['types'].items():
+            before = baseline.get('types', {}).get(type_name)
+            if not before or 'skipped' in before or 'skipped' in current:
+                continue
+            throughput = _change(before['throughput'], current['throughput'])
+            p95 = _change(before['p95_ms'], current['p95_ms'])
+            notes = []
+            if throughput < -threshold:
+                notes.append(f'吞吐 {throughput:+.1f}%')
+            if p95 > threshold:
+                notes.append(f'p95 {p95:+.1f}%')
+            for step, data in current['steps'].items():
+                old = before.get('steps', {}).get(step)
+                # 类型缓存过期重载等偶发查询会让均值有小数波动，多出半条以上才算退化
+                if old and data['queries_per_request'] >= old['queries_per_request'] + 0.5:
+                    notes.append(f"{step} SQL {old['queries_per_request']:g}→{data['queries_per_request']:g}")
+            if current['errors'] > before['errors']:
+                notes.append(f"errors {before['errors']}→{current['errors']}")
+            status = '退化：' + '，'.join(notes) if notes else '正常'
+            self.stdout.write(f'  {type_name:<11} 吞吐 {throughput:+6.1f}%  p95 {p95:+6.1f}%  {status}')
+            regressions.extend(f'{type_name} {note}' for note in notes)
+        return regressions
+    # endregion
+
+
+def _change(before: float, after: float) -> float:
+    if not before:
+        return 0.0 if not after else math.inf
+    return (after - before) / before * 100
@@ -0,0 +1,95 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import EmailMessage, send_mail
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from captcha.connections import get_connection_manager
+from captcha.mailer import EmailBatcher
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.handlers import Sink
+except ImportError:  # pragma: no cover - optional dependency guard
+    Controller = None  # type: ignore[assignment]
+    Sink = None  # type: ignore[assignment]
+
+
+class Command(BaseCommand):
+    help = '在本地 SMTP 桩（aiosmtpd）上比较逐封发送、连接复用与合并发送的吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='每种模式发送的邮件数')
+        parser.add_argument('--producers', type=int, default=16, help='并发提交邮件的线程数')
+        parser.add_argument('--batch-size', type=int, default=50, help='合并发送的单批上限')
+        parser.add_argument('--delay-ms', type=float, default=20, help='合并发送的最长等待毫秒数')
+        parser.add_argument('--senders', type=int, default=2, help='合并发送的并行连接数')
+        parser.add_argument('--port', type=int, default=8025, help='SMTP 桩监听端口')
+
+    def handle(self, *args, **options):
+        if Controller is None:
+            raise CommandError('需要先安装 aiosmtpd：pip install aiosmtpd')
+
+        controller = Controller(Sink(), hostname='127.0.0.1', port=options['port'])
+        controller.start()
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=options['port'],
+                EMAIL_USE_TLS=False,
+                EMAIL_HOST_USER='',
+                EMAIL_HOST_PASSWORD='',
+            ):
+                results = self._run(options)
+        finally:
+            controller.stop()
+
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"{mode:<12} {stats['messages_per_second']:>8.0f} 封/秒  "
+                f"({stats['seconds']:.2f} 秒, {stats['smtp_connections']} 条 SMTP 连接)"
+            )
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
+
+    def _run(self, options) -> dict:
+        count = max(options['messages'], 1)
+        producers = max(options['producers'], 1)
+        messages = [
+            EmailMessage('验证码验证', f'您的验证码是 {i:06d}', 'bench@example.com', [f'user{i}@example.com'])
+            for i in range(count)
+        ]
+
+        def per_message(message: EmailMessage) -> None:
+            send_mail(message.subject, message.body, message.from_email, message.to)
+
+        manager = get_connection_manager()
+
+        def pooled(message: EmailMessage) -> None:
+            manager.send_email(message)
+
+        results = {}
+        for mode, send, connections in (('per_message', per_message, count), ('pooled', pooled, producers)):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=producers) as pool:
+                list(pool.map(send, messages))
+            results[mode] = self._stats(count, time.perf_counter() - started, connections=connections)
+
+        # 与投递队列的用法一致：提交后不阻塞，等待全部 Future 完成
+        batcher = EmailBatcher(
+            max_messages=options['batch_size'], max_delay=options['delay_ms'] / 1000, senders=options['senders']
+        )
+        try:
+            started = time.perf_counter()
+            futures = [batcher.submit(message) for message in messages]
+            for future in futures:
+                future.result()
+            results['batched'] = self._stats(count, time.perf_counter() - started, connections=options['senders'])
+        finally:
+            batcher.stop()
+        return results
+
+    def _stats(self, count: int, elapsed: float, connections: int) -> dict:
+        return {'seconds': elapsed, 'messages_per_second': count / elapsed, 'smtp_connections': connections}
@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from captcha.loadtest import run_threads
+from captcha.ratelimit import KeyValueRateLimitStore, LocalRateLimitStore, RateLimiter
+from captcha.stores import InMemoryKeyValueClient
+
+DEFAULTS = {'ip': {'limit': 30, 'window': 60}, 'target': {'limit': 5, 'window': 600}}
+
+
+class Command(BaseCommand):
+    help = '测量限流检查的单次开销（进程内计数 vs Redis 兼容键值存储）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200_000, help='单线程检查次数')
+        parser.add_argument('--keys', type=int, default=10_000, help='模拟的不同 IP 数量')
+        parser.add_argument('--concurrency', type=int, default=8, help='多线程压测的线程数')
+
+    def handle(self, *args, **options):
+        checks = max(options['checks'], 1)
+        keys = max(options['keys'], 1)
+        ips = [f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}' for i in range(keys)]
+        phones = [f'1380000{i % 10000:04d}' for i in range(keys)]
+        stores = {
+            'local': LocalRateLimitStore(),
+            'key_value': KeyValueRateLimitStore(client=InMemoryKeyValueClient()),
+        }
+
+        results = {}
+        for name, store in stores.items():
+            limiter = RateLimiter(store, defaults=DEFAULTS)
+            rejected = 0
+            started = time.perf_counter()
+            for i in range(checks):
+                index = i % keys
+                if not limiter.check('sms', {}, {'ip': ips[index], 'target': phones[index]}).allowed:
+                    rejected += 1
+            elapsed = time.perf_counter() - started
+
+            threaded = run_threads(
+                lambda i, limiter=limiter: limiter.check('arithmetic', {}, {'ip': ips[i % keys]}) is not None,
+                checks // 4,
+                options['concurrency'],
+            )
+            results[name] = {
+                'us_per_check': round(elapsed / checks * 1e6, 3),
+                'checks_per_second': round(checks / elapsed),
+                'rejected': rejected,
+                'threaded_throughput': threaded['throughput'],
+                'threaded_p99_us': round(threaded['p99_ms'] * 1000, 1),
+            }
+            self.stdout.write(
+                f"{name:<10} {elapsed / checks * 1e6:>7.2f} µs/次  {checks / elapsed:>10.0f} 次/秒  "
+                f"拒绝 {rejected}  {options['concurrency']} 线程 {threaded['throughput']:.0f} 次/秒"
+            )
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
@@ -0,0 +1,81 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+
+from captcha.codec import decode_answer, encode_answer, encode_payload
+from captcha.services import CaptchaGenerationError, get_captcha_service
+from captcha.stores import ChallengeRecord
+from captcha.views import build_raw_response, challenge_json
+
+
+def _legacy(type_name: str, payload: dict, answer: dict) -> None:
+    stored_payload = json.dumps(payload, ensure_ascii=False)
+    stored_answer = json.dumps(answer, ensure_ascii=False)
+    record = ChallengeRecord(type_name, stored_payload, stored_answer, client_ip='127.0.0.1')
+    JsonResponse({
+        'success': True,
+        'message': '验证码生成成功',
+        'data': {
+            'token': record.token,
+            'type': record.type,
+            'payload': json.loads(record.payload),
+            'expires_at': record.expires_at.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+    })
+    json.loads(record.answer)
+
+
+def _current(type_name: str, payload: dict, answer: dict) -> None:
+    record = ChallengeRecord(type_name, encode_payload(payload), encode_answer(type_name, answer), client_ip='127.0.0.1')
+    build_raw_response(True, '验证码生成成功', challenge_json(record))
+    decode_answer(record.answer)
+
+
+class Command(BaseCommand):
+    help = '比较挑战载荷 / 答案的序列化开销：旧的 dumps→loads→dumps 路径 vs 一次编码直接拼接'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--types', nargs='+', default=['arithmetic', 'invisible', 'grid', 'text', 'slider'], help='验证码类型'
+        )
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        service = get_captcha_service()
+        iterations = max(options['iterations'], 1)
+        results = {}
+        for type_name in options['types']:
+            generator = service._registry.get(type_name)
+            if generator is None:
+                self.stderr.write(f'未知类型：{type_name}')
+                continue
+            try:
+                payload, answer, _ = generator.generator({'config': {}, 'request': {}})
+            except CaptchaGenerationError as exc:
+                self.stderr.write(f'{type_name} 跳过：{exc}')
+                continue
+
+            timings = {}
+            for mode, run in (('legacy', _legacy), ('current', _current)):
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    run(type_name, payload, answer)
+                timings[mode] = (time.perf_counter() - started) / iterations * 1e6
+
+            results[type_name] = {
+                'payload_bytes': len(encode_payload(payload).encode('utf-8')),
+                'answer_bytes': {
+                    'legacy': len(json.dumps(answer, ensure_ascii=False)),
+                    'current': len(encode_answer(type_name, answer)),
+                },
+                'legacy_us': round(timings['legacy'], 2),
+                'current_us': round(timings['current'], 2),
+            }
+            self.stdout.write(
+                f"{type_name:<11} 载荷 {results[type_name]['payload_bytes']:>7} B  "
+                f"旧 {timings['legacy']:>8.2f} µs  新 {timings['current']:>8.2f} µs  "
+                f"({timings['legacy'] / timings['current']:.1f}x)"
+            )
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
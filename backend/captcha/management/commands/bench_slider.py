@@ -0,0 +1,44 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from captcha.engines.slider import SliderEngine, get_slider_engine
+
+
+class Command(BaseCommand):
+    help = '测量滑块拼图单核每秒生成次数（含切块与图片编码）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--format', choices=['WEBP', 'PNG'], help='覆盖配置中的图片格式')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        engine = get_slider_engine()
+        if options['format'] and options['format'] != engine.image_format:
+            engine = SliderEngine(
+                width=engine.width,
+                height=engine.height,
+                piece_size=engine.piece_size,
+                image_format=options['format'],
+            )
+        rng = random.Random(options['seed'])
+        iterations = max(options['iterations'], 1)
+        engine.generate(rng)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            engine.generate(rng)
+        elapsed = time.perf_counter() - started
+
+        result = {
+            'iterations': iterations,
+            'format': engine.image_format,
+            'backgrounds': len(engine.paths) or 'procedural',
+            'generations_per_second': round(iterations / elapsed, 1),
+            'ms_per_generation': round(elapsed / iterations * 1000, 3),
+        }
+        self.stdout.write(f"{result['generations_per_second']} 次/秒/核（{result['ms_per_generation']} ms/次）")
+        self.stdout.write(json.dumps(result, ensure_ascii=False))
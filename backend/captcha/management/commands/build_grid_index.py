@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from captcha.engines.grid import build_grid_index, grid_options, reset_grid_engine
+
+
+class Command(BaseCommand):
+    help = '扫描九宫格图片库并生成内存映射索引（类别 → 图片 id、内容摘要、相对路径）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='图片库目录，默认读取 CAPTCHA_GRID_CORPUS_DIR')
+        parser.add_argument('--index', help='索引输出目录，默认 <corpus>/.index')
+
+    def handle(self, *args, **options):
+        defaults = grid_options()
+        corpus = options['corpus'] or defaults.get('CORPUS_DIR')
+        if not corpus:
+            raise CommandError('请通过 --corpus 或 CAPTCHA_GRID_CORPUS_DIR 指定图片库目录')
+        index_dir = options['index'] or defaults.get('INDEX_DIR') or f'{corpus}/.index'
+
+        started = time.perf_counter()
+        meta = build_grid_index(corpus, index_dir)
+        reset_grid_engine()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"已索引 {meta['count']} 张图片、{len(meta['categories'])} 个类别，"
+                f'耗时 {time.perf_counter() - started:.2f} 秒 → {index_dir}'
+            )
+        )
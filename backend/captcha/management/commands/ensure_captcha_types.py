@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from captcha.services import CaptchaService
+
+
+class Command(BaseCommand):
+    help = '初始化内置验证码类型（缺失时创建，并补全描述与 ttl 配置）'
+
+    def handle(self, *args, **options):
+        CaptchaService(bootstrap=False).ensure_types_exist()
+        self.stdout.write(self.style.SUCCESS('验证码类型初始化完成'))
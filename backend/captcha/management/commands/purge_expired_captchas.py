@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from captcha.reaper import purge_expired_challenges
+
+
+class Command(BaseCommand):
+    help = '分批删除已过期的验证码挑战记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批删除的行数')
+        parser.add_argument('--sleep', type=float, default=0.05, help='批次之间休眠的秒数')
+        parser.add_argument('--max-batches', type=int, default=None, help='本次最多执行的批次数')
+
+    def handle(self, *args, **options):
+        result = purge_expired_challenges(
+            chunk_size=options['chunk_size'],
+            sleep_seconds=options['sleep'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'已删除 {result.deleted} 条过期验证码（{result.batches} 批，'
+                f'{result.elapsed:.2f} 秒，{result.rate:.0f} 条/秒）'
+            )
+        )
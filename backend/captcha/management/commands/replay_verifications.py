@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from captcha.replay import parse_sweep, replay_verifications
+
+
+class Command(BaseCommand):
+    help = '离线回放历史答案（JSONL / JSONL.gz / Parquet），按阈值扫描统计通过率'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='每行一条 {"type", "expected", "actual", "human"?} 记录')
+        parser.add_argument(
+            '--sweep',
+            action='append',
+            default=[],
+            help='扫描参数，可重复，如 slider.tolerance=3,5,8 或 behavior.min_velocity_cv=0.1,0.2',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每个进程任务包含的记录数')
+        parser.add_argument('--workers', type=int, default=None, help='进程数，默认 CPU 核数，0 表示不使用进程池')
+        parser.add_argument('--json', action='store_true', help='以 JSON 输出完整报告')
+
+    def handle(self, *args, **options):
+        try:
+            sweep = parse_sweep(options['sweep'])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        try:
+            report = replay_verifications(
+                options['path'],
+                sweep=sweep,
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+            )
+        except (OSError, RuntimeError) as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options['json']:
+            self.stdout.write(json.dumps(report.to_dict(), ensure_ascii=False))
+            return
+
+        self.stdout.write('类型 / 参数 / 总数 / 通过率 / 人类样本通过率 / 机器样本通过率')
+        for row in report.rows:
+            self.stdout.write(
+                f"{row['type']:<12}{row['param']:<30}{row['total']:>12}"
+                f"{_percent(row['accept_rate']):>13}{_percent(row['human_accept_rate']):>13}"
+                f"{_percent(row['bot_accept_rate']):>13}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'共 {report.records} 条记录（无效 {report.invalid} 条，校验出错 {report.errors} 条，{report.chunks} 批），'
+                f'{report.elapsed:.2f} 秒，{report.rate:.0f} 条/秒'
+            )
+        )
+
+
+def _percent(value: float | None) -> str:
+    return '-' if value is None else f'{value * 100:.1f}%'
@@ -0,0 +1,27 @@
+"""手机号与邮箱脱敏，用于接口响应与日志。"""
+
+
+def mask_email(value: str) -> str:
+    if not value or '@' not in value:
+        return value
+    local, domain = value.split('@', 1)
+    if len(local) <= 2:
+        masked_local = local[0] + '*' if local else '*' * 3
+    else:
+        masked_local = f"{local[0]}{'*' * (len(local) - 2)}{local[-1]}"
+    return f'{masked_local}@{domain}'
+
+
+def mask_phone(value: str) -> str:
+    if not value:
+        return value
+    digits = ''.join(ch for ch in value if ch.isdigit())
+    if len(digits) < 7:
+        return value
+    masked = f"{digits[:3]}****{digits[-4:]}"
+    if value.strip().startswith('+') and not masked.startswith('+'):
+        return f'+{masked}'
+    return masked
+
+
+__all__ = ['mask_email', 'mask_phone']
@@ -0,0 +1,261 @@
+"""进程内指标：计数器与延迟直方图，按 Prometheus 文本格式导出。
+
+热路径上不加锁：每个线程把数据写进自己的分片（只有该线程会修改），导出时再汇总所有分片，
+单次记录只是一次线程局部查找加几次字典操作。指标只统计本进程，多 worker 部署时需逐个抓取。
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _snapshot(self) -> list[dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [dict(shard) for shard in shards]
+
+    def clear(self) -> None:
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return sum(shard.get(labels, 0) for shard in self._snapshot())
+
+    def _totals(self) -> dict[tuple, float]:
+        totals: dict[tuple, float] = {}
+        for shard in self._snapshot():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def _samples(self) -> list[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}'
+            for labels, value in sorted(self._totals().items())
+        ]
+
+
+class Histogram(_Metric):
+    """每个标签组合保存 [各桶计数..., 总和, 次数]，桶计数在导出时再累加成 Prometheus 的累计形式。"""
+
+    kind = 'histogram'
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [0] * (len(self.buckets) + 3)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    @contextmanager
+    def time(self, *labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels) -> int:
+        return sum(entry[-1] for entry in (shard.get(labels) for shard in self._snapshot()) if entry)
+
+    def _totals(self) -> dict[tuple, list]:
+        totals: dict[tuple, list] = {}
+        for shard in self._snapshot():
+            for labels, entry in shard.items():
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(entry)
+                else:
+                    for index, value in enumerate(entry):
+                        total[index] += value
+        return totals
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, entry in sorted(self._totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry):
+                cumulative += count
+                le = 'le="' + _format_number(float(bound)) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_number(float(entry[-2]))}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {entry[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+# region captcha metrics
+GENERATE_SECONDS = REGISTRY.histogram(
+    'captcha_generate_duration_seconds', '验证码生成器耗时', ('type',)
+)
+GENERATE_TOTAL = REGISTRY.counter(
+    'captcha_generate_total', '验证码生成次数，outcome 为 ok / error / rate_limited', ('type', 'outcome')
+)
+VERIFY_SECONDS = REGISTRY.histogram(
+    'captcha_verify_duration_seconds', '验证码校验与核销耗时', ('type', 'stage')
+)
+VERIFY_TOTAL = REGISTRY.counter(
+    'captcha_verify_total', '验证码校验结果，stage 为 verify（提交答案）/ consume（登录核销）', ('type', 'stage', 'outcome')
+)
+DELIVERY_SECONDS = REGISTRY.histogram(
+    'captcha_delivery_duration_seconds', '邮件 / 短信 / 语音单次发送耗时', ('channel', 'outcome')
+)
+# endregion
+
+# region http metrics
+HTTP_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', '视图处理耗时（含中间件内层）', ('view', 'method', 'status')
+)
+HTTP_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries', '单次请求执行的 SQL 数量', ('view',), buckets=QUERY_BUCKETS
+)
+# endregion
+
+
+_query_counters: contextvars.ContextVar[tuple] = contextvars.ContextVar('captcha_query_counters', default=())
+
+
+def _count_query(execute, sql, params, many, context):
+    for counter in _query_counters.get():
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs) -> None:
+    """挂到 connection_created 信号上：为每个数据库连接加一个只做计数的 execute wrapper。"""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextmanager
+def count_queries() -> Iterator[list]:
+    """在当前上下文内统计 SQL 数量，可以嵌套（中间件与压测各自计数）。
+
+    ContextVar 会随 sync_to_async 传入线程，异步视图中的查询同样计入。
+    """
+    counter = [0]
+    token = _query_counters.set(_query_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _query_counters.reset(token)
+
+
+def metrics_enabled() -> bool:
+    return bool((getattr(settings, 'CAPTCHA_METRICS', {}) or {}).get('ENABLED', True))
+
+
+__all__ = [
+    'Counter',
+    'Histogram',
+    'MetricsRegistry',
+    'REGISTRY',
+    'count_queries',
+    'install_query_counter',
+    'metrics_enabled',
+]
@@ -0,0 +1,53 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import HTTP_QUERIES, HTTP_SECONDS, count_queries
+
+
+def _view_label(request) -> str:
+    # 只用路由名作标签，避免把带参数的路径写进指标造成标签爆炸
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match else '') or 'unmatched'
+
+
+# 请求方法由客户端决定，标准方法之外一律记为 other，任意自定义方法不会产生新的序列
+KNOWN_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+
+def _method_label(request) -> str:
+    return request.method if request.method in KNOWN_METHODS else 'other'
+
+
+class MetricsMiddleware:
+    """记录每个视图的处理耗时与 SQL 数量，同时支持 WSGI 与 ASGI。"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with count_queries() as queries:
+            response = self.get_response(request)
+        self._observe(request, response, started, queries[0])
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with count_queries() as queries:
+            response = await self.get_response(request)
+        self._observe(request, response, started, queries[0])
+        return response
+
+    def _observe(self, request, response, started: float, queries: int) -> None:
+        view = _view_label(request)
+        HTTP_SECONDS.observe(time.perf_counter() - started, view, _method_label(request), str(response.status_code))
+        HTTP_QUERIES.observe(queries, view)
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('captcha', '0002_update_captcha_type_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='captchachallenge',
+            index=models.Index(fields=['expires_at'], name='captcha_cap_expires_2fb5c4_idx'),
+        ),
+    ]
@@ -37,6 +37,7 @@ class CaptchaChallenge(models.Model):
         indexes = [
             models.Index(fields=['token']),
             models.Index(fields=['type']),
+            models.Index(fields=['expires_at']),
         ]
 
     def is_expired(self) -> bool:
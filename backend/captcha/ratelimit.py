@@ -0,0 +1,248 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency guard
+    redis = None  # type: ignore[assignment]
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    scope: str
+    limit: int
+    window: float
+
+    @classmethod
+    def parse(cls, scope: str, raw) -> 'RateLimitRule | None':
+        """接受 ``{"limit": 5, "window": 600}`` 或 ``[5, 600]``，limit 为空或不大于 0 表示不限制。"""
+        if isinstance(raw, dict):
+            limit, window = raw.get('limit'), raw.get('window', 60)
+        elif isinstance(raw, (list, tuple)) and len(raw) == 2:
+            limit, window = raw
+        else:
+            return None
+        try:
+            limit, window = int(limit), float(window)
+        except (TypeError, ValueError):
+            return None
+        if limit <= 0 or window <= 0:
+            return None
+        return cls(scope, limit, window)
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    scope: str = ''
+    retry_after: int = 0
+    # 放行时记下计入的时刻，归还额度时据此找到对应的窗口
+    charged_at: float = 0.0
+
+
+def _retry_after(previous: int, current: int, cost: int, limit: int, window: float, elapsed: float) -> int:
+    """估算再过多少秒滑动窗口内的加权计数能容纳本次请求。"""
+    if cost > limit:
+        return math.ceil(window)
+    if current + cost > limit:
+        # 本窗口已满，等到下一窗口中本窗口计数衰减到足够小
+        fraction = 1 - (limit - cost) / current
+        wait = (window - elapsed) + fraction * window
+    else:
+        fraction = 1 - (limit - cost - current) / previous
+        wait = fraction * window - elapsed
+    return max(1, math.ceil(wait))
+
+
+class LocalRateLimitStore:
+    """进程内滑动窗口计数，每个键只保存当前与上一个窗口的计数，超过 max_keys 时淘汰最久未用的键。"""
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.time) -> None:
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._windows: OrderedDict[str, list] = OrderedDict()
+
+    def hit(self, key: str, rule: RateLimitRule, cost: int = 1) -> RateLimitDecision:
+        now = self.clock()
+        index, elapsed = divmod(now, rule.window)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                entry = self._windows[key] = [index, 0, 0]
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(key)
+                if entry[0] != index:
+                    entry[2] = entry[1] if entry[0] == index - 1 else 0
+                    entry[0], entry[1] = index, 0
+            current, previous = entry[1], entry[2]
+            if previous * (1 - elapsed / rule.window) + current + cost > rule.limit:
+                retry = _retry_after(previous, current, cost, rule.limit, rule.window, elapsed)
+                return RateLimitDecision(False, rule.scope, retry)
+            entry[1] = current + cost
+        return RateLimitDecision(True, rule.scope, charged_at=now)
+
+    def refund(self, key: str, rule: RateLimitRule, cost: int, charged_at: float) -> None:
+        index = charged_at // rule.window
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                return
+            if entry[0] == index:
+                entry[1] = max(entry[1] - cost, 0)
+            elif entry[0] == index + 1:
+                entry[2] = max(entry[2] - cost, 0)
+
+
+class KeyValueRateLimitStore:
+    """基于 Redis 兼容键值库的滑动窗口计数，多进程 / 多节点共享同一份限额。
+
+    每个窗口一个计数键：``INCRBY`` 先占用额度，超限时再用负数 ``INCRBY`` 归还，
+    不依赖 Lua 脚本，任何实现了 incrby/expire/get 的客户端都可以使用。
+    """
+
+    # 每次计数都要访问网络，异步视图需要放到线程中调用
+    blocking = True
+
+    def __init__(
+        self,
+        client=None,
+        url: str = '',
+        prefix: str = 'captcha:ratelimit:',
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if client is None:
+            if redis is None:
+                raise RuntimeError('未安装 redis，无法使用 KeyValueRateLimitStore')
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.client = client
+        self.prefix = prefix
+        self.clock = clock
+
+    def hit(self, key: str, rule: RateLimitRule, cost: int = 1) -> RateLimitDecision:
+        now = self.clock()
+        index, elapsed = divmod(now, rule.window)
+        current_key = f'{self.prefix}{key}:{int(index)}'
+        current = int(self.client.incrby(current_key, cost))
+        if current == cost:
+            # 计数键需要保留到下一个窗口结束，作为那时的“上一窗口”计数
+            self.client.expire(current_key, math.ceil(rule.window * 2))
+        previous = int(self.client.get(f'{self.prefix}{key}:{int(index) - 1}') or 0)
+        if previous * (1 - elapsed / rule.window) + current > rule.limit:
+            self.client.incrby(current_key, -cost)
+            retry = _retry_after(previous, current - cost, cost, rule.limit, rule.window, elapsed)
+            return RateLimitDecision(False, rule.scope, retry)
+        return RateLimitDecision(True, rule.scope, charged_at=now)
+
+    def refund(self, key: str, rule: RateLimitRule, cost: int, charged_at: float) -> None:
+        # 只归还到计入时的窗口键；该键带过期时间，不会留下没有过期时间的负数键
+        window_key = f'{self.prefix}{key}:{int(charged_at // rule.window)}'
+        if self.client.get(window_key) is not None:
+            self.client.incrby(window_key, -cost)
+
+
+class RateLimiter:
+    """按 IP、目标手机号 / 邮箱与验证码类型限流，规则来自默认配置与类型配置中的 ``rate_limit``。"""
+
+    def __init__(self, store, defaults: dict | None = None, enabled: bool = True) -> None:
+        self.store = store
+        self.enabled = enabled
+        self.defaults = {
+            scope: rule
+            for scope, rule in ((scope, RateLimitRule.parse(scope, raw)) for scope, raw in (defaults or {}).items())
+            if rule is not None
+        }
+
+    def rules_for(self, config: dict) -> list[RateLimitRule]:
+        overrides = config.get('rate_limit')
+        if not isinstance(overrides, dict):
+            return list(self.defaults.values())
+        rules = dict(self.defaults)
+        for scope, raw in overrides.items():
+            rule = RateLimitRule.parse(scope, raw)
+            if rule is None:
+                rules.pop(scope, None)
+            else:
+                rules[scope] = rule
+        return list(rules.values())
+
+    def check(self, type_name: str, config: dict, identities: dict, cost: int = 1) -> RateLimitDecision:
+        """identities 形如 ``{'ip': '1.2.3.4', 'target': 'a@b.com'}``，缺少的维度不参与限流。
+
+        任一规则拒绝时，归还前面规则已经计入的额度，被拒绝的请求不消耗任何限额。
+        """
+        if not self.enabled:
+            return RateLimitDecision(True)
+        charged = []
+        for rule in self.rules_for(config):
+            identity = identities.get(rule.scope)
+            if not identity:
+                continue
+            key = f'{type_name}:{rule.scope}:{identity}'
+            decision = self.store.hit(key, rule, cost)
+            if not decision.allowed:
+                for charged_key, charged_rule, charged_at in charged:
+                    self.store.refund(charged_key, charged_rule, cost, charged_at)
+                return decision
+            charged.append((key, rule, decision.charged_at))
+        return RateLimitDecision(True)
+
+    def hit(self, key: str, rule: RateLimitRule, cost: int = 1) -> RateLimitDecision:
+        if not self.enabled:
+            return RateLimitDecision(True)
+        return self.store.hit(key, rule, cost)
+
+    @property
+    def blocking(self) -> bool:
+        return self.enabled and getattr(self.store, 'blocking', False)
+
+    def refund(self, key: str, rule: RateLimitRule, cost: int, decision: RateLimitDecision) -> None:
+        """归还 hit 放行时计入的额度，用于后续检查失败、请求最终被拒绝的情况。"""
+        if decision.allowed and decision.charged_at:
+            self.store.refund(key, rule, cost, decision.charged_at)
+
+
+def build_rate_limiter(config: dict | None = None) -> RateLimiter:
+    config = config or getattr(settings, 'CAPTCHA_RATE_LIMIT', {}) or {}
+    options = dict(config.get('OPTIONS', {}))
+    client = options.get('client')
+    if isinstance(client, str):
+        options['client'] = import_string(client)()
+    store = import_string(config.get('STORE', 'captcha.ratelimit.LocalRateLimitStore'))(**options)
+    return RateLimiter(store, defaults=config.get('DEFAULTS'), enabled=config.get('ENABLED', True))
+
+
+_limiter_lock = threading.Lock()
+_limiter: RateLimiter | None = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = build_rate_limiter()
+    return _limiter
+
+
+def reset_rate_limiter() -> None:
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting, **kwargs) -> None:
+    if setting == 'CAPTCHA_RATE_LIMIT':
+        reset_rate_limiter()
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import CaptchaChallenge
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PurgeResult:
+    deleted: int
+    batches: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        return self.deleted / self.elapsed if self.elapsed > 0 else float(self.deleted)
+
+
+def purge_expired_challenges(
+    *,
+    chunk_size: int = 1000,
+    sleep_seconds: float = 0.0,
+    max_batches: int | None = None,
+    now: datetime | None = None,
+) -> PurgeResult:
+    """按批删除已过期的验证码挑战，每批只锁定 chunk_size 行，批次之间可休眠。"""
+    cutoff = now or datetime.now()
+    chunk_size = max(int(chunk_size), 1)
+    started = time.perf_counter()
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            CaptchaChallenge.objects.filter(expires_at__lte=cutoff)
+            .order_by('expires_at')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        count, _ = CaptchaChallenge.objects.filter(id__in=ids).delete()
+        deleted += count
+        batches += 1
+        if len(ids) < chunk_size:
+            break
+        if sleep_seconds > 0:
+            time.sleep(sleep_seconds)
+    return PurgeResult(deleted=deleted, batches=batches, elapsed=time.perf_counter() - started)
+
+
+class ChallengeSweeper(threading.Thread):
+    """进程内定期清理过期挑战的后台线程（CAPTCHA_SWEEP_INTERVAL 大于 0 时启用）。"""
+
+    def __init__(self, interval: float, chunk_size: int = 1000, sleep_seconds: float = 0.0) -> None:
+        super().__init__(name='captcha-sweeper', daemon=True)
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.sleep_seconds = sleep_seconds
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                result = purge_expired_challenges(chunk_size=self.chunk_size, sleep_seconds=self.sleep_seconds)
+                if result.deleted:
+                    logger.info('清理过期验证码 %s 条，%.0f 条/秒', result.deleted, result.rate)
+            except Exception:  # pragma: no cover - 后台线程不能退出
+                logger.exception('清理过期验证码失败')
+            finally:
+                close_old_connections()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_sweeper_lock = threading.Lock()
+_sweeper: ChallengeSweeper | None = None
+
+
+def start_sweeper() -> ChallengeSweeper | None:
+    global _sweeper
+    interval = float(getattr(settings, 'CAPTCHA_SWEEP_INTERVAL', 0) or 0)
+    if interval <= 0:
+        return None
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = ChallengeSweeper(
+                interval,
+                chunk_size=int(getattr(settings, 'CAPTCHA_SWEEP_CHUNK_SIZE', 1000)),
+                sleep_seconds=float(getattr(settings, 'CAPTCHA_SWEEP_SLEEP', 0.0)),
+            )
+            _sweeper.start()
+    return _sweeper
+
+
+__all__ = ['PurgeResult', 'purge_expired_challenges', 'ChallengeSweeper', 'start_sweeper']
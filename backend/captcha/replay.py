@@ -0,0 +1,280 @@
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .codec import decode_answer
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency guard
+    pq = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# 行为验证码的阈值放在 answer['thresholds'] 中，其余类型直接覆盖 answer 的同名字段
+NESTED_THRESHOLD_TYPES = frozenset({'behavior'})
+
+# 每个统计单元：[总数, 通过, 人类样本数, 人类通过, 机器样本数, 机器通过]
+_SLOTS = 6
+
+_service = None
+
+
+@dataclass(frozen=True)
+class SweepPoint:
+    type_name: str
+    key: str
+    value: object
+
+
+@dataclass
+class ReplayReport:
+    records: int = 0
+    invalid: int = 0
+    errors: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    rows: list[dict] = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        return self.records / self.elapsed if self.elapsed > 0 else float(self.records)
+
+    def to_dict(self) -> dict:
+        return {
+            'records': self.records,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'chunks': self.chunks,
+            'seconds': round(self.elapsed, 3),
+            'records_per_second': round(self.rate, 1),
+            'rows': self.rows,
+        }
+
+
+def parse_sweep(specs: Iterable[str]) -> list[SweepPoint]:
+    """解析 ``slider.tolerance=3,5,8`` 形式的扫描参数，数值自动转为数字。"""
+    points = []
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        type_name, dot, key = name.strip().partition('.')
+        if not sep or not dot or not type_name or not key or not values.strip():
+            raise ValueError(f'无法解析扫描参数：{spec}（格式：类型.字段=值1,值2）')
+        for raw in values.split(','):
+            raw = raw.strip()
+            if raw:
+                points.append(SweepPoint(type_name, key, _coerce(raw)))
+    return points
+
+
+def _coerce(raw: str):
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            continue
+    return raw
+
+
+def iter_records(path: str | os.PathLike, *, batch_size: int = 1000) -> Iterator[str | dict]:
+    """逐条产出记录：JSONL（可 gzip）产出原始行，由工作进程解析；Parquet 按行组分批读取。"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        if pq is None:
+            raise RuntimeError('读取 Parquet 需要安装 pyarrow')
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+        return
+
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            if line.strip():
+                yield line
+
+
+def iter_chunks(records: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _verifier():
+    # 工作进程中首次使用时才导入并构造服务，spawn 启动方式下也先完成 django.setup()
+    global _service
+    if _service is None:
+        import django
+        from django.apps import apps
+
+        if not apps.ready:
+            django.setup()
+        from .services import CaptchaService
+        from .stores import LocMemChallengeStore
+
+        _service = CaptchaService(bootstrap=False, store=LocMemChallengeStore(max_entries=1))
+    return _service
+
+
+def _load(value):
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def _override(expected: dict, point: SweepPoint) -> dict:
+    if point.type_name in NESTED_THRESHOLD_TYPES:
+        thresholds = dict(expected.get('thresholds') or {})
+        thresholds[point.key] = point.value
+        return {**expected, 'thresholds': thresholds}
+    return {**expected, point.key: point.value}
+
+
+def _tally(slots: list[int], passed: bool, label) -> None:
+    slots[0] += 1
+    slots[1] += passed
+    if label is not None:
+        offset = 2 if label else 4
+        slots[offset] += 1
+        slots[offset + 1] += passed
+
+
+def score_chunk(chunk: list, sweep: tuple[SweepPoint, ...]) -> tuple[dict, int, int]:
+    """在当前进程中回放一批记录，返回 {(类型, 字段, 取值): 计数}、无效记录数与校验出错的记录数。
+
+    actual 与线上一样原样交给 verify_answer 规范化，字符串答案（如 "ABCDE"）不会被当作 JSON 解析；
+    某条记录校验时抛出异常只计入出错数，不影响同批其他记录。
+    """
+    service = _verifier()
+    by_type = defaultdict(list)
+    for point in sweep:
+        by_type[point.type_name].append(point)
+
+    counters: dict[tuple, list[int]] = {}
+    invalid = 0
+    errors = 0
+    for raw in chunk:
+        try:
+            record = _load(raw)
+            type_name = record['type']
+            expected = decode_answer(record['expected'])
+            actual = record['actual']
+            if not isinstance(expected, dict):
+                raise TypeError('expected 必须是对象')
+        except (KeyError, TypeError, ValueError):
+            invalid += 1
+            continue
+
+        # 先算完一条记录的全部结果再计数，出错的记录不会只计入一部分扫描取值
+        try:
+            results = [((type_name, None, None), service.verify_answer(type_name, expected, actual))]
+            for point in by_type.get(type_name, ()):
+                passed = service.verify_answer(type_name, _override(expected, point), actual)
+                results.append(((type_name, point.key, point.value), passed))
+        except Exception:
+            if not errors:
+                logger.exception('回放 %s 验证码记录时校验出错', type_name)
+            errors += 1
+            continue
+
+        label = record.get('human')
+        for key, passed in results:
+            _tally(counters.setdefault(key, [0] * _SLOTS), passed, label)
+    return counters, invalid, errors
+
+
+def _merge(total: dict, counters: dict) -> None:
+    for key, slots in counters.items():
+        current = total.setdefault(key, [0] * _SLOTS)
+        for index, value in enumerate(slots):
+            current[index] += value
+
+
+def _rate(numerator: int, denominator: int) -> float | None:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def _row_order(item) -> tuple:
+    type_name, key, value = item[0]
+    numeric = isinstance(value, (int, float))
+    return type_name, key is not None, key or '', not numeric, value if numeric else str(value)
+
+
+def _rows(totals: dict) -> list[dict]:
+    rows = []
+    for (type_name, key, value), slots in sorted(totals.items(), key=_row_order):
+        total, accepted, human_total, human_accepted, bot_total, bot_accepted = slots
+        rows.append({
+            'type': type_name,
+            'param': f'{key}={value}' if key is not None else '(recorded)',
+            'total': total,
+            'accepted': accepted,
+            'rejected': total - accepted,
+            'accept_rate': _rate(accepted, total),
+            'human_accept_rate': _rate(human_accepted, human_total),
+            'bot_accept_rate': _rate(bot_accepted, bot_total),
+        })
+    return rows
+
+
+def replay_verifications(
+    source: str | os.PathLike | Iterable,
+    *,
+    sweep: Iterable[SweepPoint] = (),
+    chunk_size: int = 2000,
+    workers: int | None = None,
+) -> ReplayReport:
+    """离线回放历史答案，统计当前配置与各扫描取值下的通过率。
+
+    source 为文件路径或任意记录迭代器，每条记录包含 type、expected、actual；expected
+    可以是答案对象、JSON 字符串或挑战记录中的紧凑编码。可选 human（真 / 假）用于分别统计
+    人类与机器样本的通过率。记录按 chunk_size 分批交给进程池，同时在途的批次不超过工作
+    进程数的两倍，内存占用与文件大小无关。
+    workers=0 时在当前进程内执行。
+    """
+    sweep = tuple(sweep)
+    chunk_size = max(int(chunk_size), 1)
+    records = iter_records(source) if isinstance(source, (str, os.PathLike)) else source
+    chunks = iter_chunks(records, chunk_size)
+
+    report = ReplayReport()
+    totals: dict[tuple, list[int]] = {}
+    started = time.perf_counter()
+
+    def collect(counters: dict, invalid: int, errors: int) -> None:
+        _merge(totals, counters)
+        report.invalid += invalid
+        report.errors += errors
+        report.chunks += 1
+
+    if workers == 0:
+        for chunk in chunks:
+            collect(*score_chunk(chunk, sweep))
+    else:
+        workers = workers or os.cpu_count() or 1
+        max_pending = workers * 2
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(*future.result())
+                pending.add(executor.submit(score_chunk, chunk, sweep))
+            for future in pending:
+                collect(*future.result())
+
+    report.elapsed = time.perf_counter() - started
+    report.rows = _rows(totals)
+    recorded = sum(row['total'] for row in report.rows if row['param'] == '(recorded)')
+    report.records = recorded + report.invalid + report.errors
+    return report
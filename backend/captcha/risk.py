@@ -0,0 +1,144 @@
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_LEVELS = (
+    {'score': 0, 'type': 'invisible'},
+    {'score': 2, 'type': 'slider'},
+    {'score': 4, 'type': 'grid'},
+    {'score': 8, 'type': 'sms'},
+)
+DEFAULT_WEIGHTS = {'ip': 1.0, 'subnet': 0.3, 'user': 1.0}
+
+
+def subnet_of(ip: str) -> str | None:
+    """IPv4 取 /24，IPv6 取 /64，无法解析时返回 None。"""
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return None
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+class RiskTracker:
+    """按 IP、子网与用户名记录近期的验证 / 登录结果，计数按半衰期指数衰减。
+
+    每个维度只保存 [衰减后的失败数, 衰减后的总次数, 上次更新时间]，记录与查询都是 O(1)；
+    某维度的风险分 = 权重 × 失败数 × 失败率，既要求失败次数多，也要求失败占比高，
+    共用出口 IP 的大量正常用户不会因为个别失败被整体升级。
+    """
+
+    def __init__(
+        self,
+        half_life: float = 600.0,
+        weights: dict | None = None,
+        max_keys: int = 200_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.half_life = half_life
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counters: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+
+    def record(self, *, ip: str | None = None, username: str | None = None, success: bool) -> None:
+        now = self.clock()
+        with self._lock:
+            for key in self._keys(ip, username):
+                entry = self._decayed(key, now, create=True)
+                entry[0] += 0.0 if success else 1.0
+                entry[1] += 1.0
+
+    def score(self, *, ip: str | None = None, username: str | None = None) -> float:
+        now = self.clock()
+        best = 0.0
+        with self._lock:
+            for key in self._keys(ip, username):
+                entry = self._decayed(key, now, create=False)
+                if entry is None or entry[1] <= 0:
+                    continue
+                failures, total = entry[0], entry[1]
+                best = max(best, self.weights.get(key[0], 1.0) * failures * failures / total)
+        return best
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def _keys(self, ip: str | None, username: str | None) -> list[tuple[str, str]]:
+        keys = []
+        if ip:
+            keys.append(('ip', ip))
+            subnet = subnet_of(ip)
+            if subnet:
+                keys.append(('subnet', subnet))
+        if username:
+            keys.append(('user', username))
+        return keys
+
+    def _decayed(self, key: tuple[str, str], now: float, *, create: bool) -> list[float] | None:
+        entry = self._counters.get(key)
+        if entry is None:
+            if not create:
+                return None
+            entry = self._counters[key] = [0.0, 0.0, now]
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return entry
+        self._counters.move_to_end(key)
+        elapsed = now - entry[2]
+        if elapsed > 0:
+            factor = 0.5 ** (elapsed / self.half_life)
+            entry[0] *= factor
+            entry[1] *= factor
+            entry[2] = now
+        return entry
+
+
+def escalation_levels() -> list[dict]:
+    options = getattr(settings, 'CAPTCHA_RISK', {}) or {}
+    levels = options.get('LEVELS') or DEFAULT_LEVELS
+    return sorted(levels, key=lambda level: float(level['score']))
+
+
+def risk_enabled() -> bool:
+    options = getattr(settings, 'CAPTCHA_RISK', {}) or {}
+    return bool(options.get('ENABLED', False))
+
+
+_tracker_lock = threading.Lock()
+_tracker: RiskTracker | None = None
+
+
+def get_risk_tracker() -> RiskTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                options = getattr(settings, 'CAPTCHA_RISK', {}) or {}
+                _tracker = RiskTracker(
+                    half_life=float(options.get('HALF_LIFE', 600)),
+                    weights=options.get('WEIGHTS'),
+                    max_keys=int(options.get('MAX_KEYS', 200_000)),
+                )
+    return _tracker
+
+
+def reset_risk_tracker() -> None:
+    global _tracker
+    with _tracker_lock:
+        _tracker = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting, **kwargs) -> None:
+    if setting == 'CAPTCHA_RISK':
+        reset_risk_tracker()
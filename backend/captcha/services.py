@@ -1,12 +1,18 @@
+import hmac
 import json
 import logging
+import math
 import random
 import string
+import threading
+import time
+from concurrent.futures import Future
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, Tuple
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.db import transaction
 
 try:
@@ -16,15 +22,48 @@ except ImportError:  # pragma: no cover - optional dependency guard
     TwilioException = Exception  # type: ignore[assignment]
     Client = None  # type: ignore[assignment]
 
-from .models import CaptchaChallenge, CaptchaType
+from . import connections
+from .cache import CachedCaptchaType, parse_config, type_cache
+from .codec import decode_answer, digest_matches, encode_answer, encode_payload
+from .delivery import DeliveryJob, async_delivery_enabled, get_delivery_queue
+from .engines import behavior
+from .engines.grid import get_grid_engine
+from .engines.slider import get_slider_engine
+from .engines.text_image import get_text_image_pool
+from .mailer import get_email_batcher
+from .masking import mask_email, mask_phone
+from .metrics import DELIVERY_SECONDS, GENERATE_SECONDS, GENERATE_TOTAL, VERIFY_SECONDS, VERIFY_TOTAL
+from .models import CaptchaType
+from .ratelimit import RateLimitRule, get_rate_limiter
+from .risk import escalation_levels, get_risk_tracker, risk_enabled
+from .stores import ChallengeRecord, ChallengeStore, get_challenge_store
 
 logger = logging.getLogger(__name__)
 
 
+# 生成时需要查库或发送消息的类型，异步接口中放到 thread-sensitive 线程里执行
+BLOCKING_TYPES = frozenset({'email', 'sms', 'voice'})
+
+# 只做少量内存运算的类型，异步接口中直接在事件循环里生成；
+# 其余类型（text 绘图、slider 的 NumPy 运算、grid 首次建索引）放到普通线程池中执行
+INLINE_TYPES = frozenset({'arithmetic', 'behavior', 'invisible'})
+
+# 滑块缺口允许的像素误差，可在类型配置中用 tolerance 覆盖
+SLIDER_TOLERANCE = 5
+
+
 class CaptchaGenerationError(Exception):
     """Raised when a captcha challenge cannot be created."""
 
 
+class RateLimitExceeded(CaptchaGenerationError):
+    """Raised when a client exceeds its captcha request quota."""
+
+    def __init__(self, message: str, retry_after: int = 0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 @dataclass
 class CaptchaGenerator:
     description: str
@@ -32,44 +71,37 @@ class CaptchaGenerator:
     default_ttl: int = 180
 
 
-def mask_email(value: str) -> str:
-    if not value or '@' not in value:
-        return value
-    local, domain = value.split('@', 1)
-    if len(local) <= 2:
-        masked_local = local[0] + '*' if local else '*' * 3
-    else:
-        masked_local = f"{local[0]}{'*' * (len(local) - 2)}{local[-1]}"
-    return f'{masked_local}@{domain}'
-
-
-def mask_phone(value: str) -> str:
-    if not value:
-        return value
-    digits = ''.join(ch for ch in value if ch.isdigit())
-    if len(digits) < 7:
-        return value
-    masked = f"{digits[:3]}****{digits[-4:]}"
-    if value.strip().startswith('+') and not masked.startswith('+'):
-        return f'+{masked}'
-    return masked
+# 依赖图片库 / 第三方库的类型：风险升级选择级别前先确认引擎能初始化，不能时落到下一个级别
+ENGINE_PROBES: Dict[str, Callable[[], Any]] = {
+    'text': get_text_image_pool,
+    'slider': get_slider_engine,
+    'grid': get_grid_engine,
+}
+ENGINE_RETRY_SECONDS = 60.0
 
 
 class CaptchaService:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        bootstrap: bool = True,
+        store: ChallengeStore | None = None,
+        rng: random.Random | None = None,
+    ) -> None:
         self._registry: Dict[str, CaptchaGenerator] = {}
+        self.store = store if store is not None else get_challenge_store()
+        # 压测时注入带种子的 rng，生成器的随机数全部取自它，同样的请求序列得到同样的挑战
+        self.rng = rng if rng is not None else random.Random()
+        self._seeded = rng is not None
+        self._engine_status: Dict[str, Tuple[bool, float]] = {}
+        self._engine_lock = threading.Lock()
         self._register_default_generators()
-        self.ensure_types_exist()
+        if bootstrap:
+            self.ensure_types_exist()
 
     # region public api
     def get_default_type(self) -> str:
-        default_type = CaptchaType.objects.filter(enabled=True, is_default=True).first()
-        if default_type:
-            return default_type.type_name
-        fallback = CaptchaType.objects.filter(enabled=True).first()
-        if fallback:
-            return fallback.type_name
-        return 'text'
+        return type_cache.get_default_type()
 
     def generate_challenge(
         self,
@@ -78,87 +110,172 @@ class CaptchaService:
         user_agent: str = '',
         requested_type: str | None = None,
         request_data: dict | None = None,
-    ) -> CaptchaChallenge:
-        request_data = request_data or {}
-        type_name = requested_type or self.get_default_type()
-        captcha_type = self._get_enabled_type(type_name)
-        if captcha_type is None:
-            type_name = self.get_default_type()
-            captcha_type = self._get_enabled_type(type_name)
-        if captcha_type is None:
-            raise CaptchaGenerationError('没有可用的验证码类型，请联系管理员')
-
-        generator = self._registry[type_name]
-        config = self._load_config(captcha_type)
-        context = {'request': request_data, 'config': config, 'captcha_type': captcha_type}
-
-        payload, answer, ttl = generator.generator(context)
-        ttl = self._resolve_ttl(config, ttl or generator.default_ttl)
-
-        challenge = CaptchaChallenge.create(
-            type_name,
-            json.dumps(payload, ensure_ascii=False),
-            json.dumps(answer, ensure_ascii=False),
-            client_ip=client_ip,
-            user_agent=user_agent,
-            ttl_seconds=ttl,
-        )
+    ) -> ChallengeRecord:
+        type_name, generator, context = self._prepare_generation(requested_type, request_data, client_ip)
+        self._enforce_rate_limit(type_name, context, client_ip)
+        payload, answer, ttl = self._run_generator(type_name, generator, context)
+        challenge = self._build_record(type_name, generator, context, payload, answer, ttl, client_ip, user_agent)
+        challenge = self.store.create(challenge)
+        self._submit_deliveries(context, challenge)
         return challenge
 
-    def validate_and_consume(self, *, token: str, user_answer: Any, client_ip: str) -> tuple[bool, str, str | None]:
+    def generate_challenges(
+        self,
+        count: int,
+        *,
+        client_ip: str,
+        user_agent: str = '',
+        requested_type: str | None = None,
+        request_data: dict | None = None,
+    ) -> list[ChallengeRecord]:
+        """一次生成 count 个挑战并批量写入存储，供预取、自助终端与压测使用。"""
+        options = getattr(settings, 'CAPTCHA_BATCH', {}) or {}
+        max_count = int(options.get('MAX_COUNT', 50))
+        if count < 1 or count > max_count:
+            raise CaptchaGenerationError(f'批量数量需在 1 到 {max_count} 之间')
+
+        type_name, generator, context = self._prepare_generation(requested_type, request_data, client_ip)
+        if type_name in BLOCKING_TYPES:
+            raise CaptchaGenerationError('该验证码类型不支持批量获取')
+        # 批量规则单独决定一次能取多少个；按类型的 IP / 目标规则只计一次，否则 31 个以上的批量永远超限
+        refund_batch = self._reserve_batch_quota(client_ip, count, options)
         try:
-            challenge = CaptchaChallenge.objects.get(token=token)
-        except CaptchaChallenge.DoesNotExist:
-            return False, '验证码不存在或已过期', None
-
-        if challenge.client_ip != client_ip:
-            return False, '请求IP与验证码不匹配', challenge.type
-        if challenge.is_expired():
-            return False, '验证码已过期', challenge.type
-        if challenge.validated:
-            return False, '验证码已验证，请重新获取', challenge.type
-
-        expected = json.loads(challenge.answer)
-        normalized_answer = self._normalize_answer(user_answer)
-
-        verifier = getattr(self, f'_verify_{challenge.type}', None)
+            self._enforce_rate_limit(type_name, context, client_ip)
+        except RateLimitExceeded:
+            refund_batch()
+            raise
+
+        records = []
+        for _ in range(count):
+            payload, answer, ttl = self._run_generator(type_name, generator, context)
+            records.append(
+                self._build_record(type_name, generator, context, payload, answer, ttl, client_ip, user_agent)
+            )
+        return self.store.create_many(records)
+
+    def verify_answer(self, type_name: str, expected: dict | str, user_answer: Any) -> bool:
+        """只比对答案本身，不涉及挑战状态；离线回放与在线校验共用这一入口。
+
+        expected 可以是答案字典，也可以是挑战记录中保存的编码字符串。
+        """
+        verifier = getattr(self, f'_verify_{type_name}', None)
         if verifier is None:
             verifier = self._default_verify
+        try:
+            expected = decode_answer(expected)
+        except ValueError:
+            logger.warning('无法解析 %s 验证码的答案记录', type_name)
+            return False
+        return bool(verifier(expected, self._normalize_answer(user_answer)))
 
-        if verifier(expected, normalized_answer):
-            challenge.validated = True
-            challenge.save(update_fields=['validated'])
-            return True, '验证码验证成功', challenge.type
-        return False, '验证码答案错误', challenge.type
+    async def agenerate_challenge(
+        self,
+        *,
+        client_ip: str,
+        user_agent: str = '',
+        requested_type: str | None = None,
+        request_data: dict | None = None,
+    ) -> ChallengeRecord:
+        await type_cache.aensure_fresh()
+        if risk_enabled() or get_rate_limiter().blocking:
+            # 风险升级可能首次探测图片引擎，键值库限流每次都要访问网络，都不能在事件循环里执行
+            type_name, generator, context = await sync_to_async(self._prepare_and_limit, thread_sensitive=False)(
+                requested_type, request_data, client_ip
+            )
+        else:
+            type_name, generator, context = self._prepare_and_limit(requested_type, request_data, client_ip)
+        if type_name in INLINE_TYPES:
+            payload, answer, ttl = self._run_generator(type_name, generator, context)
+        elif type_name in BLOCKING_TYPES:
+            # 邮件 / 短信 / 语音生成器可能查询用户邮箱，留在持有数据库连接的 thread-sensitive 线程中
+            payload, answer, ttl = await sync_to_async(self._run_generator)(type_name, generator, context)
+        else:
+            payload, answer, ttl = await sync_to_async(self._run_generator, thread_sensitive=False)(
+                type_name, generator, context
+            )
+        challenge = self._build_record(type_name, generator, context, payload, answer, ttl, client_ip, user_agent)
+        challenge = await self.store.acreate(challenge)
+        self._submit_deliveries(context, challenge)
+        return challenge
 
-    def consume_verified_token(self, token: str, client_ip: str) -> tuple[bool, str, str | None]:
-        try:
-            challenge = CaptchaChallenge.objects.get(token=token)
-        except CaptchaChallenge.DoesNotExist:
-            return False, '验证码不存在或已过期', None
+    def validate_and_consume(self, *, token: str, user_answer: Any, client_ip: str) -> tuple[bool, str, str | None]:
+        started = time.perf_counter()
+        result = self._validate_and_consume(token, user_answer, client_ip)
+        return self._track_outcome(client_ip, result, stage='verify', started=started)
 
-        if challenge.client_ip != client_ip:
-            return False, '请求IP与验证码不匹配', challenge.type
-        if challenge.is_expired():
-            return False, '验证码已过期', challenge.type
-        if not challenge.validated:
-            return False, '请先完成验证码验证', challenge.type
+    async def avalidate_and_consume(
+        self, *, token: str, user_answer: Any, client_ip: str
+    ) -> tuple[bool, str, str | None]:
+        started = time.perf_counter()
+        result = await self._avalidate_and_consume(token, user_answer, client_ip)
+        return self._track_outcome(client_ip, result, stage='verify', started=started)
 
-        captcha_type = challenge.type
-        challenge.delete()
-        return True, '验证码校验通过', captcha_type
+    def consume_verified_token(self, token: str, client_ip: str) -> tuple[bool, str, str | None]:
+        started = time.perf_counter()
+        result = self._consume_verified_token(token, client_ip)
+        return self._track_outcome(client_ip, result, stage='consume', started=started)
+
+    async def aconsume_verified_token(self, token: str, client_ip: str) -> tuple[bool, str, str | None]:
+        started = time.perf_counter()
+        result = await self._aconsume_verified_token(token, client_ip)
+        return self._track_outcome(client_ip, result, stage='consume', started=started)
+
+    def _validate_and_consume(self, token: str, user_answer: Any, client_ip: str) -> tuple[bool, str, str | None]:
+        challenge = self.store.get(token)
+        error = self._check_answer(challenge, user_answer, client_ip)
+        if error:
+            return error
+        if self.store.mark_validated(token, client_ip, challenge):
+            return True, '验证码验证成功', challenge.type
+        return self._diagnose_failure(token, client_ip, require_validated=False)
+
+    async def _avalidate_and_consume(
+        self, token: str, user_answer: Any, client_ip: str
+    ) -> tuple[bool, str, str | None]:
+        challenge = await self.store.aget(token)
+        error = self._check_answer(challenge, user_answer, client_ip)
+        if error:
+            return error
+        if await self.store.amark_validated(token, client_ip, challenge):
+            return True, '验证码验证成功', challenge.type
+        return self._explain_failure(await self.store.aget(token), client_ip, require_validated=False)
+
+    def _consume_verified_token(self, token: str, client_ip: str) -> tuple[bool, str, str | None]:
+        captcha_type = self.store.consume_validated(token, client_ip)
+        if captcha_type is not None:
+            return True, '验证码校验通过', captcha_type
+        return self._diagnose_failure(token, client_ip, require_validated=True)
+
+    async def _aconsume_verified_token(self, token: str, client_ip: str) -> tuple[bool, str, str | None]:
+        captcha_type = await self.store.aconsume_validated(token, client_ip)
+        if captcha_type is not None:
+            return True, '验证码校验通过', captcha_type
+        return self._explain_failure(await self.store.aget(token), client_ip, require_validated=True)
+
+    def record_login(self, *, client_ip: str, username: str, success: bool, captcha_passed: bool = True) -> None:
+        """登录结果计入风险计数；验证码未通过时 IP 维度已由校验接口计入，只补记用户维度。"""
+        if not risk_enabled():
+            return
+        get_risk_tracker().record(ip=client_ip if captcha_passed else None, username=username, success=success)
 
     def ensure_types_exist(self) -> None:
         with transaction.atomic():
+            existing = {
+                captcha_type.type_name: captcha_type
+                for captcha_type in CaptchaType.objects.filter(type_name__in=list(self._registry))
+            }
             for type_name, generator in self._registry.items():
-                defaults = {
-                    'description': generator.description,
-                    'enabled': True,
-                    'config_json': json.dumps({'ttl': generator.default_ttl}, ensure_ascii=False),
-                    'is_default': type_name == 'text',
-                }
-                captcha_type, created = CaptchaType.objects.get_or_create(type_name=type_name, defaults=defaults)
-                if created:
+                captcha_type = existing.get(type_name)
+                if captcha_type is None:
+                    CaptchaType.objects.get_or_create(
+                        type_name=type_name,
+                        defaults={
+                            'description': generator.description,
+                            'enabled': True,
+                            'config_json': json.dumps({'ttl': generator.default_ttl}, ensure_ascii=False),
+                            'is_default': type_name == 'text',
+                        },
+                    )
                     continue
 
                 updates = {}
@@ -174,6 +291,7 @@ class CaptchaService:
                     for field, value in updates.items():
                         setattr(captcha_type, field, value)
                     captcha_type.save(update_fields=list(updates.keys()))
+        type_cache.invalidate()
     # endregion
 
     # region generator registration
@@ -191,10 +309,19 @@ class CaptchaService:
 
     # region generators
     def _generate_text(self, context: dict | None = None) -> Tuple[dict, dict, int]:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
+        try:
+            pool = get_text_image_pool()
+            if self._seeded:
+                # 预渲染池由后台线程以系统随机数填充，注入 rng 时改为即时渲染
+                code = pool.renderer.random_code(self.rng)
+                image = pool.renderer.render(code, self.rng)
+            else:
+                code, image = pool.pop()
+        except RuntimeError as exc:
+            raise CaptchaGenerationError(str(exc)) from exc
         payload = {
             'type': 'text',
-            'text': code,
+            'image': image,
             'hint': '请输入图中的字符',
         }
         answer = {'code': code.lower()}
@@ -202,8 +329,8 @@ class CaptchaService:
         return payload, answer, ttl
 
     def _generate_arithmetic(self, context: dict | None = None) -> Tuple[dict, dict, int]:
-        a, b = random.randint(1, 9), random.randint(1, 9)
-        operator = random.choice(['+', '-'])
+        a, b = self.rng.randint(1, 9), self.rng.randint(1, 9)
+        operator = self.rng.choice(['+', '-'])
         expression = f'{a} {operator} {b}'
         result = a + b if operator == '+' else a - b
         payload = {
@@ -216,37 +343,46 @@ class CaptchaService:
         return payload, answer, ttl
 
     def _generate_slider(self, context: dict | None = None) -> Tuple[dict, dict, int]:
-        offset = random.randint(20, 80)
+        try:
+            images, answer = get_slider_engine().generate(self.rng)
+        except RuntimeError as exc:
+            raise CaptchaGenerationError(str(exc)) from exc
         payload = {
             'type': 'slider',
-            'image': '/static/captcha/slider-bg.png',
-            'piece': '/static/captcha/slider-piece.png',
+            **images,
             'hint': '拖动滑块完成拼图',
         }
-        answer = {'offset': offset}
-        ttl = self._resolve_ttl((context or {}).get('config', {}), 240)
+        config = (context or {}).get('config', {})
+        if 'tolerance' in config:
+            answer['tolerance'] = config['tolerance']
+        ttl = self._resolve_ttl(config, 240)
         return payload, answer, ttl
 
     def _generate_grid(self, context: dict | None = None) -> Tuple[dict, dict, int]:
-        targets = sorted(random.sample(range(9), 3))
-        payload = {
-            'type': 'grid',
-            'question': '请选择所有的猫咪',
-            'gridSize': 9,
-            'images': [f'/static/captcha/grid/{i}.png' for i in range(9)],
-        }
-        answer = {'indexes': targets}
+        try:
+            grid, answer = get_grid_engine().generate(self.rng)
+        except RuntimeError as exc:
+            raise CaptchaGenerationError(str(exc)) from exc
+        payload = {'type': 'grid', **grid}
         ttl = self._resolve_ttl((context or {}).get('config', {}), 240)
         return payload, answer, ttl
 
     def _generate_behavior(self, context: dict | None = None) -> Tuple[dict, dict, int]:
-        required_steps = random.randint(3, 5)
+        config = (context or {}).get('config', {})
+        width, height, radius = 300, 150, 18
+        start = [self.rng.randint(20, 80), self.rng.randint(20, height - 20)]
+        target = [self.rng.randint(width - 80, width - 20), self.rng.randint(20, height - 20)]
         payload = {
             'type': 'behavior',
-            'requiredSteps': required_steps,
-            'hint': '按照提示轨迹拖动完成验证',
+            'width': width,
+            'height': height,
+            'start': start,
+            'target': target,
+            'radius': radius,
+            'hint': '按住圆点并拖动到目标区域',
         }
-        answer = {'completed': True, 'minSteps': required_steps}
+        thresholds = config.get('thresholds') if isinstance(config.get('thresholds'), dict) else {}
+        answer = {'target': target, 'radius': radius, 'thresholds': thresholds}
         ttl = self._resolve_ttl((context or {}).get('config', {}), 240)
         return payload, answer, ttl
 
@@ -261,12 +397,16 @@ class CaptchaService:
 
         code = self._random_digits(6)
         ttl = self._resolve_ttl(config, 300)
-        self._send_email_code(target_email, code, ttl, config)
+        self._email_sender()
+        delivery, _ = self._dispatch(
+            context, 'email', target_email, lambda: self._send_email_code(target_email, code, ttl, config)
+        )
 
         payload = {
             'type': 'email',
             'maskedEmail': mask_email(target_email),
             'hint': '验证码已发送至邮箱，请查收',
+            'delivery': delivery,
         }
         answer = {'code': code}
         return payload, answer, ttl
@@ -282,12 +422,16 @@ class CaptchaService:
 
         code = self._random_digits(6)
         ttl = self._resolve_ttl(config, 300)
-        self._send_sms_code(target_phone, code, ttl, config)
+        self._twilio_settings()
+        delivery, _ = self._dispatch(
+            context, 'sms', target_phone, lambda: self._send_sms_code(target_phone, code, ttl, config)
+        )
 
         payload = {
             'type': 'sms',
             'maskedPhone': mask_phone(target_phone),
             'hint': '验证码已发送至手机，请注意查收短信',
+            'delivery': delivery,
         }
         answer = {'code': code}
         return payload, answer, ttl
@@ -303,13 +447,17 @@ class CaptchaService:
 
         code = self._random_digits(6)
         ttl = self._resolve_ttl(config, 300)
-        call_sid = self._send_voice_code(target_phone, code, ttl, config)
+        self._twilio_settings()
+        delivery, call_sid = self._dispatch(
+            context, 'voice', target_phone, lambda: self._send_voice_code(target_phone, code, ttl, config)
+        )
 
         payload = {
             'type': 'voice',
             'maskedPhone': mask_phone(target_phone),
             'hint': '系统正在拨打语音电话，请注意接听并输入验证码',
-            'callSid': call_sid,
+            'callSid': call_sid or '',
+            'delivery': delivery,
         }
         answer = {'code': code}
         return payload, answer, ttl
@@ -334,10 +482,22 @@ class CaptchaService:
     def _default_verify(self, expected: dict, actual: dict) -> bool:
         return expected == actual
 
+    def _verify_code(self, type_name: str, expected: dict, actual: dict, *, fold_case: bool = False) -> bool:
+        """摘要答案只做一次 HMAC 与定长比较；升级前保存的明文答案同样用 compare_digest 比较。"""
+        supplied = str(actual.get('code', ''))
+        if fold_case:
+            supplied = supplied.lower()
+        if 'digest' in expected:
+            return digest_matches(type_name, str(expected['digest']), supplied)
+        stored = str(expected.get('code', ''))
+        if fold_case:
+            stored = stored.lower()
+        return bool(stored) and hmac.compare_digest(stored.encode('utf-8'), supplied.encode('utf-8'))
+
     def _verify_text(self, expected: dict, actual: dict) -> bool:
         if not actual:
             return False
-        return expected.get('code', '').lower() == str(actual.get('code', '')).lower()
+        return self._verify_code('text', expected, actual, fold_case=True)
 
     def _verify_arithmetic(self, expected: dict, actual: dict) -> bool:
         try:
@@ -347,7 +507,8 @@ class CaptchaService:
 
     def _verify_slider(self, expected: dict, actual: dict) -> bool:
         try:
-            return abs(float(actual.get('offset')) - float(expected.get('offset'))) <= 5
+            tolerance = float(expected.get('tolerance', SLIDER_TOLERANCE))
+            return abs(float(actual.get('offset')) - float(expected.get('offset'))) <= tolerance
         except (TypeError, ValueError):
             return False
 
@@ -357,26 +518,34 @@ class CaptchaService:
         return expected_indexes == actual_indexes
 
     def _verify_behavior(self, expected: dict, actual: dict) -> bool:
-        if not actual.get('completed'):
+        trajectory = actual.get('trajectory')
+        if not trajectory:
+            return False
+        end = behavior.endpoint(trajectory)
+        target = expected.get('target') or []
+        if end is None or len(target) != 2:
             return False
         try:
-            actual_steps = int(actual.get('steps', expected.get('minSteps', 0)))
+            tolerance = float(expected.get('radius', 0)) * 1.5
+            if math.hypot(end[0] - float(target[0]), end[1] - float(target[1])) > tolerance:
+                return False
         except (TypeError, ValueError):
-            actual_steps = 0
+            return False
         try:
-            required_steps = int(expected.get('minSteps', 0))
-        except (TypeError, ValueError):
-            required_steps = 0
-        return actual_steps >= required_steps
+            passed, _, _ = behavior.score_trajectory(trajectory, expected.get('thresholds'))
+        except (RuntimeError, ValueError, MemoryError, OverflowError):
+            logger.exception('行为轨迹评估失败')
+            return False
+        return passed
 
     def _verify_email(self, expected: dict, actual: dict) -> bool:
-        return expected.get('code') == actual.get('code')
+        return self._verify_code('email', expected, actual)
 
     def _verify_sms(self, expected: dict, actual: dict) -> bool:
-        return expected.get('code') == actual.get('code')
+        return self._verify_code('sms', expected, actual)
 
     def _verify_voice(self, expected: dict, actual: dict) -> bool:
-        return expected.get('code') == actual.get('code')
+        return self._verify_code('voice', expected, actual)
 
     def _verify_invisible(self, expected: dict, actual: dict) -> bool:
         honeypot_ok = actual.get('honeypot', '') == expected.get('honeypot', '')
@@ -392,6 +561,190 @@ class CaptchaService:
     # endregion
 
     # region helpers
+    def _diagnose(self, challenge: ChallengeRecord, client_ip: str, *, require_validated: bool) -> str | None:
+        if challenge.client_ip != client_ip:
+            return '请求IP与验证码不匹配'
+        if challenge.is_expired():
+            return '验证码已过期'
+        if require_validated and not challenge.validated:
+            return '请先完成验证码验证'
+        if not require_validated and challenge.validated:
+            return '验证码已验证，请重新获取'
+        return None
+
+    def _diagnose_failure(self, token: str, client_ip: str, *, require_validated: bool) -> tuple[bool, str, str | None]:
+        """条件更新未命中时读取一次挑战，返回具体的失败原因。"""
+        return self._explain_failure(self.store.get(token), client_ip, require_validated=require_validated)
+
+    def _explain_failure(
+        self, challenge: ChallengeRecord | None, client_ip: str, *, require_validated: bool
+    ) -> tuple[bool, str, str | None]:
+        if challenge is None:
+            return False, '验证码不存在或已过期', None
+        error = self._diagnose(challenge, client_ip, require_validated=require_validated)
+        return False, error or '验证码状态已变化，请重新获取', challenge.type
+
+    def _check_answer(
+        self, challenge: ChallengeRecord | None, user_answer: Any, client_ip: str
+    ) -> tuple[bool, str, str | None] | None:
+        """校验挑战状态与答案，通过时返回 None，否则返回失败结果。"""
+        if challenge is None:
+            return False, '验证码不存在或已过期', None
+
+        error = self._diagnose(challenge, client_ip, require_validated=False)
+        if error:
+            return False, error, challenge.type
+
+        if not self.verify_answer(challenge.type, challenge.answer, user_answer):
+            return False, '验证码答案错误', challenge.type
+        return None
+
+    def _prepare_generation(
+        self, requested_type: str | None, request_data: dict | None, client_ip: str | None = None
+    ) -> tuple[str, CaptchaGenerator, dict]:
+        type_name = self._select_type(requested_type, request_data or {}, client_ip)
+        captcha_type = self._get_enabled_type(type_name)
+        if captcha_type is None:
+            type_name = self.get_default_type()
+            captcha_type = self._get_enabled_type(type_name)
+        if captcha_type is None:
+            raise CaptchaGenerationError('没有可用的验证码类型，请联系管理员')
+
+        generator = self._registry[type_name]
+        config = dict(captcha_type.config)
+        context = {'request': request_data or {}, 'config': config, 'captcha_type': captcha_type}
+        return type_name, generator, context
+
+    def _prepare_and_limit(
+        self, requested_type: str | None, request_data: dict | None, client_ip: str
+    ) -> tuple[str, CaptchaGenerator, dict]:
+        type_name, generator, context = self._prepare_generation(requested_type, request_data, client_ip)
+        self._enforce_rate_limit(type_name, context, client_ip)
+        return type_name, generator, context
+
+    def _select_type(self, requested_type: str | None, request_data: dict, client_ip: str | None) -> str:
+        """启用风险升级时按近期失败情况挑选类型；客户端指定的类型不低于所需级别时才采用。"""
+        if not risk_enabled() or client_ip is None:
+            return requested_type or self.get_default_type()
+        levels = [level for level in escalation_levels() if self._can_serve(level['type'], request_data)]
+        if not levels:
+            return requested_type or self.get_default_type()
+
+        score = get_risk_tracker().score(ip=client_ip, username=request_data.get('username'))
+        required = 0
+        for index, level in enumerate(levels):
+            if score >= float(level['score']):
+                required = index
+        ranks = {level['type']: index for index, level in enumerate(levels)}
+        if requested_type and (required == 0 or ranks.get(requested_type, -1) >= required):
+            return requested_type
+        return levels[required]['type']
+
+    def _can_serve(self, type_name: str, request_data: dict) -> bool:
+        captcha_type = self._get_enabled_type(type_name)
+        if captcha_type is None or type_name not in self._registry:
+            return False
+        if type_name in ('sms', 'voice'):
+            return bool(self._resolve_phone_target(request_data, captcha_type.config))
+        if type_name == 'email':
+            return bool(self._rate_limit_target(type_name, request_data) or captcha_type.config.get('target_email'))
+        return self._engine_ready(type_name)
+
+    def _engine_ready(self, type_name: str) -> bool:
+        """探测图片类验证码的引擎能否初始化；成功结果一直有效，失败结果 ENGINE_RETRY_SECONDS 秒后重新探测。"""
+        if type_name == 'behavior':
+            return behavior.np is not None
+        probe = ENGINE_PROBES.get(type_name)
+        if probe is None:
+            return True
+        now = time.monotonic()
+        with self._engine_lock:
+            status = self._engine_status.get(type_name)
+            if status is not None and (status[0] or now - status[1] < ENGINE_RETRY_SECONDS):
+                return status[0]
+        try:
+            probe()
+            ready = True
+        except (RuntimeError, OSError) as exc:
+            logger.warning('%s 验证码引擎不可用，风险升级时跳过：%s', type_name, exc)
+            ready = False
+        with self._engine_lock:
+            self._engine_status[type_name] = (ready, now)
+        return ready
+
+    def _track_outcome(
+        self, client_ip: str, result: tuple[bool, str, str | None], *, stage: str, started: float
+    ) -> tuple[bool, str, str | None]:
+        """记录校验指标并计入风险计数；登录核销成功不重复计入，答案通过时已记过一次。"""
+        type_label = result[2] or 'unknown'
+        VERIFY_SECONDS.observe(time.perf_counter() - started, type_label, stage)
+        VERIFY_TOTAL.inc(type_label, stage, 'pass' if result[0] else 'fail')
+        if risk_enabled() and (stage == 'verify' or not result[0]):
+            get_risk_tracker().record(ip=client_ip, success=result[0])
+        return result
+
+    def _run_generator(
+        self, type_name: str, generator: CaptchaGenerator, context: dict
+    ) -> Tuple[dict, dict, int]:
+        started = time.perf_counter()
+        try:
+            result = generator.generator(context)
+        except Exception:
+            GENERATE_TOTAL.inc(type_name, 'error')
+            raise
+        GENERATE_SECONDS.observe(time.perf_counter() - started, type_name)
+        GENERATE_TOTAL.inc(type_name, 'ok')
+        return result
+
+    def _build_record(
+        self,
+        type_name: str,
+        generator: CaptchaGenerator,
+        context: dict,
+        payload: dict,
+        answer: dict,
+        ttl: int,
+        client_ip: str,
+        user_agent: str,
+    ) -> ChallengeRecord:
+        ttl = self._resolve_ttl(context['config'], ttl or generator.default_ttl)
+        return ChallengeRecord.build(
+            type_name,
+            encode_payload(payload),
+            encode_answer(type_name, answer),
+            client_ip=client_ip,
+            user_agent=user_agent,
+            ttl_seconds=ttl,
+        )
+
+    def _reserve_batch_quota(self, client_ip: str, count: int, options: dict) -> Callable[[], None]:
+        """按 IP 在滑动窗口内累计批量签发的数量，超过 IP_LIMIT 时拒绝；返回归还本次额度的函数。"""
+        rule = RateLimitRule('batch', int(options.get('IP_LIMIT', 200)), float(options.get('IP_WINDOW', 60)))
+        limiter = get_rate_limiter()
+        key = f'batch:{client_ip}'
+        decision = limiter.hit(key, rule, count)
+        if not decision.allowed:
+            raise RateLimitExceeded('批量获取验证码过于频繁，请稍后再试', decision.retry_after)
+        return lambda: limiter.refund(key, rule, count, decision)
+
+    def _enforce_rate_limit(self, type_name: str, context: dict, client_ip: str) -> None:
+        """在查库与发送之前按 IP / 目标限流，只使用请求参数与缓存的类型配置。"""
+        identities = {'ip': client_ip.strip(), 'target': self._rate_limit_target(type_name, context['request'])}
+        decision = get_rate_limiter().check(type_name, context['config'], identities)
+        if not decision.allowed:
+            GENERATE_TOTAL.inc(type_name, 'rate_limited')
+            raise RateLimitExceeded('请求验证码过于频繁，请稍后再试', decision.retry_after)
+
+    def _submit_deliveries(self, context: dict, challenge: ChallengeRecord) -> None:
+        deliveries = context.get('deliveries') or []
+        if not deliveries:
+            return
+        delivery_queue = get_delivery_queue()
+        for job in deliveries:
+            job.token = challenge.token
+            job.ttl = challenge.ttl_seconds()
+            delivery_queue.submit(job)
+
     def _normalize_answer(self, answer: Any) -> dict:
         if answer is None:
             return {}
@@ -411,21 +764,15 @@ class CaptchaService:
                 return {'code': answer}
         return {'value': answer}
 
-    def _get_enabled_type(self, type_name: str) -> CaptchaType | None:
-        try:
-            return CaptchaType.objects.get(type_name=type_name, enabled=True)
-        except CaptchaType.DoesNotExist:
+    def _get_enabled_type(self, type_name: str) -> CachedCaptchaType | None:
+        if type_name not in self._registry:
             return None
+        return type_cache.get_enabled(type_name)
 
     def _load_config(self, captcha_type: CaptchaType | None) -> dict:
-        if not captcha_type or not captcha_type.config_json:
-            return {}
-        try:
-            config = json.loads(captcha_type.config_json)
-            return config if isinstance(config, dict) else {}
-        except json.JSONDecodeError:
-            logger.warning('验证码类型 %s 的配置不是有效的 JSON', captcha_type.type_name)
+        if not captcha_type:
             return {}
+        return parse_config(captcha_type.type_name, captcha_type.config_json)
 
     def _resolve_ttl(self, config: dict, default: int) -> int:
         ttl_value = config.get('ttl') if isinstance(config, dict) else None
@@ -438,7 +785,7 @@ class CaptchaService:
             return default
 
     def _random_digits(self, length: int) -> str:
-        return ''.join(random.choices(string.digits, k=length))
+        return ''.join(self.rng.choices(string.digits, k=length))
 
     def _resolve_email_target(self, request_data: dict, config: dict) -> str | None:
         email = (
@@ -457,6 +804,20 @@ class CaptchaService:
                 logger.exception('根据用户名 %s 查询邮箱失败', username)
         return email
 
+    def _rate_limit_target(self, type_name: str, request_data: dict) -> str | None:
+        """取请求中声明的接收方作为限流维度；按用户名发邮件时不查库，直接以用户名计数。"""
+        if type_name == 'email':
+            email = request_data.get('email') or request_data.get('target_email')
+            if email:
+                return str(email).strip().lower()
+            username = request_data.get('username')
+            return f'user:{username}' if username else None
+        if type_name in ('sms', 'voice'):
+            phone = request_data.get('phone') or request_data.get('mobile') or request_data.get('target_phone')
+            digits = ''.join(ch for ch in str(phone or '') if ch.isdigit())
+            return digits or None
+        return None
+
     def _resolve_phone_target(self, request_data: dict, config: dict) -> str | None:
         phone = (
             request_data.get('phone')
@@ -471,29 +832,90 @@ class CaptchaService:
             phone = test_number or None
         return phone
 
-    def _send_email_code(self, email: str, code: str, ttl: int, config: dict) -> None:
+    def _dispatch(self, context: dict, channel: str, target: str, send: Callable[[], Any]) -> tuple[str, Any]:
+        """发送验证码：启用异步投递时登记到 context，待挑战保存后入队；否则同步发送。"""
+        send = self._timed_send(channel, send)
+        if async_delivery_enabled():
+            context.setdefault('deliveries', []).append(DeliveryJob(token='', channel=channel, target=target, send=send))
+            return 'queued', None
+        result = send()
+        if isinstance(result, Future):
+            result = result.result()
+        return 'sent', result
+
+    def _timed_send(self, channel: str, send: Callable[[], Any]) -> Callable[[], Any]:
+        """统计每次发送（含重试）的耗时；返回 Future 的发送在 Future 完成时才计时结束。"""
+
+        def timed() -> Any:
+            started = time.perf_counter()
+
+            def observe(outcome: str) -> None:
+                DELIVERY_SECONDS.observe(time.perf_counter() - started, channel, outcome)
+
+            try:
+                result = send()
+            except Exception:
+                observe('error')
+                raise
+            if isinstance(result, Future):
+                result.add_done_callback(lambda done: observe('error' if done.exception() else 'ok'))
+            else:
+                observe('ok')
+            return result
+
+        return timed
+
+    def _email_sender(self) -> str:
         from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', '') or getattr(settings, 'EMAIL_HOST_USER', '')
         if not from_email or not getattr(settings, 'EMAIL_HOST', ''):
             raise CaptchaGenerationError('邮件服务未正确配置，请联系管理员')
+        return from_email
 
+    def _send_email_code(self, email: str, code: str, ttl: int, config: dict) -> Future | None:
+        from_email = self._email_sender()
         subject = config.get('subject', '验证码验证')
         template = config.get('template', '您的验证码是 {code}，请在 {ttl} 秒内完成验证。')
-        message = template.format(code=code, ttl=ttl)
+        email_message = EmailMessage(subject, template.format(code=code, ttl=ttl), from_email, [email])
+
+        batcher = get_email_batcher()
+        if batcher is not None:
+            return self._wrap_email_future(batcher.submit(email_message))
         try:
-            send_mail(subject, message, from_email, [email])
+            connections.get_connection_manager().send_email(email_message)
         except Exception as exc:  # pragma: no cover - 网络依赖
             logger.exception('发送邮件验证码失败: %s', exc)
             raise CaptchaGenerationError('邮件发送失败，请稍后重试') from exc
-
-    def _get_twilio_client(self) -> tuple[Client, str]:
-        if Client is None:
+        return None
+
+    def _wrap_email_future(self, future: Future) -> Future:
+        wrapped: Future = Future()
+
+        def relay(done: Future) -> None:
+            exc = done.exception()
+            if exc is None:
+                wrapped.set_result(None)
+                return
+            logger.error('发送邮件验证码失败: %s', exc)
+            error = CaptchaGenerationError('邮件发送失败，请稍后重试')
+            error.__cause__ = exc
+            wrapped.set_exception(error)
+
+        future.add_done_callback(relay)
+        return wrapped
+
+    def _twilio_settings(self) -> tuple[str, str, str]:
+        if Client is None and not getattr(settings, 'TWILIO_CLIENT_CLASS', ''):
             raise CaptchaGenerationError('未安装 Twilio SDK，无法发送短信或语音验证码')
         account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', '')
         auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', '')
         from_number = getattr(settings, 'TWILIO_PHONE_NUMBER', '')
         if not account_sid or not auth_token or not from_number:
             raise CaptchaGenerationError('Twilio 配置不完整，请联系管理员')
-        return Client(account_sid, auth_token), from_number
+        return account_sid, auth_token, from_number
+
+    def _get_twilio_client(self) -> tuple[Client, str]:
+        account_sid, auth_token, from_number = self._twilio_settings()
+        return connections.get_connection_manager().twilio_client(account_sid, auth_token), from_number
 
     def _send_sms_code(self, phone: str, code: str, ttl: int, config: dict) -> None:
         client, from_number = self._get_twilio_client()
@@ -520,4 +942,38 @@ class CaptchaService:
     # endregion
 
 
-__all__ = ['CaptchaService', 'CaptchaGenerationError']
+_service_lock = threading.Lock()
+_service: CaptchaService | None = None
+
+
+def get_captcha_service() -> CaptchaService:
+    """返回进程内共享的 CaptchaService，首次调用时完成验证码类型初始化。"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = CaptchaService()
+    return _service
+
+
+async def aget_captcha_service() -> CaptchaService:
+    """异步视图使用：实例尚未创建时在线程中初始化，避免在事件循环里查库。"""
+    if _service is not None:
+        return _service
+    return await sync_to_async(get_captcha_service)()
+
+
+def reset_captcha_service(service: CaptchaService | None = None) -> None:
+    """丢弃共享实例，下次调用 get_captcha_service 时重新初始化；传入 service 时改用该实例（压测注入带种子的服务）。"""
+    global _service
+    with _service_lock:
+        _service = service
+
+
+__all__ = [
+    'CaptchaService',
+    'CaptchaGenerationError',
+    'aget_captcha_service',
+    'get_captcha_service',
+    'reset_captcha_service',
+]
@@ -0,0 +1,479 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import CaptchaChallenge
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency guard
+    redis = None  # type: ignore[assignment]
+
+
+@dataclass
+class ChallengeRecord:
+    type: str
+    payload: str
+    answer: str
+    client_ip: str
+    user_agent: str = ''
+    expires_at: datetime = field(default_factory=datetime.now)
+    token: str = ''
+    created_at: datetime = field(default_factory=datetime.now)
+    validated: bool = False
+
+    @classmethod
+    def build(cls, type_name: str, payload: str, answer: str, client_ip: str, user_agent: str, ttl_seconds: int):
+        now = datetime.now()
+        return cls(
+            type=type_name,
+            payload=payload,
+            answer=answer,
+            client_ip=client_ip,
+            user_agent=user_agent[:255],
+            expires_at=now + timedelta(seconds=ttl_seconds),
+            token=str(uuid4()),
+            created_at=now,
+        )
+
+    def is_expired(self) -> bool:
+        return datetime.now() > self.expires_at
+
+    def ttl_seconds(self) -> int:
+        return max(int((self.expires_at - datetime.now()).total_seconds()) + 1, 1)
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data['expires_at'] = self.expires_at.isoformat()
+        data['created_at'] = self.created_at.isoformat()
+        return json.dumps(data, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> 'ChallengeRecord':
+        data = json.loads(raw)
+        data['expires_at'] = datetime.fromisoformat(data['expires_at'])
+        data['created_at'] = datetime.fromisoformat(data['created_at'])
+        return cls(**data)
+
+
+class ChallengeStore:
+    """验证码挑战的持久化接口。
+
+    mark_validated / consume_validated 必须是原子的条件操作：仅当挑战存在、未过期、
+    IP 一致且验证状态符合要求时才生效，并发调用中只有一个能成功。
+    """
+
+    def create(self, record: ChallengeRecord) -> ChallengeRecord:
+        raise NotImplementedError
+
+    def create_many(self, records: list[ChallengeRecord]) -> list[ChallengeRecord]:
+        return [self.create(record) for record in records]
+
+    def get(self, token: str) -> ChallengeRecord | None:
+        raise NotImplementedError
+
+    def mark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        """将未验证的挑战标记为已验证，返回是否生效。
+
+        record 是调用方刚用 get 读到的挑战，需要先读取才能判断的实现可以据此省去一次读取；
+        是否生效仍由存储自身的原子操作决定。
+        """
+        raise NotImplementedError
+
+    def consume_validated(self, token: str, client_ip: str) -> str | None:
+        """删除已验证的挑战并返回其类型；条件不满足时返回 None。"""
+        raise NotImplementedError
+
+    # 异步接口默认在线程中调用同步实现，子类可覆盖为原生异步实现
+    async def acreate(self, record: ChallengeRecord) -> ChallengeRecord:
+        return await sync_to_async(self.create)(record)
+
+    async def aget(self, token: str) -> ChallengeRecord | None:
+        return await sync_to_async(self.get)(token)
+
+    async def amark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        return await sync_to_async(self.mark_validated)(token, client_ip, record)
+
+    async def aconsume_validated(self, token: str, client_ip: str) -> str | None:
+        return await sync_to_async(self.consume_validated)(token, client_ip)
+
+    def delete(self, token: str) -> None:
+        raise NotImplementedError
+
+
+class DatabaseChallengeStore(ChallengeStore):
+    """基于 CaptchaChallenge 表的存储（默认）。"""
+
+    def create(self, record: ChallengeRecord) -> ChallengeRecord:
+        challenge = CaptchaChallenge.objects.create(
+            type=record.type,
+            token=record.token,
+            payload=record.payload,
+            answer=record.answer,
+            client_ip=record.client_ip,
+            user_agent=record.user_agent,
+            expires_at=record.expires_at,
+        )
+        record.created_at = challenge.created_at
+        return record
+
+    def create_many(self, records: list[ChallengeRecord]) -> list[ChallengeRecord]:
+        with transaction.atomic():
+            CaptchaChallenge.objects.bulk_create(
+                [
+                    CaptchaChallenge(
+                        type=record.type,
+                        token=record.token,
+                        payload=record.payload,
+                        answer=record.answer,
+                        client_ip=record.client_ip,
+                        user_agent=record.user_agent,
+                        expires_at=record.expires_at,
+                    )
+                    for record in records
+                ],
+                batch_size=500,
+            )
+        return records
+
+    async def acreate(self, record: ChallengeRecord) -> ChallengeRecord:
+        challenge = await CaptchaChallenge.objects.acreate(
+            type=record.type,
+            token=record.token,
+            payload=record.payload,
+            answer=record.answer,
+            client_ip=record.client_ip,
+            user_agent=record.user_agent,
+            expires_at=record.expires_at,
+        )
+        record.created_at = challenge.created_at
+        return record
+
+    def get(self, token: str) -> ChallengeRecord | None:
+        challenge = CaptchaChallenge.objects.filter(token=token).first()
+        if challenge is None:
+            return None
+        return self._to_record(challenge)
+
+    async def aget(self, token: str) -> ChallengeRecord | None:
+        challenge = await CaptchaChallenge.objects.filter(token=token).afirst()
+        if challenge is None:
+            return None
+        return self._to_record(challenge)
+
+    async def amark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        updated = await CaptchaChallenge.objects.filter(
+            token=token,
+            client_ip=client_ip,
+            validated=False,
+            expires_at__gt=datetime.now(),
+        ).aupdate(validated=True)
+        return updated == 1
+
+    def mark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        updated = CaptchaChallenge.objects.filter(
+            token=token,
+            client_ip=client_ip,
+            validated=False,
+            expires_at__gt=datetime.now(),
+        ).update(validated=True)
+        return updated == 1
+
+    def consume_validated(self, token: str, client_ip: str) -> str | None:
+        sql = self._delete_returning_sql()
+        params = [token, client_ip, True, connection.ops.adapt_datetimefield_value(datetime.now())]
+        if sql is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        captcha_type = CaptchaChallenge.objects.filter(token=token).values_list('type', flat=True).first()
+        deleted, _ = CaptchaChallenge.objects.filter(
+            token=token,
+            client_ip=client_ip,
+            validated=True,
+            expires_at__gt=datetime.now(),
+        ).delete()
+        return captcha_type if deleted else None
+
+    def delete(self, token: str) -> None:
+        CaptchaChallenge.objects.filter(token=token).delete()
+
+    def _delete_returning_sql(self) -> str | None:
+        quote = connection.ops.quote_name
+        table = quote(CaptchaChallenge._meta.db_table)
+        where = (
+            f"WHERE {quote('token')} = %s AND {quote('client_ip')} = %s "
+            f"AND {quote('validated')} = %s AND {quote('expires_at')} > %s"
+        )
+        if connection.vendor == 'microsoft':
+            return f"DELETE FROM {table} OUTPUT DELETED.{quote('type')} {where}"
+        if connection.vendor in ('postgresql', 'sqlite'):
+            return f"DELETE FROM {table} {where} RETURNING {quote('type')}"
+        return None
+
+    def _to_record(self, challenge: CaptchaChallenge) -> ChallengeRecord:
+        return ChallengeRecord(
+            type=challenge.type,
+            payload=challenge.payload,
+            answer=challenge.answer,
+            client_ip=challenge.client_ip,
+            user_agent=challenge.user_agent,
+            expires_at=challenge.expires_at,
+            token=str(challenge.token),
+            created_at=challenge.created_at,
+            validated=challenge.validated,
+        )
+
+
+class InMemoryKeyValueClient:
+    """实现 Redis set/get/incrby/expire/delete 子集的进程内假客户端，供测试与本地开发使用。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._data: dict[str, tuple[Any, float | None]] = {}
+
+    def set(
+        self,
+        name: str,
+        value: Any,
+        ex: int | None = None,
+        keepttl: bool = False,
+        nx: bool = False,
+        xx: bool = False,
+    ):
+        with self._lock:
+            current = self._live(name)
+            if (xx and current is None) or (nx and current is not None):
+                return None
+            if keepttl and current is not None:
+                deadline = current[1]
+            else:
+                deadline = time.monotonic() + ex if ex else None
+            self._data[name] = (value, deadline)
+            return True
+
+    def get(self, name: str) -> Any:
+        with self._lock:
+            entry = self._live(name)
+            return entry[0] if entry else None
+
+    def mget(self, *names: str) -> list:
+        with self._lock:
+            entries = [self._live(name) for name in names]
+            return [entry[0] if entry else None for entry in entries]
+
+    def incrby(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            entry = self._live(name)
+            value = int(entry[0]) + amount if entry else amount
+            self._data[name] = (value, entry[1] if entry else None)
+            return value
+
+    def expire(self, name: str, time_seconds: int) -> bool:
+        with self._lock:
+            entry = self._live(name)
+            if entry is None:
+                return False
+            self._data[name] = (entry[0], time.monotonic() + time_seconds)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def _live(self, name: str):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return entry
+
+
+class KeyValueChallengeStore(ChallengeStore):
+    """基于 Redis 兼容键值库的存储，依赖原生 TTL 自动过期。
+
+    验证状态保存在独立的 ``<token>:ok`` 键中：``SET NX`` 保证只有一个请求能完成验证，
+    ``DEL`` 的返回值保证只有一个请求能消费已验证的挑战。
+    """
+
+    def __init__(self, client=None, url: str = '', prefix: str = 'captcha:challenge:') -> None:
+        if client is None:
+            if redis is None:
+                raise RuntimeError('未安装 redis，无法使用 KeyValueChallengeStore')
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.client = client
+        self.prefix = prefix
+
+    def create(self, record: ChallengeRecord) -> ChallengeRecord:
+        self.client.set(self._key(record.token), record.to_json(), ex=record.ttl_seconds())
+        return record
+
+    def get(self, token: str) -> ChallengeRecord | None:
+        raw, validated = self.client.mget(self._key(token), self._validated_key(token))
+        if raw is None:
+            return None
+        record = ChallengeRecord.from_json(raw)
+        record.validated = validated is not None
+        return record
+
+    def mark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        # 校验接口已读过挑战（需要比对答案），这里只剩一次 SET NX
+        if record is None:
+            record = self.get(token)
+        if record is None or record.validated or record.is_expired() or record.client_ip != client_ip:
+            return False
+        return bool(self.client.set(self._validated_key(token), 1, ex=record.ttl_seconds(), nx=True))
+
+    def consume_validated(self, token: str, client_ip: str) -> str | None:
+        record = self.get(token)
+        if record is None or not record.validated or record.is_expired() or record.client_ip != client_ip:
+            return None
+        if not self.client.delete(self._validated_key(token)):
+            return None
+        self.client.delete(self._key(token))
+        return record.type
+
+    def delete(self, token: str) -> None:
+        self.client.delete(self._key(token), self._validated_key(token))
+
+    # 键值库访问不涉及 Django 数据库连接，放到普通线程池中并发执行，不占用 thread-sensitive 线程
+    async def acreate(self, record: ChallengeRecord) -> ChallengeRecord:
+        return await sync_to_async(self.create, thread_sensitive=False)(record)
+
+    async def aget(self, token: str) -> ChallengeRecord | None:
+        return await sync_to_async(self.get, thread_sensitive=False)(token)
+
+    async def amark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        return await sync_to_async(self.mark_validated, thread_sensitive=False)(token, client_ip, record)
+
+    async def aconsume_validated(self, token: str, client_ip: str) -> str | None:
+        return await sync_to_async(self.consume_validated, thread_sensitive=False)(token, client_ip)
+
+    def _key(self, token: str) -> str:
+        return f'{self.prefix}{token}'
+
+    def _validated_key(self, token: str) -> str:
+        return f'{self.prefix}{token}:ok'
+
+
+class LocMemChallengeStore(ChallengeStore):
+    """单节点部署使用的进程内 LRU 存储，超过 max_entries 时淘汰最久未使用的挑战。"""
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._records: OrderedDict[str, ChallengeRecord] = OrderedDict()
+
+    def create(self, record: ChallengeRecord) -> ChallengeRecord:
+        return self.create_many([record])[0]
+
+    def create_many(self, records: list[ChallengeRecord]) -> list[ChallengeRecord]:
+        with self._lock:
+            for record in records:
+                self._records[record.token] = record
+                self._records.move_to_end(record.token)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        return records
+
+    def get(self, token: str) -> ChallengeRecord | None:
+        with self._lock:
+            record = self._records.get(token)
+            if record is None:
+                return None
+            if record.is_expired():
+                del self._records[token]
+                return None
+            self._records.move_to_end(token)
+            return ChallengeRecord(**asdict(record))
+
+    def mark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        with self._lock:
+            record = self._records.get(token)
+            if record is None or record.validated or record.is_expired() or record.client_ip != client_ip:
+                return False
+            record.validated = True
+            return True
+
+    def consume_validated(self, token: str, client_ip: str) -> str | None:
+        with self._lock:
+            record = self._records.get(token)
+            if record is None or not record.validated or record.is_expired() or record.client_ip != client_ip:
+                return None
+            del self._records[token]
+            return record.type
+
+    def delete(self, token: str) -> None:
+        with self._lock:
+            self._records.pop(token, None)
+
+    async def acreate(self, record: ChallengeRecord) -> ChallengeRecord:
+        return self.create(record)
+
+    async def aget(self, token: str) -> ChallengeRecord | None:
+        return self.get(token)
+
+    async def amark_validated(self, token: str, client_ip: str, record: ChallengeRecord | None = None) -> bool:
+        return self.mark_validated(token, client_ip, record)
+
+    async def aconsume_validated(self, token: str, client_ip: str) -> str | None:
+        return self.consume_validated(token, client_ip)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+_store_lock = threading.Lock()
+_store: ChallengeStore | None = None
+
+
+def build_challenge_store(config: dict | None = None) -> ChallengeStore:
+    config = config or getattr(settings, 'CAPTCHA_CHALLENGE_STORE', {}) or {}
+    backend = config.get('BACKEND', 'captcha.stores.DatabaseChallengeStore')
+    options = dict(config.get('OPTIONS', {}))
+    client = options.get('client')
+    if isinstance(client, str):
+        options['client'] = import_string(client)()
+    return import_string(backend)(**options)
+
+
+def get_challenge_store() -> ChallengeStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = build_challenge_store()
+    return _store
+
+
+def reset_challenge_store() -> None:
+    global _store
+    with _store_lock:
+        _store = None
+
+
+__all__ = [
+    'ChallengeRecord',
+    'ChallengeStore',
+    'DatabaseChallengeStore',
+    'InMemoryKeyValueClient',
+    'KeyValueChallengeStore',
+    'LocMemChallengeStore',
+    'build_challenge_store',
+    'get_challenge_store',
+    'reset_challenge_store',
+]
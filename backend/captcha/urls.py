@@ -1,10 +1,13 @@
 from django.urls import path
 
-from .views import request_captcha, verify_captcha
+from .views import delivery_status, grid_image, request_captcha, request_captcha_batch, verify_captcha
 from .views_admin import AdminCaptchaTypeView
 
 urlpatterns = [
     path('captcha/request', request_captcha, name='captcha_request'),
+    path('captcha/batch', request_captcha_batch, name='captcha_batch'),
     path('captcha/verify', verify_captcha, name='captcha_verify'),
+    path('captcha/delivery', delivery_status, name='captcha_delivery'),
+    path('captcha/grid/<str:digest>', grid_image, name='captcha_grid_image'),
     path('admin/captcha_types', AdminCaptchaTypeView.as_view(), name='admin_captcha_types'),
 ]
@@ -1,16 +1,46 @@
+import hmac
 import json
 import logging
+import mimetypes
 
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.conf import settings
+from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 
-from .services import CaptchaGenerationError, CaptchaService
+from .clientip import get_client_ip
+from .delivery import get_delivery_status
+from .engines.grid import get_grid_engine
+from .metrics import REGISTRY, metrics_enabled
+from .services import CaptchaGenerationError, RateLimitExceeded, get_captcha_service
 
 
 def build_response(success: bool, message: str, data=None) -> JsonResponse:
     return JsonResponse({'success': success, 'message': message, 'data': data or {}})
 
 
+def build_raw_response(success: bool, message: str, raw_data: str) -> HttpResponse:
+    """与 build_response 结构相同，data 直接使用已编码好的 JSON 片段。"""
+    body = f'{{"success":{"true" if success else "false"},"message":{json.dumps(message)},"data":{raw_data}}}'
+    return HttpResponse(body.encode('utf-8'), content_type='application/json')
+
+
+def challenge_json(challenge) -> str:
+    """把挑战拼成响应中的 JSON 对象；载荷是生成时编码好的字符串，不再解析后重新编码。"""
+    expires_at = challenge.expires_at.strftime('%Y-%m-%d %H:%M:%S')
+    return (
+        f'{{"token":{json.dumps(challenge.token)},"type":{json.dumps(challenge.type)},'
+        f'"payload":{challenge.payload},"expires_at":"{expires_at}"}}'
+    )
+
+
+def rate_limited_response(exc: RateLimitExceeded) -> JsonResponse:
+    response = build_response(False, str(exc), {'retryAfter': exc.retry_after})
+    response.status_code = 429
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
 def parse_body(request) -> dict:
     if not request.body:
         return {}
@@ -20,13 +50,6 @@ def parse_body(request) -> dict:
         return {}
 
 
-def get_client_ip(request) -> str:
-    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
-    if forwarded:
-        return forwarded.split(',')[0]
-    return request.META.get('REMOTE_ADDR', '0.0.0.0')
-
-
 logger = logging.getLogger(__name__)
 
 
@@ -39,7 +62,7 @@ def request_captcha(request):
     client_ip = get_client_ip(request)
     user_agent = request.META.get('HTTP_USER_AGENT', '')
 
-    service = CaptchaService()
+    service = get_captcha_service()
     try:
         challenge = service.generate_challenge(
             client_ip=client_ip,
@@ -47,19 +70,46 @@ def request_captcha(request):
             requested_type=requested_type,
             request_data=data,
         )
+    except RateLimitExceeded as exc:
+        return rate_limited_response(exc)
     except CaptchaGenerationError as exc:
         return build_response(False, str(exc))
     except Exception as exc:  # pragma: no cover - defensive logging
         logger.exception('生成验证码失败: %s', exc)
         return build_response(False, '验证码生成失败，请稍后再试')
 
-    payload = {
-        'token': challenge.token,
-        'type': challenge.type,
-        'payload': json.loads(challenge.payload),
-        'expires_at': challenge.expires_at.strftime('%Y-%m-%d %H:%M:%S'),
-    }
-    return build_response(True, '验证码生成成功', payload)
+    return build_raw_response(True, '验证码生成成功', challenge_json(challenge))
+
+
+@csrf_exempt
+def request_captcha_batch(request):
+    if request.method != 'POST':
+        return build_response(False, '仅支持POST请求')
+    data = parse_body(request)
+    try:
+        count = int(data.get('count', 1))
+    except (TypeError, ValueError):
+        return build_response(False, 'count 必须是整数')
+
+    service = get_captcha_service()
+    try:
+        challenges = service.generate_challenges(
+            count,
+            client_ip=get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            requested_type=data.get('type'),
+            request_data=data,
+        )
+    except RateLimitExceeded as exc:
+        return rate_limited_response(exc)
+    except CaptchaGenerationError as exc:
+        return build_response(False, str(exc))
+    except Exception as exc:  # pragma: no cover - defensive logging
+        logger.exception('批量生成验证码失败: %s', exc)
+        return build_response(False, '验证码生成失败，请稍后再试')
+
+    items = ','.join(challenge_json(challenge) for challenge in challenges)
+    return build_raw_response(True, '验证码生成成功', f'{{"challenges":[{items}]}}')
 
 
 @csrf_exempt
@@ -75,6 +125,50 @@ def verify_captcha(request):
     if not token:
         return build_response(False, '缺少验证码token')
 
-    service = CaptchaService()
+    service = get_captcha_service()
     ok, message, captcha_type = service.validate_and_consume(token=token, user_answer=user_answer, client_ip=client_ip)
     return build_response(ok, message, {'type': captcha_type})
+
+
+@require_GET
+def delivery_status(request):
+    token = request.GET.get('token')
+    if not token:
+        return build_response(False, '缺少验证码token')
+    status = get_delivery_status(token)
+    if status is None:
+        return build_response(False, '投递记录不存在或已过期')
+    return build_response(True, 'ok', status)
+
+
+@require_GET
+def grid_image(request, digest: str):
+    """按内容摘要返回九宫格图片；摘要随内容变化，可被浏览器与 CDN 永久缓存。"""
+    try:
+        index = get_grid_engine().index
+    except RuntimeError:
+        raise Http404('九宫格图片库未配置')
+    image_id = index.find(digest)
+    if image_id is None:
+        raise Http404('图片不存在')
+    etag = f'"{digest}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        return HttpResponseNotModified()
+    path = index.path(image_id)
+    response = FileResponse(open(path, 'rb'), content_type=mimetypes.guess_type(path.name)[0] or 'image/png')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['ETag'] = etag
+    return response
+
+
+@require_GET
+def metrics(request):
+    """Prometheus 文本格式的进程内指标；配置了 CAPTCHA_METRICS_TOKEN 时需携带 Bearer 令牌。"""
+    if not metrics_enabled():
+        raise Http404('指标未启用')
+    token = (getattr(settings, 'CAPTCHA_METRICS', {}) or {}).get('TOKEN', '')
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+            return HttpResponse('unauthorized\n', status=401, content_type='text/plain; charset=utf-8')
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,4 +1,5 @@
 import json
+from datetime import datetime
 
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import JsonResponse
@@ -6,6 +7,7 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
+from .cache import invalidate_type_cache
 from .models import CaptchaType
 
 
@@ -57,7 +59,10 @@ class AdminCaptchaTypeView(View):
         )
 
         if captcha_type.is_default:
-            CaptchaType.objects.exclude(id=captcha_type.id).update(is_default=False)
+            CaptchaType.objects.exclude(id=captcha_type.id).filter(is_default=True).update(
+                is_default=False, updated_at=datetime.now()
+            )
+        invalidate_type_cache()
 
         return _resp(True, '保存成功', {'type_name': type_name})
 
@@ -67,7 +72,10 @@ class AdminCaptchaTypeView(View):
         if not type_name:
             return _resp(False, '缺少 type_name')
 
-        updated = CaptchaType.objects.filter(type_name=type_name).update(enabled=False, is_default=False)
+        updated = CaptchaType.objects.filter(type_name=type_name).update(
+            enabled=False, is_default=False, updated_at=datetime.now()
+        )
         if not updated:
             return _resp(False, '验证码类型不存在')
+        invalidate_type_cache()
         return _resp(True, f'{type_name} 已禁用')
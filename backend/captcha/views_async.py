@@ -0,0 +1,63 @@
+import logging
+
+from django.views.decorators.csrf import csrf_exempt
+
+from .services import CaptchaGenerationError, RateLimitExceeded, aget_captcha_service
+from .views import (
+    build_raw_response,
+    build_response,
+    challenge_json,
+    get_client_ip,
+    parse_body,
+    rate_limited_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@csrf_exempt
+async def request_captcha(request):
+    if request.method != 'POST':
+        return build_response(False, '仅支持POST请求')
+    data = parse_body(request)
+    requested_type = data.get('type')
+    client_ip = get_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+    service = await aget_captcha_service()
+    try:
+        challenge = await service.agenerate_challenge(
+            client_ip=client_ip,
+            user_agent=user_agent,
+            requested_type=requested_type,
+            request_data=data,
+        )
+    except RateLimitExceeded as exc:
+        return rate_limited_response(exc)
+    except CaptchaGenerationError as exc:
+        return build_response(False, str(exc))
+    except Exception as exc:  # pragma: no cover - defensive logging
+        logger.exception('生成验证码失败: %s', exc)
+        return build_response(False, '验证码生成失败，请稍后再试')
+
+    return build_raw_response(True, '验证码生成成功', challenge_json(challenge))
+
+
+@csrf_exempt
+async def verify_captcha(request):
+    if request.method != 'POST':
+        return build_response(False, '仅支持POST请求')
+
+    data = parse_body(request)
+    token = data.get('token')
+    user_answer = data.get('answer')
+    client_ip = get_client_ip(request)
+
+    if not token:
+        return build_response(False, '缺少验证码token')
+
+    service = await aget_captcha_service()
+    ok, message, captcha_type = await service.avalidate_and_consume(
+        token=token, user_answer=user_answer, client_ip=client_ip
+    )
+    return build_response(ok, message, {'type': captcha_type})
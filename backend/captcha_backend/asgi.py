@@ -5,3 +5,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'captcha_backend.settings')
 
 application = get_asgi_application()
+
+# 进程内过期挑战清理只在服务进程中启动；CAPTCHA_SWEEP_INTERVAL 为 0（默认）时不启动
+from captcha.reaper import start_sweeper  # noqa: E402 - 需要在 Django 初始化之后导入
+
+start_sweeper()
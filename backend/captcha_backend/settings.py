@@ -34,7 +34,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'captcha_backend.urls'
+# ASGI 部署时设置 DJANGO_ASYNC_VIEWS=True，验证码与登录接口改用原生异步视图
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', 'false').lower() == 'true'
+ROOT_URLCONF = 'captcha_backend.urls_async' if ASYNC_VIEWS else 'captcha_backend.urls'
 
 TEMPLATES = [
     {
@@ -81,6 +83,8 @@ TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '')
 TEST_PHONE_NUMBER = os.getenv('TEST_PHONE_NUMBER', '')
+# 替换 Twilio 客户端的类路径（如压测用的 captcha.loadtest.FakeTwilioClient），为空时使用 twilio SDK
+TWILIO_CLIENT_CLASS = os.getenv('TWILIO_CLIENT_CLASS', '')
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,8 +115,170 @@ AUTH_USER_MODEL = 'accounts.User'
 
 LOGIN_URL = '/admin/login'
 
+# 登录 / 注册的密码哈希在独立进程池中计算（POOL=False 时在请求线程内计算）；
+# WORKERS 为 0 时取 CPU 核数，排队数达到 MAX_PENDING（0 表示 WORKERS*2）时直接返回 503 与 Retry-After
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledModelBackend']
+
+PASSWORD_HASHING = {
+    'POOL': os.getenv('PASSWORD_HASH_POOL', 'True') == 'True',
+    'WORKERS': int(os.getenv('PASSWORD_HASH_WORKERS', 0)),
+    'MAX_PENDING': int(os.getenv('PASSWORD_HASH_MAX_PENDING', 0)),
+    'START_METHOD': os.getenv('PASSWORD_HASH_START_METHOD', 'spawn'),
+}
+
+# 用户名索引：每个进程在后台把全部用户名载入布隆过滤器（MODE=exact 时为精确集合），注册查重与登录失败记录
+# 对判为不存在的用户名不再查库；索引仅作参考，不参与认证。其他进程新注册的用户每 REFRESH_SECONDS 秒增量载入，
+# 每 REBUILD_SECONDS 秒完整重建一次以补上改名与乱序提交的用户
+USERNAME_INDEX = {
+    'ENABLED': os.getenv('USERNAME_INDEX_ENABLED', 'True') == 'True',
+    'MODE': os.getenv('USERNAME_INDEX_MODE', 'bloom'),
+    'ERROR_RATE': float(os.getenv('USERNAME_INDEX_ERROR_RATE', 0.01)),
+    'REFRESH_SECONDS': float(os.getenv('USERNAME_INDEX_REFRESH_SECONDS', 5)),
+    'REBUILD_SECONDS': float(os.getenv('USERNAME_INDEX_REBUILD_SECONDS', 600)),
+}
+
+# 登录记录缓冲写入：攒满 MAX_BATCH 条或等待 MAX_DELAY_MS 毫秒后批量写库；
+# 队列超过 MAX_QUEUE 时按 OVERFLOW 处理（drop_newest / drop_oldest / sync），BUFFERED=False 时逐条同步写入
+LOGIN_AUDIT = {
+    'BUFFERED': os.getenv('LOGIN_AUDIT_BUFFERED', 'True') == 'True',
+    'MAX_BATCH': int(os.getenv('LOGIN_AUDIT_MAX_BATCH', 200)),
+    'MAX_DELAY_MS': float(os.getenv('LOGIN_AUDIT_MAX_DELAY_MS', 200)),
+    'MAX_QUEUE': int(os.getenv('LOGIN_AUDIT_MAX_QUEUE', 10000)),
+    'OVERFLOW': os.getenv('LOGIN_AUDIT_OVERFLOW', 'drop_newest'),
+}
+
 API_RESPONSE_TEMPLATE = {
     'success': False,
     'message': '',
     'data': None,
 }
+
+CAPTCHA_TYPE_CACHE_SECONDS = float(os.getenv('CAPTCHA_TYPE_CACHE_SECONDS', 5))
+
+# 缓存：多进程部署需配置 DJANGO_CACHE_REDIS_URL，验证码投递状态写在这里供任意 worker 查询
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('DJANGO_CACHE_REDIS_URL')}
+        if os.getenv('DJANGO_CACHE_REDIS_URL')
+        else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+}
+
+# 验证码挑战存储：DatabaseChallengeStore（默认）、KeyValueChallengeStore（Redis 兼容）或 LocMemChallengeStore（单节点）
+CAPTCHA_CHALLENGE_STORE = {
+    'BACKEND': os.getenv('CAPTCHA_CHALLENGE_STORE', 'captcha.stores.DatabaseChallengeStore'),
+    'OPTIONS': {'url': os.getenv('CAPTCHA_REDIS_URL')} if os.getenv('CAPTCHA_REDIS_URL') else {},
+}
+
+# 进程内过期挑战清理：间隔秒数为 0 时关闭，建议改用定时任务执行 purge_expired_captchas
+CAPTCHA_SWEEP_INTERVAL = float(os.getenv('CAPTCHA_SWEEP_INTERVAL', 0))
+CAPTCHA_SWEEP_CHUNK_SIZE = int(os.getenv('CAPTCHA_SWEEP_CHUNK_SIZE', 1000))
+CAPTCHA_SWEEP_SLEEP = float(os.getenv('CAPTCHA_SWEEP_SLEEP', 0.05))
+
+# 邮件 / 短信 / 语音验证码的后台投递队列
+CAPTCHA_DELIVERY = {
+    'ASYNC': os.getenv('CAPTCHA_DELIVERY_ASYNC', 'True') == 'True',
+    'WORKERS': int(os.getenv('CAPTCHA_DELIVERY_WORKERS', 4)),
+    'MAX_ATTEMPTS': int(os.getenv('CAPTCHA_DELIVERY_MAX_ATTEMPTS', 3)),
+    'BACKOFF': float(os.getenv('CAPTCHA_DELIVERY_BACKOFF', 0.5)),
+    'MAX_BACKOFF': float(os.getenv('CAPTCHA_DELIVERY_MAX_BACKOFF', 30)),
+    # 保存投递状态的缓存别名，生产环境必须是共享缓存（系统检查 captcha.E001）
+    'STATUS_CACHE': os.getenv('CAPTCHA_DELIVERY_STATUS_CACHE', 'default'),
+}
+
+# 验证码邮件合并发送：累计 MAX_MESSAGES 封或等待 MAX_DELAY_MS 毫秒后通过同一 SMTP 连接发送
+CAPTCHA_EMAIL_BATCH = {
+    'ENABLED': os.getenv('CAPTCHA_EMAIL_BATCH', 'True') == 'True',
+    'MAX_MESSAGES': int(os.getenv('CAPTCHA_EMAIL_BATCH_SIZE', 50)),
+    'MAX_DELAY_MS': float(os.getenv('CAPTCHA_EMAIL_BATCH_DELAY_MS', 20)),
+    'SENDERS': int(os.getenv('CAPTCHA_EMAIL_BATCH_SENDERS', 2)),
+}
+
+# 批量签发：单次最多 MAX_COUNT 个，同一 IP 在 IP_WINDOW 秒内最多 IP_LIMIT 个
+CAPTCHA_BATCH = {
+    'MAX_COUNT': int(os.getenv('CAPTCHA_BATCH_MAX_COUNT', 50)),
+    'IP_LIMIT': int(os.getenv('CAPTCHA_BATCH_IP_LIMIT', 200)),
+    'IP_WINDOW': int(os.getenv('CAPTCHA_BATCH_IP_WINDOW', 60)),
+}
+
+# 文本 / 邮件 / 短信 / 语音验证码答案只保存 HMAC 摘要，密钥默认使用 SECRET_KEY；
+# 多个服务共享挑战存储时需配置相同的值，修改后尚未过期的挑战将无法通过校验
+CAPTCHA_ANSWER_KEY = os.getenv('CAPTCHA_ANSWER_KEY', '')
+
+# 可信反向代理（IP 或 CIDR，逗号分隔）：只有直连地址属于这些代理时才读取 X-Forwarded-For，
+# 取从右往左第一个不可信的地址作为客户端 IP；为空时一律使用 REMOTE_ADDR
+CAPTCHA_TRUSTED_PROXIES = [proxy for proxy in os.getenv('CAPTCHA_TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+
+# 请求验证码限流：按类型分别统计同一 IP 与同一接收方（手机号 / 邮箱）在滑动窗口内的次数，
+# 类型配置中的 rate_limit 可覆盖 DEFAULTS；多进程部署时把 STORE 换成 KeyValueRateLimitStore 共享计数
+CAPTCHA_RATE_LIMIT = {
+    'ENABLED': os.getenv('CAPTCHA_RATE_LIMIT', 'True') == 'True',
+    'STORE': (
+        'captcha.ratelimit.KeyValueRateLimitStore'
+        if os.getenv('CAPTCHA_RATE_LIMIT_REDIS_URL')
+        else 'captcha.ratelimit.LocalRateLimitStore'
+    ),
+    'OPTIONS': {'url': os.getenv('CAPTCHA_RATE_LIMIT_REDIS_URL')} if os.getenv('CAPTCHA_RATE_LIMIT_REDIS_URL') else {},
+    'DEFAULTS': {
+        'ip': {
+            'limit': int(os.getenv('CAPTCHA_RATE_LIMIT_IP', 30)),
+            'window': float(os.getenv('CAPTCHA_RATE_LIMIT_IP_WINDOW', 60)),
+        },
+        'target': {
+            'limit': int(os.getenv('CAPTCHA_RATE_LIMIT_TARGET', 5)),
+            'window': float(os.getenv('CAPTCHA_RATE_LIMIT_TARGET_WINDOW', 600)),
+        },
+    },
+}
+
+# 风险升级：未指定类型时按 IP / 子网 / 用户近期失败情况选择验证码，风险分达到 score 即升级到对应类型；
+# 失败计数按 HALF_LIFE 秒半衰，客户端指定的类型低于所需级别时会被替换；默认关闭，开启后不再使用后台设置的默认类型
+CAPTCHA_RISK = {
+    'ENABLED': os.getenv('CAPTCHA_RISK', 'False') == 'True',
+    'HALF_LIFE': float(os.getenv('CAPTCHA_RISK_HALF_LIFE', 600)),
+    'WEIGHTS': {'ip': 1.0, 'subnet': 0.3, 'user': 1.0},
+    'LEVELS': [
+        {'score': 0, 'type': 'invisible'},
+        {'score': float(os.getenv('CAPTCHA_RISK_SLIDER_SCORE', 2)), 'type': 'slider'},
+        {'score': float(os.getenv('CAPTCHA_RISK_GRID_SCORE', 4)), 'type': 'grid'},
+        {'score': float(os.getenv('CAPTCHA_RISK_SMS_SCORE', 8)), 'type': 'sms'},
+    ],
+}
+
+# 指标：/metrics 输出 Prometheus 文本格式，TOKEN 非空时抓取方需携带 Authorization: Bearer <TOKEN>；
+# 启用时在最外层挂 MetricsMiddleware，统计每个视图的耗时与 SQL 数量
+CAPTCHA_METRICS = {
+    'ENABLED': os.getenv('CAPTCHA_METRICS', 'True') == 'True',
+    'TOKEN': os.getenv('CAPTCHA_METRICS_TOKEN', ''),
+}
+if CAPTCHA_METRICS['ENABLED']:
+    MIDDLEWARE.insert(0, 'captcha.middleware.MetricsMiddleware')
+
+# 图形验证码：后台预渲染 POOL_SIZE 张图片，低于 LOW_WATERMARK 时补充；FONT 为可选的 TTF 字体路径
+CAPTCHA_TEXT_IMAGE = {
+    'POOL_SIZE': int(os.getenv('CAPTCHA_TEXT_POOL_SIZE', 200)),
+    'LOW_WATERMARK': int(os.getenv('CAPTCHA_TEXT_POOL_LOW_WATERMARK', 50)),
+    'WIDTH': 150,
+    'HEIGHT': 50,
+    'LENGTH': 5,
+    'FORMAT': os.getenv('CAPTCHA_TEXT_IMAGE_FORMAT', 'WEBP'),
+    'FONT': os.getenv('CAPTCHA_TEXT_FONT', ''),
+}
+
+# 滑块验证码：BACKGROUND_DIR 下的图片解码后按 LRU 缓存；目录为空时使用程序生成的背景
+CAPTCHA_SLIDER = {
+    'BACKGROUND_DIR': os.getenv('CAPTCHA_SLIDER_BACKGROUND_DIR', ''),
+    'WIDTH': 300,
+    'HEIGHT': 150,
+    'PIECE_SIZE': 50,
+    'FORMAT': os.getenv('CAPTCHA_SLIDER_IMAGE_FORMAT', 'WEBP'),
+}
+
+# 九宫格验证码图片库：CORPUS_DIR/<类别>/<图片>，可选 CORPUS_DIR/labels.json 提供类别中文名
+CAPTCHA_GRID = {
+    'CORPUS_DIR': os.getenv('CAPTCHA_GRID_CORPUS_DIR', ''),
+    'INDEX_DIR': os.getenv('CAPTCHA_GRID_INDEX_DIR', ''),
+    'URL_PREFIX': '/api/captcha/grid/',
+    'MIN_TARGETS': 2,
+    'MAX_TARGETS': 4,
+}
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from captcha.views import metrics
+
 urlpatterns = [
     path('django-admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
     path('api/', include('captcha.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
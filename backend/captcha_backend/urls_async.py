@@ -0,0 +1,14 @@
+from django.urls import path
+
+from accounts import views_async as account_views
+from captcha import views_async as captcha_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+# 与 urls.py 相同，但验证码与登录接口使用原生异步视图；先匹配的路由优先
+urlpatterns = [
+    path('api/captcha/request', captcha_views.request_captcha, name='captcha_request'),
+    path('api/captcha/verify', captcha_views.verify_captcha, name='captcha_verify'),
+    path('api/login', account_views.login_view, name='login'),
+    *sync_urlpatterns,
+]